@@ -1,14 +1,45 @@
-"""PDFOCR package initialization."""
+"""PDFOCR package initialization.
+
+The layout/block OCR names are resolved on first access, so ``import pdfocr``
+(and the CLI) does not load OpenCV, NumPy or Pillow until a stage that needs
+them runs.
+"""
+from importlib import import_module
 
 from pdfocr.main import main
-from pdfocr.layout import Block, detect_blocks, draw_blocks
-from pdfocr.block_ocr import ocr_blocks, extract_blocks_to_json
+
+# Lazily exported name -> module that defines it
+_EXPORTS = {
+    "Block": "pdfocr.layout",
+    "BlockArray": "pdfocr.layout",
+    "detect_blocks": "pdfocr.layout",
+    "draw_blocks": "pdfocr.layout",
+    "ocr_blocks": "pdfocr.block_ocr",
+    "extract_blocks_to_json": "pdfocr.block_ocr",
+    "ocr_pdf": "pdfocr.aio",
+}
 
 __all__ = [
     "main",
     "Block",
+    "BlockArray",
     "detect_blocks",
     "draw_blocks",
     "ocr_blocks",
     "extract_blocks_to_json",
+    "ocr_pdf",
 ]
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
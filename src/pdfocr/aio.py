@@ -0,0 +1,290 @@
+"""
+Asyncio API: OCR PDF pages from async code without blocking the event loop.
+
+``async for page in ocr_pdf(path): ...`` renders and OCRs pages on a
+process pool that is shared by every caller in the process, and yields
+each PageResult as soon as it is finished. A process-wide limit caps the
+pages in flight across all callers (and event loops), so one large PDF
+cannot monopolize the pool.
+
+Use ``contextlib.aclosing`` (or break out of the loop inside a task that
+gets cancelled) to stop early: pages that have not started are cancelled
+and only pages already running on a worker finish in the background.
+"""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import math
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import AsyncIterator, Deque, Iterable, List, Tuple
+
+from pdfocr.parallel import create_ocr_pool, resolve_workers
+from pdfocr.pdf_to_image import get_page_count, page_image_name
+from pdfocr.pipeline import (
+    SOURCE_FAILED,
+    SOURCE_OCR,
+    OcrOptions,
+    PageResult,
+    PageTask,
+    ocr_pdf_page,
+    text_layer_results,
+)
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+# Pages in flight per worker process; a little queueing keeps workers busy
+PAGES_PER_WORKER = 2
+# page_timeout is enforced in the worker for rasterizing and for OCR, and both
+# may be retried once; the asyncio-side guard only catches a stuck worker
+WORKER_TIMEOUT_STAGES = 4
+
+
+class PageLimiter:
+    """
+    Counting semaphore usable from any event loop and any thread.
+
+    asyncio.Semaphore belongs to one event loop; this one is shared by all
+    callers in the process. Waiters are served in arrival order.
+
+    Args:
+        limit: Number of slots
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._free = limit
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def in_use(self) -> int:
+        return self.limit - self._free
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = (loop, waiter) in self._waiters
+                if queued:
+                    self._waiters.remove((loop, waiter))
+            if not queued and waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation arrived: pass the slot on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """
+        Free a slot; safe to call from any thread.
+        """
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if loop.is_closed():
+                    continue
+                loop.call_soon_threadsafe(self._grant, waiter)
+                return
+            self._free += 1
+
+    def _grant(self, waiter: asyncio.Future) -> None:
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+_lock = threading.Lock()
+_executor: ProcessPoolExecutor | None = None
+_limiter: PageLimiter | None = None
+_workers = 0
+_pool_workers = 0
+_max_pages: int | None = None
+_max_memory_mb: int | None = None
+
+
+def configure(workers: int = 0, max_pages: int | None = None, max_memory_mb: int | None = None) -> None:
+    """
+    Set up the shared pool; call before the first ocr_pdf() to change the defaults.
+
+    A pool that is already running is shut down once its pages are done.
+
+    Args:
+        workers: OCR processes (default: 0 = one per CPU)
+        max_pages: Pages in flight across all callers (default: 2 per worker)
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
+    """
+    global _executor, _limiter, _workers, _max_pages, _max_memory_mb
+    with _lock:
+        old = _executor
+        _executor = None
+        _limiter = None
+        _workers = workers
+        _max_pages = max_pages
+        _max_memory_mb = max_memory_mb
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def _runtime() -> Tuple[ProcessPoolExecutor, PageLimiter]:
+    global _executor, _limiter, _pool_workers
+    with _lock:
+        if _executor is None:
+            workers = resolve_workers(_workers)
+            _pool_workers = workers
+            _executor = create_ocr_pool(workers, _max_memory_mb)
+            _limiter = PageLimiter(_max_pages or workers * PAGES_PER_WORKER)
+        return _executor, _limiter
+
+
+def _replace_executor(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    # A dead worker breaks the whole pool; later pages get a fresh one
+    global _executor
+    with _lock:
+        if _executor is broken:
+            logger.warning("An OCR worker died; restarting the worker pool")
+            _executor = create_ocr_pool(resolve_workers(_workers), _max_memory_mb)
+        executor = _executor
+    broken.shutdown(wait=False, cancel_futures=True)
+    return executor
+
+
+def shutdown(cancel_pending: bool = True) -> None:
+    """
+    Stop the shared pool (blocking); the next ocr_pdf() starts a new one.
+    """
+    global _executor, _limiter
+    with _lock:
+        executor = _executor
+        _executor = None
+        _limiter = None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+
+def _guard_timeout(page_timeout: float | None, limiter: PageLimiter) -> float | None:
+    # Loose upper bound from submission: the page may wait behind the other
+    # pages queued for its worker, each allowed the full in-worker time
+    if page_timeout is None:
+        return None
+    queued = math.ceil(limiter.limit / max(1, _pool_workers))
+    return page_timeout * WORKER_TIMEOUT_STAGES * queued
+
+
+async def _ocr_page(task: PageTask, limiter: PageLimiter) -> PageResult:
+    await limiter.acquire()
+    executor = _runtime()[0]
+    try:
+        try:
+            future: Future = executor.submit(ocr_pdf_page, task)
+        except BrokenProcessPool:
+            executor = _replace_executor(executor)
+            future = executor.submit(ocr_pdf_page, task)
+    except BaseException:
+        limiter.release()
+        raise
+    # The slot is held until the worker is really done, even after a timeout
+    future.add_done_callback(lambda _: limiter.release())
+    guard = _guard_timeout(task.options.page_timeout, limiter)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), guard)
+    except asyncio.TimeoutError:
+        logger.warning(f"Page {task.page} of {task.pdf_path.name} got no result from its worker "
+                       f"within {guard:g} s")
+    except BrokenProcessPool:
+        logger.error(f"An OCR worker died while page {task.page} of {task.pdf_path.name} was in flight")
+        _replace_executor(executor)
+    return PageResult(task.page, page_image_name(task.pdf_path.stem, task.page), "", SOURCE_FAILED)
+
+
+async def ocr_pdf(pdf_path: PathLike,
+                  options: OcrOptions | None = None,
+                  *,
+                  pages: Iterable[int] | None = None,
+                  use_text_layer: bool = False,
+                  skip_blank: bool = False,
+                  page_timeout: float | None = None,
+                  ordered: bool = False) -> AsyncIterator[PageResult]:
+    """
+    Render and OCR the pages of a PDF on the shared pool, yielding results as they finish.
+
+    Args:
+        pdf_path: Path to PDF file
+        options: OCR settings (default: OcrOptions())
+        pages: 1-based page numbers to process (default: all pages)
+        use_text_layer: Take pages with a usable embedded text layer as-is
+        skip_blank: Skip OCR of blank pages
+        page_timeout: Time limit for rasterizing and for OCRing one page,
+            enforced inside the worker like OcrOptions.page_timeout (time spent
+            waiting for a worker does not count); a page that fails or takes
+            longer is retried once at half the DPI, then yielded with empty
+            text and source "failed" (default: options.page_timeout)
+        ordered: Yield pages in page order instead of completion order
+
+    Yields:
+        PageResult per page
+    """
+    options = options or OcrOptions()
+    if page_timeout is not None:
+        options = dataclasses.replace(options, page_timeout=page_timeout)
+    pdf_path = Path(pdf_path).expanduser().resolve()
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    loop = asyncio.get_running_loop()
+    # pdfinfo/pdftotext are subprocesses; keep them off the event loop
+    if pages is None:
+        page_numbers: List[int] = list(range(1, await loop.run_in_executor(None, get_page_count, pdf_path) + 1))
+    else:
+        page_numbers = sorted(set(pages))
+    known = await loop.run_in_executor(None, text_layer_results, pdf_path) if use_text_layer else {}
+
+    limiter = _runtime()[1]
+    tasks: List[asyncio.Task] = []
+    try:
+        for page in page_numbers:
+            if page in known:
+                continue
+            task = PageTask(pdf_path, page, options, skip_blank=skip_blank)
+            tasks.append(asyncio.ensure_future(_ocr_page(task, limiter)))
+
+        if ordered:
+            pending = iter(tasks)
+            for page in page_numbers:
+                if page in known:
+                    yield known[page]
+                    continue
+                result = await next(pending)
+                if use_text_layer:
+                    result.source = result.source or SOURCE_OCR
+                yield result
+            return
+
+        for page in page_numbers:
+            if page in known:
+                yield known[page]
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if use_text_layer:
+                result.source = result.source or SOURCE_OCR
+            yield result
+    finally:
+        # Consumer stopped early or was cancelled: drop pages that have not started
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
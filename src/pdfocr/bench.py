@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness: throughput, latency, memory and accuracy per pipeline configuration.
+
+A corpus is built from the bundled fixtures (``test/*.pdf`` with their
+ground-truth ``.txt``) by interleaving their pages, so larger runs mix the
+English and Korean documents. Every configuration of the requested matrix
+(DPI x lang x workers x engine x block mode x preprocessing) runs in a
+fresh process, which keeps peak RSS figures independent of earlier runs.
+Preprocessed runs are also compared with the same configuration without
+preprocessing, one line per step set (speedup and CER change).
+
+Usage:
+    python -m pdfocr.bench --pages 40 --dpi 150 300 --workers 1 4
+    python -m pdfocr.bench --preprocess each
+    python -m pdfocr.bench --save-baseline bench/baseline.json
+    python -m pdfocr.bench --baseline bench/baseline.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from pdfocr.block_ocr import ocr_blocks, ocr_blocks_single_pass
+from pdfocr.engines import ENGINE_NAMES, get_engine
+from pdfocr.image_utils import load_image
+from pdfocr.layout import detect_blocks
+from pdfocr.metrics import enable_metrics, stage
+from pdfocr.parallel import create_ocr_pool, imap_ordered, resolve_workers
+from pdfocr.pdf_to_image import get_page_count
+from pdfocr.pipeline import PREPROCESS_STEPS, OcrOptions, ocr_page_images, parse_preprocess, render_pdf_pages
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURE_DIR = Path(__file__).resolve().parents[2] / "test"
+BLOCK_MODES = ("off", "roi", "page")
+# Relative slowdown / memory growth tolerated before a run counts as a regression
+DEFAULT_TOLERANCE = 0.10
+# Absolute character error rate increase tolerated before a run counts as a regression
+DEFAULT_CER_TOLERANCE = 0.005
+# Modules that must not load on ``import pdfocr`` (CLI startup, --help, text-layer runs)
+HEAVY_MODULES = ("cv2", "numpy", "PIL", "pdf2image", "pytesseract", "tesserocr")
+STARTUP_RUNS = 5
+
+_STARTUP_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import pdfocr\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'import_s': elapsed, 'heavy_modules': [m for m in %r if m in sys.modules]}))\n"
+)
+
+_PAGE_HEADER = re.compile(r"^={80}\nPage (\d+): [^\n]*\n={80}\n\n", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class Fixture:
+    pdf_path: Path
+    # Ground truth per 1-based page
+    pages: Dict[int, str]
+
+
+@dataclass(frozen=True)
+class BenchConfig:
+    dpi: int = 300
+    lang: str = "eng+kor"
+    workers: int = 1
+    engine: str = "auto"
+    # "off" = full-page text OCR, "roi"/"page" = layout blocks with that block_ocr mode
+    block_mode: str = "off"
+    # Preprocessing steps joined with "+", or "none"
+    preprocess: str = "none"
+
+    @property
+    def key(self) -> str:
+        key = (f"dpi={self.dpi} lang={self.lang} workers={self.workers} "
+               f"engine={self.engine} blocks={self.block_mode}")
+        # Unchanged keys without preprocessing, so older baselines still match
+        if self.preprocess != "none":
+            key += f" pre={self.preprocess}"
+        return key
+
+
+def read_page_texts(text_path: PathLike) -> Dict[int, str]:
+    """
+    Split a pdfocr text output (or ground-truth file in that format) into pages.
+
+    Args:
+        text_path: File written by save_extracted_text/write_page_text
+
+    Returns:
+        Dictionary mapping page numbers to their text
+    """
+    content = Path(text_path).read_text(encoding="utf-8")
+    headers = list(_PAGE_HEADER.finditer(content))
+    pages: Dict[int, str] = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following is not None else len(content)
+        pages[int(header.group(1))] = content[header.end():end].strip()
+    return pages
+
+
+def load_fixtures(fixture_dir: PathLike = DEFAULT_FIXTURE_DIR) -> List[Fixture]:
+    """
+    Collect the PDFs of a directory that have a ground-truth .txt next to them.
+    """
+    fixtures = []
+    for pdf_path in sorted(Path(fixture_dir).glob("*.pdf")):
+        truth = pdf_path.with_suffix(".txt")
+        if truth.exists():
+            fixtures.append(Fixture(pdf_path.resolve(), read_page_texts(truth)))
+    return fixtures
+
+
+def corpus_plan(fixtures: Sequence[Fixture], pages: int) -> List[Tuple[Fixture, int]]:
+    """
+    Order corpus pages by taking one page of each fixture in turn, cycling as needed.
+    """
+    counts = [len(fixture.pages) for fixture in fixtures]
+    plan = []
+    for i in range(pages):
+        fixture_index = i % len(fixtures)
+        page = (i // len(fixtures)) % counts[fixture_index] + 1
+        plan.append((fixtures[fixture_index], page))
+    return plan
+
+
+def build_corpus(fixtures: Sequence[Fixture], pages: int, output_path: PathLike) -> List[str]:
+    """
+    Write a synthetic PDF of ``pages`` interleaved fixture pages with poppler.
+
+    Args:
+        fixtures: Source documents
+        pages: Number of pages of the corpus
+        output_path: Corpus PDF to write
+
+    Returns:
+        Ground-truth text of each corpus page, in order
+    """
+    output_path = Path(output_path)
+    plan = corpus_plan(fixtures, pages)
+    with tempfile.TemporaryDirectory(prefix="pdfocr_bench_") as tmp:
+        split: Dict[Path, str] = {}
+        for index, fixture in enumerate(fixtures):
+            pattern = str(Path(tmp) / f"f{index}_%d.pdf")
+            subprocess.run(["pdfseparate", str(fixture.pdf_path), pattern], check=True)
+            split[fixture.pdf_path] = pattern
+        page_files = [split[fixture.pdf_path] % page for fixture, page in plan]
+        if len(page_files) == 1:
+            # pdfunite needs at least two inputs
+            Path(output_path).write_bytes(Path(page_files[0]).read_bytes())
+        else:
+            subprocess.run(["pdfunite", *page_files, str(output_path)], check=True)
+    return [fixture.pages.get(page, "") for fixture, page in plan]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def edit_distance(a: str, b: str) -> int:
+    """
+    Levenshtein distance, computed one numpy row per character of ``a``.
+    """
+    if not a or not b:
+        return len(a) + len(b)
+    target = np.frombuffer(b.encode("utf-32-le"), dtype=np.uint32)
+    offsets = np.arange(len(b) + 1)
+    row = offsets.copy()
+    for i, char in enumerate(a, start=1):
+        best = np.empty_like(row)
+        best[0] = i
+        best[1:] = np.minimum(row[1:] + 1, row[:-1] + (target != ord(char)))
+        # Insertions chain along the row: cur[j] = min over k <= j of best[k] + (j - k)
+        row = np.minimum.accumulate(best - offsets) + offsets
+    return int(row[-1])
+
+
+def char_errors(text: str, truth: str) -> Tuple[int, int]:
+    """
+    Return (edit distance, reference length) after collapsing whitespace.
+    """
+    text, truth = _normalize(text), _normalize(truth)
+    return edit_distance(text, truth), len(truth)
+
+
+def _ocr_block_page(args: Tuple[int, np.ndarray, BenchConfig]) -> Tuple[int, str]:
+    page_number, image, config = args
+    with stage("page", page=page_number, pixels=image.shape[0] * image.shape[1]):
+        blocks = detect_blocks(image)
+        ocr = ocr_blocks_single_pass if config.block_mode == "page" else ocr_blocks
+        entries = ocr(image, blocks, lang=config.lang, engine=config.engine)
+    return page_number, "\n".join(entry["text"] for entry in entries)
+
+
+def _page_texts(corpus: Path, config: BenchConfig) -> Iterator[Tuple[int, str]]:
+    pages = render_pdf_pages(corpus, dpi=config.dpi)
+    if config.block_mode == "off":
+        options = OcrOptions(lang=config.lang, dpi=config.dpi, engine=config.engine,
+                             preprocess=parse_preprocess(config.preprocess))
+        for result in ocr_page_images(pages, options, workers=config.workers):
+            yield result.page, result.text
+        return
+
+    tasks = ((page_number, load_image(image), config) for page_number, _, image in pages)
+    if resolve_workers(config.workers) == 1:
+        yield from map(_ocr_block_page, tasks)
+        return
+    with create_ocr_pool(config.workers) as pool:
+        yield from imap_ordered(pool, _ocr_block_page, tasks, window=2 * resolve_workers(config.workers))
+
+
+def _rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_config(corpus: PathLike, truth: Sequence[str], config: BenchConfig) -> Dict[str, object]:
+    """
+    Run one configuration over the corpus in the current process.
+
+    Use measure_config() to get a clean peak RSS; this is its worker.
+
+    Returns:
+        Result dict with throughput, latency percentiles, memory and CER
+    """
+    corpus = Path(corpus)
+    with tempfile.TemporaryDirectory(prefix="pdfocr_bench_") as tmp:
+        metrics_out = Path(tmp) / "metrics.jsonl"
+        enable_metrics(metrics_out)
+        errors = reference = pages = 0
+        start = time.perf_counter()
+        for page_number, text in _page_texts(corpus, config):
+            distance, length = char_errors(text, truth[page_number - 1])
+            errors += distance
+            reference += length
+            pages += 1
+        wall = time.perf_counter() - start
+        with metrics_out.open(encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+    latencies = [record["wall_s"] for record in records if record["stage"] == "page"]
+    preprocess_s: Dict[str, float] = {}
+    for record in records:
+        if record["stage"] == "preprocess":
+            preprocess_s[record["step"]] = preprocess_s.get(record["step"], 0.0) + record["wall_s"]
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {
+        "key": config.key,
+        "config": asdict(config),
+        "pages": pages,
+        "wall_s": round(wall, 3),
+        "pages_per_s": round(pages / wall, 3) if wall > 0 else 0.0,
+        "latency_p50_s": round(float(p50), 4),
+        "latency_p90_s": round(float(p90), 4),
+        "latency_p99_s": round(float(p99), 4),
+        "rss_peak_mb": round(_rss_mb(resource.RUSAGE_SELF), 1),
+        # Largest single child: OCR workers, pdftoppm, tesseract
+        "child_rss_peak_mb": round(_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "cer": round(errors / reference, 4) if reference else None,
+        # Preprocessing time per page, in total and per step
+        "preprocess_ms_per_page": round(sum(preprocess_s.values()) * 1000 / pages, 2) if pages else 0.0,
+        "preprocess_step_ms": {step: round(seconds * 1000 / pages, 2)
+                               for step, seconds in preprocess_s.items()} if pages else {},
+    }
+
+
+def measure_config(corpus: PathLike, truth: Sequence[str], config: BenchConfig) -> Dict[str, object]:
+    """
+    Run one configuration in a freshly spawned process (see run_config).
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as runner:
+        return runner.submit(run_config, corpus, list(truth), config).result()
+
+
+def measure_startup(runs: int = STARTUP_RUNS) -> Dict[str, object]:
+    """
+    Time ``import pdfocr`` in fresh interpreters and list heavy modules it loads.
+
+    Args:
+        runs: Interpreters to start; the fastest import time is reported
+
+    Returns:
+        Dict with import_s and heavy_modules
+    """
+    src_dir = str(Path(__file__).resolve().parents[1])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")])))
+    probes = []
+    for _ in range(max(1, runs)):
+        completed = subprocess.run([sys.executable, "-c", _STARTUP_PROBE % (HEAVY_MODULES,)],
+                                   capture_output=True, text=True, check=True, env=env)
+        probes.append(json.loads(completed.stdout))
+    return {
+        "import_s": round(min(probe["import_s"] for probe in probes), 4),
+        "heavy_modules": sorted({name for probe in probes for name in probe["heavy_modules"]}),
+    }
+
+
+def environment() -> Dict[str, object]:
+    """
+    Describe the machine and tool versions a report was produced on.
+    """
+    try:
+        tesseract = get_engine("pytesseract").version()
+    except Exception as exc:
+        tesseract = f"unavailable ({exc})"
+    try:
+        poppler = subprocess.run(["pdftoppm", "-v"], capture_output=True, text=True).stderr.splitlines()[0]
+    except (OSError, IndexError):
+        poppler = "unavailable"
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "tesseract": tesseract,
+        "poppler": poppler,
+    }
+
+
+def check_startup(startup: Dict[str, object],
+                  baseline: Dict[str, object] | None = None,
+                  tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    List startup regressions: heavy modules loaded at import, or a slower import than the baseline.
+    """
+    regressions = [f"startup: import pdfocr loads {name}" for name in startup["heavy_modules"]]
+    base = (baseline or {}).get("startup")
+    if base and startup["import_s"] > base["import_s"] * (1 + tolerance):
+        regressions.append(f"startup: import_s {base['import_s']} -> {startup['import_s']}")
+    return regressions
+
+
+def compare_to_baseline(results: Sequence[Dict[str, object]],
+                        baseline: Dict[str, object],
+                        tolerance: float = DEFAULT_TOLERANCE,
+                        cer_tolerance: float = DEFAULT_CER_TOLERANCE) -> List[str]:
+    """
+    List the regressions of a run against a stored baseline report.
+
+    Args:
+        results: Result dicts of the current run
+        baseline: Report saved with --save-baseline
+        tolerance: Allowed relative loss in throughput and growth in latency/memory
+        cer_tolerance: Allowed absolute increase of the character error rate
+
+    Returns:
+        One message per regression (empty when none)
+    """
+    previous = {entry["key"]: entry for entry in baseline.get("results", [])}
+    regressions: List[str] = []
+    for result in results:
+        base = previous.get(result["key"])
+        if base is None:
+            logger.info(f"No baseline for: {result['key']}")
+            continue
+        if result["pages_per_s"] < base["pages_per_s"] * (1 - tolerance):
+            regressions.append(f"{result['key']}: pages/s {base['pages_per_s']} -> {result['pages_per_s']}")
+        for field in ("latency_p90_s", "rss_peak_mb", "child_rss_peak_mb"):
+            if result[field] > base[field] * (1 + tolerance):
+                regressions.append(f"{result['key']}: {field} {base[field]} -> {result[field]}")
+        if result["cer"] is not None and base["cer"] is not None \
+                and result["cer"] > base["cer"] + cer_tolerance:
+            regressions.append(f"{result['key']}: cer {base['cer']} -> {result['cer']}")
+    return regressions
+
+
+def _print_results(results: Sequence[Dict[str, object]]) -> None:
+    print(f"\n{'configuration':<58}{'pages/s':>9}{'p50 s':>8}{'p90 s':>8}{'p99 s':>8}"
+          f"{'RSS MB':>8}{'child MB':>9}{'CER':>8}")
+    for result in results:
+        cer = "-" if result["cer"] is None else f"{result['cer']:.4f}"
+        print(f"{result['key']:<58}{result['pages_per_s']:>9.2f}{result['latency_p50_s']:>8.2f}"
+              f"{result['latency_p90_s']:>8.2f}{result['latency_p99_s']:>8.2f}"
+              f"{result['rss_peak_mb']:>8.0f}{result['child_rss_peak_mb']:>9.0f}{cer:>8}")
+
+
+def _print_preprocess_gains(results: Sequence[Dict[str, object]]) -> None:
+    # Each preprocessed run against the same configuration without preprocessing
+    plain = {result["key"]: result for result in results if result["config"]["preprocess"] == "none"}
+    rows = []
+    for result in results:
+        config = result["config"]
+        if config["preprocess"] == "none":
+            continue
+        base = plain.get(BenchConfig(**{**config, "preprocess": "none"}).key)
+        if base is not None:
+            rows.append((result, base))
+    if not rows:
+        return
+    print(f"\n{'preprocessing (vs. none)':<58}{'speedup':>9}{'pre ms':>8}{'CER':>8}{'dCER':>9}")
+    for result, base in rows:
+        speedup = result["pages_per_s"] / base["pages_per_s"] if base["pages_per_s"] else 0.0
+        if result["cer"] is None or base["cer"] is None:
+            cer = delta = "-"
+        else:
+            cer, delta = f"{result['cer']:.4f}", f"{result['cer'] - base['cer']:+.4f}"
+        print(f"{result['key']:<58}{speedup:>8.2f}x{result['preprocess_ms_per_page']:>8.1f}{cer:>8}{delta:>9}")
+
+
+def _preprocess_specs(values: Sequence[str]) -> List[str]:
+    specs = []
+    for value in values:
+        # "each" = no preprocessing, every step alone, then all steps
+        expanded = ["none", *PREPROCESS_STEPS, "all"] if value == "each" else [value]
+        for spec in expanded:
+            steps = parse_preprocess(spec)
+            spec = "+".join(steps) if steps else "none"
+            if spec not in specs:
+                specs.append(spec)
+    return specs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pdfocr configurations on a corpus built from the test fixtures",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default configuration over one copy of every fixture page
+  python -m pdfocr.bench
+
+  # 40-page mixed corpus, DPI x workers matrix
+  python -m pdfocr.bench --pages 40 --dpi 150 300 --workers 1 4
+
+  # Speedup and accuracy of every preprocessing step alone and of all of them
+  python -m pdfocr.bench --preprocess each
+
+  # Record a baseline, later fail (exit 1) when a change regresses it
+  python -m pdfocr.bench --save-baseline bench/baseline.json
+  python -m pdfocr.bench --baseline bench/baseline.json
+
+  # Only check CLI startup (no poppler/tesseract needed); exit 1 if heavy modules load
+  python -m pdfocr.bench --startup-only
+        """
+    )
+    parser.add_argument('--fixtures', default=str(DEFAULT_FIXTURE_DIR),
+                        help='Directory of fixture PDFs with ground-truth .txt files (default: test/)')
+    parser.add_argument('--pages', type=int, default=None,
+                        help='Corpus size in pages (default: one copy of every fixture page)')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[300], help='Resolutions to run (default: 300)')
+    parser.add_argument('-l', '--lang', nargs='+', default=['eng+kor'], help='OCR languages to run (default: eng+kor)')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1],
+                        help='Worker counts to run, 0 = one per CPU (default: 1)')
+    parser.add_argument('--engine', nargs='+', choices=ENGINE_NAMES, default=['auto'],
+                        help='OCR backends to run (default: auto)')
+    parser.add_argument('--block-mode', nargs='+', choices=BLOCK_MODES, default=['off'],
+                        help='off = page text OCR; roi/page = layout block OCR in that mode (default: off)')
+    parser.add_argument('--preprocess', nargs='+', default=['none'], metavar='STEPS',
+                        help=f'Preprocessing step sets to run, e.g. none crop+deskew all; "each" = none, '
+                             f'every step of {", ".join(PREPROCESS_STEPS)} alone, and all (default: none)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per configuration; the median-throughput run is reported (default: 1)')
+    parser.add_argument('--startup-only', action='store_true',
+                        help='Only measure import time and the modules loaded by import pdfocr')
+    parser.add_argument('-o', '--output', default=None, help='Write the JSON report here')
+    parser.add_argument('--save-baseline', default=None, metavar='PATH', help='Store this run as the baseline')
+    parser.add_argument('--baseline', default=None, metavar='PATH',
+                        help='Compare against a stored baseline; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed relative throughput/latency/memory regression (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--cer-tolerance', type=float, default=DEFAULT_CER_TOLERANCE,
+                        help=f'Allowed absolute CER increase (default: {DEFAULT_CER_TOLERANCE})')
+    args = parser.parse_args()
+    try:
+        preprocess_specs = _preprocess_specs(args.preprocess)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    startup = measure_startup()
+    print(f"Startup: import pdfocr {startup['import_s'] * 1000:.0f} ms, "
+          f"heavy modules loaded: {', '.join(startup['heavy_modules']) or 'none'}")
+
+    results = []
+    corpus_info = None
+    if not args.startup_only:
+        fixtures = load_fixtures(args.fixtures)
+        if not fixtures:
+            print(f"Error: No fixture PDFs with ground-truth .txt in {args.fixtures}")
+            sys.exit(1)
+        pages = args.pages or sum(len(fixture.pages) for fixture in fixtures)
+        corpus_info = {"pages": pages, "fixtures": [f.pdf_path.name for f in fixtures]}
+
+        # Preprocessing applies to page OCR only, not to layout block OCR
+        configs = [BenchConfig(*values) for values in itertools.product(
+            args.dpi, args.lang, args.workers, args.engine, args.block_mode, preprocess_specs)
+            if values[4] == "off" or values[5] == "none"]
+
+        with tempfile.TemporaryDirectory(prefix="pdfocr_bench_") as tmp:
+            corpus = Path(tmp) / "corpus.pdf"
+            truth = build_corpus(fixtures, pages, corpus)
+            print(f"Corpus: {get_page_count(corpus)} page(s) from {', '.join(corpus_info['fixtures'])}")
+
+            for config in configs:
+                print(f"Running: {config.key}")
+                runs = sorted((measure_config(corpus, truth, config) for _ in range(max(1, args.repeat))),
+                              key=lambda run: run["pages_per_s"])
+                results.append(runs[len(runs) // 2])
+        _print_results(results)
+        _print_preprocess_gains(results)
+
+    report = {
+        "corpus": corpus_info,
+        "environment": environment(),
+        "startup": startup,
+        "results": results,
+    }
+    for target in (args.output, args.save_baseline):
+        if target:
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            Path(target).write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            print(f"Report written: {target}")
+
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("environment") != report["environment"]:
+            print("Warning: Baseline was recorded on a different machine or tool versions")
+        if results and baseline.get("corpus") != report["corpus"]:
+            print("Warning: Baseline used a different corpus; results are not comparable")
+
+    regressions = check_startup(startup, baseline, args.tolerance)
+    if baseline is not None:
+        regressions += compare_to_baseline(results, baseline, args.tolerance, args.cer_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s){f' against {args.baseline}' if args.baseline else ''}:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    if args.baseline:
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
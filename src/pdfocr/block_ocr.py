@@ -1,57 +1,302 @@
 """
 블록 감지 + 블록별 OCR 결과를 JSON 형태로 제공하는 유틸리티.
 """
+import contextlib
 import json
+import logging
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Dict, List, Sequence
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
 
-import pytesseract
+import cv2
+import numpy as np
+from PIL import Image
 
-from pdfocr.image_utils import read_image
-from pdfocr.layout import Block, detect_blocks
+from pdfocr.engines import ENGINE_NAMES, OcrData, get_engine
+from pdfocr.image_utils import ImageInput, describe_source, load_image
+from pdfocr.layout import Block, BlockArray, block_boxes, detect_blocks
+from pdfocr.metrics import stage
+from pdfocr.parallel import create_ocr_pool, resolve_workers
+from pdfocr.pdf_to_image import IMAGE_FORMATS
 from pdfocr.types import PathLike
 
+logger = logging.getLogger(__name__)
 
-def ocr_blocks(image_path: PathLike,
+
+BLOCK_OCR_MODES = ("roi", "page")
+# 단어 박스 면적 중 이 비율 이상이 블록과 겹쳐야 해당 블록에 배정한다
+MIN_WORD_OVERLAP = 0.5
+# 높이가 이 값(px) 이하인 블록(각주 번호, 표 셀, 쪽번호 등)은 스트립 이미지에 모아 한 번에 OCR한다
+SMALL_BLOCK_HEIGHT = 80
+# 스트립 하나의 최대 높이(px)와 블록 수, 블록 사이 흰 여백(px)
+STRIP_MAX_HEIGHT = 2000
+STRIP_MAX_BLOCKS = 32
+STRIP_GAP = 24
+
+# 워커에 넘기는 OCR 작업: ("strip" | "roi", RGB 이미지, 언어, 엔진)
+RegionTask = Tuple[str, np.ndarray, str, str]
+
+
+def _block_entry(idx: int, block: Block, lang: str, text: str) -> Dict:
+    x, y, w, h = block.as_bbox()
+    return {
+        "index": idx,
+        "bbox": {"x": x, "y": y, "w": w, "h": h},
+        "type": "text",  # 추후 수식/표 등으로 확장
+        "lang": lang,
+        "text": text.strip(),
+    }
+
+
+def _crop_rgb(image: np.ndarray, box: Sequence[int]) -> np.ndarray:
+    x, y, w, h = box
+    return cv2.cvtColor(image[y:y + h, x:x + w], cv2.COLOR_BGR2RGB)
+
+
+def _ocr_roi(ocr_engine, image: np.ndarray, block: Block, lang: str) -> str:
+    return ocr_engine.image_to_string(Image.fromarray(_crop_rgb(image, block.as_bbox())), lang)
+
+
+def _ocr_region(task: RegionTask) -> str | OcrData:
+    # 워커 프로세스에서 실행된다; 엔진은 프로세스마다 한 번만 만든다
+    kind, rgb, lang, engine = task
+    ocr_engine = get_engine(engine)
+    if kind == "strip":
+        return ocr_engine.image_to_data(Image.fromarray(rgb), lang)
+    return ocr_engine.image_to_string(Image.fromarray(rgb), lang)
+
+
+@contextlib.contextmanager
+def _region_mapper(workers: int, executor: Executor | None) -> Iterator[Callable[[List[RegionTask]], List]]:
+    # 작업 목록을 순서대로 OCR하는 함수를 돌려준다: 넘겨받은 풀, 새 풀, 또는 현재 프로세스
+    if executor is None and resolve_workers(workers) > 1:
+        with create_ocr_pool(workers) as pool:
+            with _region_mapper(workers, pool) as run:
+                yield run
+        return
+    if executor is None:
+        yield lambda tasks: [_ocr_region(task) for task in tasks]
+        return
+    # 한 페이지의 작업 목록은 이미 메모리에 있으므로 한꺼번에 넘긴다
+    yield lambda tasks: [future.result() for future in [executor.submit(_ocr_region, task) for task in tasks]]
+
+
+def _plan_strips(boxes: np.ndarray, coalesce: bool) -> List[List[int]]:
+    """
+    작은 블록의 인덱스를 스트립 단위로 나눈다 (블록 순서 유지).
+    블록이 하나뿐인 스트립은 만들지 않는다.
+    """
+    if not coalesce:
+        return []
+    strips: List[List[int]] = []
+    current: List[int] = []
+    height = STRIP_GAP
+    for i in np.flatnonzero(boxes[:, 3] <= SMALL_BLOCK_HEIGHT).tolist():
+        step = int(boxes[i, 3]) + STRIP_GAP
+        if current and (height + step > STRIP_MAX_HEIGHT or len(current) >= STRIP_MAX_BLOCKS):
+            strips.append(current)
+            current, height = [], STRIP_GAP
+        current.append(i)
+        height += step
+    if current:
+        strips.append(current)
+    return [strip for strip in strips if len(strip) > 1]
+
+
+def _build_strip(image: np.ndarray, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    블록들을 흰 여백을 사이에 두고 세로로 쌓은 RGB 스트립 이미지와,
+    스트립 안에서 각 블록이 놓인 위치 (N, 4: x, y, w, h)를 반환한다.
+    블록마다 줄이 따로 잡히도록 가로로는 나란히 두지 않는다.
+    """
+    width = int(boxes[:, 2].max()) + 2 * STRIP_GAP
+    height = int(boxes[:, 3].sum()) + STRIP_GAP * (len(boxes) + 1)
+    strip = np.full((height, width, 3), 255, dtype=np.uint8)
+    placed = np.empty_like(boxes)
+    top = STRIP_GAP
+    for k, (x, y, w, h) in enumerate(boxes.tolist()):
+        strip[top:top + h, STRIP_GAP:STRIP_GAP + w] = image[y:y + h, x:x + w]
+        placed[k] = (STRIP_GAP, top, w, h)
+        top += h + STRIP_GAP
+    return cv2.cvtColor(strip, cv2.COLOR_BGR2RGB), placed
+
+
+def _words_by_block(data: OcrData, blocks: Sequence[Block]) -> List[Dict[tuple, List[str]]]:
+    """
+    image_to_data 단어를 bbox 겹침으로 블록에 배정하고,
+    블록별로 Tesseract 줄 단위(block/par/line)로 묶는다.
+    """
+    words = [
+        i for i, text in enumerate(data["text"])
+        if str(text).strip() and float(data["conf"][i]) >= 0
+    ]
+    word_boxes = np.array(
+        [[data["left"][i], data["top"][i], data["width"][i], data["height"][i]] for i in words],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    owners = assign_words_to_blocks(word_boxes, blocks)
+
+    lines: List[Dict[tuple, List[str]]] = [{} for _ in range(len(blocks))]
+    for word_index, owner in zip(words, owners):
+        if owner < 0:
+            continue
+        line_key = (data["block_num"][word_index], data["par_num"][word_index], data["line_num"][word_index])
+        lines[owner].setdefault(line_key, []).append(str(data["text"][word_index]).strip())
+    return lines
+
+
+def _join_lines(block_lines: Dict[tuple, List[str]]) -> str:
+    return "\n".join(" ".join(line) for line in block_lines.values())
+
+
+def ocr_blocks(image_path: ImageInput,
                blocks: Sequence[Block],
-               lang: str = "kor") -> List[Dict]:
+               lang: str = "kor",
+               engine: str = "auto",
+               workers: int = 1,
+               coalesce: bool = True,
+               executor: Executor | None = None) -> List[Dict]:
     """
     감지된 블록 리스트에 대해 OCR을 수행해 구조화된 dict 리스트를 반환한다.
+    경로 대신 메모리 이미지(ndarray/PIL)를 넘기면 디코딩을 건너뛴다.
+    engine="tesserocr"(또는 설치 시 "auto")이면 모델을 한 번만 로드해 블록마다 재사용한다.
+    - coalesce=True이면 작은 블록(높이 SMALL_BLOCK_HEIGHT 이하)을 스트립 이미지 몇 장에 모아
+      한 번에 인식하고, 단어 좌표로 원래 블록에 되돌린다. 단어를 하나도 받지 못한 블록만
+      블록 단위 OCR로 다시 인식한다.
+    - workers > 1이면 스트립과 큰 블록을 프로세스 풀에서 병렬로 인식한다.
+      여러 페이지를 처리할 때는 executor(create_ocr_pool)를 넘겨 풀을 재사용한다.
     """
-    image = read_image(image_path)
-    results: List[Dict] = []
+    image = load_image(image_path)
+    boxes = block_boxes(blocks)
+    pixels = int((boxes[:, 2].astype(np.int64) * boxes[:, 3]).sum())
+    texts: List[str | None] = [None] * len(boxes)
+
+    strips = _plan_strips(boxes, coalesce)
+    coalesced = {i for strip in strips for i in strip}
+    singles = [i for i in range(len(boxes)) if i not in coalesced]
+
+    with stage("ocr_blocks", mode="roi", blocks=len(blocks), pixels=pixels) as record, \
+            _region_mapper(workers, executor) as run:
+        tasks: List[RegionTask] = []
+        placements = []
+        for strip in strips:
+            strip_image, placed = _build_strip(image, boxes[strip])
+            tasks.append(("strip", strip_image, lang, engine))
+            placements.append(placed)
+        tasks += [("roi", _crop_rgb(image, boxes[i]), lang, engine) for i in singles]
+        outputs = run(tasks)
+
+        for strip, placed, data in zip(strips, placements, outputs):
+            for i, block_lines in zip(strip, _words_by_block(data, BlockArray(placed))):
+                if block_lines:
+                    texts[i] = _join_lines(block_lines)
+        for i, text in zip(singles, outputs[len(strips):]):
+            texts[i] = text
+
+        # 스트립에서 글자를 하나도 못 받은 블록은 블록 단위로 다시 인식한다
+        missing = [i for i in coalesced if texts[i] is None]
+        for i, text in zip(missing, run([("roi", _crop_rgb(image, boxes[i]), lang, engine) for i in missing])):
+            texts[i] = text
+        record.update(strips=len(strips), ocr_calls=len(tasks) + len(missing))
+
+    logger.debug(f"Block OCR: {len(boxes)} block(s) in {len(tasks) + len(missing)} OCR call(s), "
+                 f"{len(coalesced)} coalesced into {len(strips)} strip(s), {len(missing)} fallback(s)")
+    return [
+        _block_entry(idx, block, lang, text)
+        for idx, (block, text) in enumerate(zip(blocks, texts), start=1)
+    ]
+
+
+def assign_words_to_blocks(word_boxes: np.ndarray,
+                           blocks: Sequence[Block],
+                           min_overlap: float = MIN_WORD_OVERLAP) -> np.ndarray:
+    """
+    단어 박스(N x 4, x/y/w/h)마다 가장 많이 겹치는 블록 인덱스를 구한다.
+    단어 x 블록 교차 면적을 한 번에 브로드캐스트로 계산하며,
+    어느 블록과도 min_overlap 미만으로 겹치는 단어는 -1을 받는다.
+    """
+    if len(word_boxes) == 0 or len(blocks) == 0:
+        return np.full(len(word_boxes), -1, dtype=np.intp)
 
-    for idx, block in enumerate(blocks, start=1):
-        x, y, w, h = block.as_bbox()
-        roi = image[y:y + h, x:x + w]
-        text = pytesseract.image_to_string(roi, lang=lang)
-        results.append({
-            "index": idx,
-            "bbox": {"x": x, "y": y, "w": w, "h": h},
-            "type": "text",  # 추후 수식/표 등으로 확장
-            "lang": lang,
-            "text": text.strip(),
-        })
+    boxes = block_boxes(blocks).astype(np.int64)
+    wx0, wy0 = word_boxes[:, 0:1], word_boxes[:, 1:2]
+    wx1, wy1 = wx0 + word_boxes[:, 2:3], wy0 + word_boxes[:, 3:4]
+    bx0, by0 = boxes[:, 0], boxes[:, 1]
+    bx1, by1 = bx0 + boxes[:, 2], by0 + boxes[:, 3]
 
+    inter_w = np.clip(np.minimum(wx1, bx1) - np.maximum(wx0, bx0), 0, None)
+    inter_h = np.clip(np.minimum(wy1, by1) - np.maximum(wy0, by0), 0, None)
+    overlap = inter_w * inter_h  # (단어 수, 블록 수)
+
+    word_area = np.maximum(word_boxes[:, 2] * word_boxes[:, 3], 1)
+    best = overlap.argmax(axis=1)
+    best_ratio = overlap[np.arange(len(word_boxes)), best] / word_area
+    return np.where(best_ratio >= min_overlap, best, -1)
+
+
+def ocr_blocks_single_pass(image_path: ImageInput,
+                           blocks: Sequence[Block],
+                           lang: str = "kor",
+                           engine: str = "auto") -> List[Dict]:
+    """
+    페이지 전체를 image_to_data로 한 번만 인식한 뒤 단어를 bbox 겹침으로 블록에 배정한다.
+    블록마다 Tesseract를 다시 돌리지 않으므로 블록 수가 많을수록 빠르다.
+    전체 패스에서 단어를 하나도 받지 못한 블록만 ROI 단위 OCR로 보완한다.
+    결과 형식은 ocr_blocks와 같다.
+    """
+    image = load_image(image_path)
+    ocr_engine = get_engine(engine)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    with stage("ocr_blocks", mode="page", blocks=len(blocks), pixels=image.shape[0] * image.shape[1]):
+        data = ocr_engine.image_to_data(Image.fromarray(rgb), lang)
+    lines = _words_by_block(data, blocks)
+
+    results: List[Dict] = []
+    fallback = 0
+    for idx, (block, block_lines) in enumerate(zip(blocks, lines), start=1):
+        if block_lines:
+            text = _join_lines(block_lines)
+        else:
+            text = _ocr_roi(ocr_engine, image, block, lang)
+            fallback += 1
+        results.append(_block_entry(idx, block, lang, text))
+
+    logger.debug(f"Single-pass block OCR: {len(blocks) - fallback}/{len(blocks)} block(s) "
+                 f"from page pass, {fallback} ROI fallback(s)")
     return results
 
 
-def extract_blocks_to_json(image_path: PathLike,
+def extract_blocks_to_json(image_path: ImageInput,
                            output_path: PathLike,
                            lang: str = "kor",
                            min_area: int = 800,
-                           merge_kernel: tuple[int, int] = (15, 7)) -> Path:
+                           merge_kernel: tuple[int, int] = (15, 7),
+                           engine: str = "auto",
+                           mode: str = "roi",
+                           workers: int = 1,
+                           coalesce: bool = True,
+                           executor: Executor | None = None) -> Path:
     """
     이미지 한 장을 블록 단위로 OCR하고 JSON 파일로 저장한다.
+    이미지는 한 번만 디코딩해 블록 감지와 OCR에 함께 사용한다.
+    mode="roi"는 블록마다 OCR, mode="page"는 페이지 전체를 한 번 인식해 블록에 배정한다.
+    workers/coalesce/executor는 mode="roi"에서 ocr_blocks에 그대로 넘긴다.
     """
-    blocks = detect_blocks(image_path, min_area=min_area, merge_kernel=merge_kernel)
-    ocr_results = ocr_blocks(image_path, blocks, lang=lang)
+    if mode not in BLOCK_OCR_MODES:
+        raise ValueError(f"지원하지 않는 블록 OCR 모드: {mode}")
+    image = load_image(image_path)
+    blocks = detect_blocks(image, min_area=min_area, merge_kernel=merge_kernel)
+    if mode == "page":
+        ocr_results = ocr_blocks_single_pass(image, blocks, lang=lang, engine=engine)
+    else:
+        ocr_results = ocr_blocks(image, blocks, lang=lang, engine=engine,
+                                 workers=workers, coalesce=coalesce, executor=executor)
 
     out_path = Path(output_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     payload = {
-        "source_image": str(Path(image_path).resolve()),
+        "source_image": describe_source(image_path),
         "block_count": len(ocr_results),
         "blocks": ocr_results,
     }
@@ -62,23 +307,58 @@ def extract_blocks_to_json(image_path: PathLike,
     return out_path
 
 
+def extract_blocks_dir(image_dir: PathLike,
+                       output_dir: PathLike,
+                       workers: int = 1,
+                       **kwargs) -> List[Path]:
+    """
+    디렉터리 안의 이미지(IMAGE_FORMATS 확장자)마다 extract_blocks_to_json을 실행해
+    <output_dir>/<이름>.json으로 저장한다. workers > 1이면 프로세스 풀 하나를 모든 이미지가 함께 쓴다.
+    나머지 인자는 extract_blocks_to_json에 그대로 넘긴다.
+    """
+    suffixes = {f".{ext}" for ext in IMAGE_FORMATS} | {".jpg", ".tif"}
+    images = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in suffixes)
+    out_dir = Path(output_dir)
+    with contextlib.ExitStack() as stack:
+        executor = stack.enter_context(create_ocr_pool(workers)) if resolve_workers(workers) > 1 else None
+        return [
+            extract_blocks_to_json(image, out_dir / f"{image.stem}.json", executor=executor, **kwargs)
+            for image in images
+        ]
+
+
 if __name__ == "__main__":  # pragma: no cover - CLI 헬퍼
     import argparse
 
     parser = argparse.ArgumentParser(description="단일 이미지에서 블록 OCR JSON 생성")
-    parser.add_argument("image", help="입력 이미지 경로 (PNG 등)")
-    parser.add_argument("-o", "--output", default="blocks.json", help="출력 JSON 경로")
+    parser.add_argument("image", help="입력 이미지 경로 (PNG 등) 또는 이미지 디렉터리")
+    parser.add_argument("-o", "--output", default=None,
+                        help="출력 JSON 경로 (기본: blocks.json), 디렉터리 입력이면 출력 디렉터리 (기본: blocks)")
     parser.add_argument("-l", "--lang", default="kor", help="OCR 언어 (기본: kor)")
     parser.add_argument("--min-area", type=int, default=800, help="감지 블록 최소 면적")
     parser.add_argument("--merge-kernel", type=int, nargs=2, default=(15, 7),
                         metavar=("W", "H"), help="팽창 커널 크기 (W H)")
+    parser.add_argument("--engine", choices=ENGINE_NAMES, default="auto",
+                        help="OCR 엔진 (기본: auto, tesserocr 설치 시 우선 사용)")
+    parser.add_argument("--mode", choices=BLOCK_OCR_MODES, default="roi",
+                        help="roi: 블록마다 OCR, page: 페이지 한 번 인식 후 블록에 배정 (기본: roi)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="roi 모드 OCR 프로세스 수, 0 = CPU마다 하나 (기본: 1)")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="작은 블록을 스트립으로 묶지 않고 블록마다 OCR")
 
     args = parser.parse_args()
-    out = extract_blocks_to_json(
-        args.image,
-        args.output,
+    options = dict(
         lang=args.lang,
         min_area=args.min_area,
         merge_kernel=tuple(args.merge_kernel),
+        engine=args.engine,
+        mode=args.mode,
+        coalesce=not args.no_coalesce,
     )
-    print(f"✓ 저장 완료: {out}")
+    if Path(args.image).is_dir():
+        outs = extract_blocks_dir(args.image, args.output or "blocks", workers=args.workers, **options)
+        print(f"✓ 저장 완료: {len(outs)}개 파일 → {args.output or 'blocks'}")
+    else:
+        out = extract_blocks_to_json(args.image, args.output or "blocks.json", workers=args.workers, **options)
+        print(f"✓ 저장 완료: {out}")
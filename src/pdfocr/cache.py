@@ -0,0 +1,181 @@
+"""
+Content-addressed on-disk cache for OCR results.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict
+
+from pdfocr.types import PathLike
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = "ocr_cache.sqlite3"
+# Bump when the stored text for an unchanged page/settings combination may differ
+CACHE_SCHEMA_VERSION = 1
+DEFAULT_CACHE_MB = 512
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    path: Path
+    max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024
+
+    @classmethod
+    def from_dir(cls, cache_dir: PathLike, max_mb: int = DEFAULT_CACHE_MB) -> "CacheConfig":
+        path = Path(cache_dir).expanduser().resolve() / CACHE_FILENAME
+        return cls(path, max_mb * 1024 * 1024)
+
+
+def page_cache_key(image: Image.Image, lang: str, dpi: int | str | None, engine: str) -> str:
+    """
+    Hash rendered page pixels together with the OCR settings.
+
+    Args:
+        image: Page image
+        lang: OCR language code
+        dpi: Rendering resolution, or a description of the resolution policy (None when unknown)
+        engine: OCR backend name and version
+
+    Returns:
+        Hex digest identifying this page/settings combination
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_SCHEMA_VERSION}|{engine}|{lang}|{dpi}|".encode("utf-8"))
+    digest.update(f"{image.mode}|{image.size[0]}x{image.size[1]}|".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    SQLite-backed OCR text cache with size-bounded LRU eviction.
+
+    Safe to share between processes: every worker opens its own connection
+    and SQLite serializes writers.
+    """
+
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        config.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(config.path), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._track_size()
+        self.hits = 0
+        self.misses = 0
+
+    def _track_size(self) -> None:
+        # Triggers keep the stored size in counters["bytes"], so eviction does
+        # not sum the whole table on every put, whichever process wrote the rows
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN"
+                " UPDATE counters SET value = value + NEW.size WHERE name = 'bytes'; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN"
+                " UPDATE counters SET value = value + NEW.size - OLD.size WHERE name = 'bytes'; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN"
+                " UPDATE counters SET value = value - OLD.size WHERE name = 'bytes'; END"
+            )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _count(self, name: str) -> None:
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT text FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            self._count("misses")
+            return None
+        self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        self._count("hits")
+        return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        size = len(text.encode("utf-8")) + len(key)
+        # An upsert, not INSERT OR REPLACE: replaced rows would skip the delete trigger
+        self._conn.execute(
+            "INSERT INTO entries (key, text, size, last_access) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET text = excluded.text, size = excluded.size, "
+            "last_access = excluded.last_access",
+            (key, text, size, time.time()),
+        )
+        self._evict()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.config.max_bytes:
+            return
+        excess = total - self.config.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        logger.debug(f"Evicted {len(victims)} cache entr(ies), {freed} bytes")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return entry count, stored bytes and lifetime hit/miss counters.
+        """
+        entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_open_caches: Dict[tuple[int, CacheConfig], OcrCache] = {}
+
+
+def open_cache(config: CacheConfig) -> OcrCache:
+    """
+    Return this process's cache handle for ``config``, opening it on first use.
+    """
+    # Keyed by pid so forked pool workers never reuse the parent's connection
+    key = (os.getpid(), config)
+    cache = _open_caches.get(key)
+    if cache is None:
+        cache = OcrCache(config)
+        _open_caches[key] = cache
+    return cache
@@ -0,0 +1,333 @@
+"""
+Pluggable OCR engine backends.
+
+``tesserocr`` keeps Tesseract loaded in-process and reuses one initialized
+API per language, so models are read once per worker instead of once per
+call. ``pytesseract`` launches a ``tesseract`` process per call and is the
+fallback when tesserocr is not installed.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+
+from pdfocr.limits import PageTimeout, remaining
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EngineImage = Union[str, "Image.Image"]
+OcrData = Dict[str, List]
+
+ENGINE_NAMES = ("auto", "tesserocr", "pytesseract")
+
+# Column layout of Tesseract's TSV output (same keys as pytesseract's Output.DICT)
+TSV_COLUMNS = (
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+)
+
+
+def parse_tsv(tsv: str, has_header: bool = True) -> OcrData:
+    """
+    Parse Tesseract TSV output into a dict of columns.
+
+    Numeric columns become ints (confidences truncated like pytesseract does),
+    the text column stays a string.
+    """
+    data: OcrData = {column: [] for column in TSV_COLUMNS}
+    lines = tsv.splitlines()
+    if has_header and lines:
+        lines = lines[1:]
+    for line in lines:
+        if not line.strip():
+            continue
+        cells = line.split("\t")
+        if len(cells) < len(TSV_COLUMNS):
+            cells += [""] * (len(TSV_COLUMNS) - len(cells))
+        for column, cell in zip(TSV_COLUMNS, cells):
+            if column == "text":
+                data[column].append(cell)
+            else:
+                try:
+                    data[column].append(int(float(cell)))
+                except ValueError:
+                    data[column].append(cell)
+    return data
+
+
+def data_to_text(data: OcrData) -> str:
+    """
+    Rebuild plain text from image_to_data output.
+
+    Words are joined per line; paragraphs and blocks are separated by a
+    blank line, close to what image_to_string returns.
+    """
+    paragraphs: List[List[str]] = []
+    lines: Dict[tuple, List[str]] = {}
+    current_par = None
+    for i, word in enumerate(data["text"]):
+        word = str(word).strip()
+        if not word:
+            continue
+        par = (data["block_num"][i], data["par_num"][i])
+        if par != current_par:
+            if lines:
+                paragraphs.append([" ".join(words) for words in lines.values()])
+            lines = {}
+            current_par = par
+        lines.setdefault(data["line_num"][i], []).append(word)
+    if lines:
+        paragraphs.append([" ".join(words) for words in lines.values()])
+    return "\n\n".join("\n".join(par) for par in paragraphs)
+
+
+def data_to_words(data: OcrData) -> List[Dict[str, object]]:
+    """
+    Recognized words of image_to_data output with their boxes and confidences.
+
+    Each word is a dict with "text", "conf", "bbox" ([x0, y0, x1, y1] in
+    page pixels) and the "block", "par" and "line" numbers it belongs to.
+    """
+    words = []
+    for i, word in enumerate(data["text"]):
+        word = str(word).strip()
+        if not word:
+            continue
+        left, top = data["left"][i], data["top"][i]
+        words.append({
+            "text": word,
+            "conf": round(float(data["conf"][i]), 2),
+            "bbox": [left, top, left + data["width"][i], top + data["height"][i]],
+            "block": data["block_num"][i],
+            "par": data["par_num"][i],
+            "line": data["line_num"][i],
+        })
+    return words
+
+
+def mean_confidence(data: OcrData) -> float | None:
+    """
+    Mean word confidence (0-100) of image_to_data output, None without words.
+    """
+    confs = [
+        float(conf) for conf, word in zip(data["conf"], data["text"])
+        if str(word).strip() and float(conf) >= 0
+    ]
+    if not confs:
+        return None
+    return sum(confs) / len(confs)
+
+
+def _uncompressed(image: Image.Image) -> Image.Image:
+    # pytesseract hands in-memory images to tesseract through a temp file
+    # written in image.format (PNG when unset); PPM skips the compression.
+    if image.mode in ("1", "L", "RGB") and image.format != "PPM":
+        image.format = "PPM"
+    return image
+
+
+class OcrEngine:
+    """
+    Base class for OCR backends.
+
+    Images are file paths or PIL images; ``lang`` uses Tesseract codes
+    such as ``"eng+kor"``. Calls made under limits.deadline() are aborted
+    with PageTimeout when the deadline passes.
+    """
+
+    name = "base"
+
+    def image_to_string(self, image: EngineImage, lang: str) -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: EngineImage, lang: str) -> OcrData:
+        raise NotImplementedError
+
+    def detect_script(self, image: EngineImage) -> Tuple[str, float]:
+        """
+        Dominant script of a page and its confidence, from Tesseract's OSD.
+
+        Needs the ``osd`` traineddata; raises when it is not installed.
+        """
+        raise NotImplementedError
+
+    def version(self) -> str:
+        raise NotImplementedError
+
+    def cache_tag(self) -> str:
+        """
+        Backend name and version, part of OCR cache keys.
+        """
+        return f"{self.name} {self.version()}"
+
+
+class PytesseractEngine(OcrEngine):
+    """
+    One ``tesseract`` subprocess per call via pytesseract.
+    """
+
+    name = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+        self._pytesseract = pytesseract
+
+    def _prepare(self, image: EngineImage) -> EngineImage:
+        from PIL import Image
+
+        if isinstance(image, Image.Image):
+            return _uncompressed(image)
+        # Let tesseract read the file itself instead of decoding and re-encoding it here
+        return str(image)
+
+    def _run(self, function, image: EngineImage, lang: str, **kwargs):
+        timeout = remaining()
+        try:
+            # pytesseract kills tesseract when the timeout expires (0 = no limit)
+            return function(self._prepare(image), lang=lang, timeout=timeout or 0, **kwargs)
+        except RuntimeError as exc:
+            if timeout is not None and "timeout" in str(exc).lower():
+                raise PageTimeout(f"OCR exceeded the page time limit ({exc})") from exc
+            raise
+
+    def image_to_string(self, image: EngineImage, lang: str) -> str:
+        return self._run(self._pytesseract.image_to_string, image, lang)
+
+    def image_to_data(self, image: EngineImage, lang: str) -> OcrData:
+        return self._run(self._pytesseract.image_to_data, image, lang, output_type=self._pytesseract.Output.DICT)
+
+    def detect_script(self, image: EngineImage) -> Tuple[str, float]:
+        osd = self._run(self._pytesseract.image_to_osd, image, "osd", output_type=self._pytesseract.Output.DICT)
+        return str(osd["script"]), float(osd["script_conf"])
+
+    def version(self) -> str:
+        try:
+            return str(self._pytesseract.get_tesseract_version())
+        except Exception:
+            return "unknown"
+
+
+class TesserocrEngine(OcrEngine):
+    """
+    In-process Tesseract through tesserocr, one initialized API per language.
+
+    The C API is not thread-safe, so APIs are kept per thread.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+
+    def _api(self, lang: str):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get(lang)
+        if api is None:
+            logger.debug(f"Loading Tesseract models for: {lang}")
+            api = self._tesserocr.PyTessBaseAPI(lang=lang)
+            apis[lang] = api
+        return api
+
+    def _osd_api(self):
+        api = getattr(self._local, "osd", None)
+        if api is None:
+            api = self._local.osd = self._tesserocr.PyTessBaseAPI(lang="osd", psm=self._tesserocr.PSM.OSD_ONLY)
+        return api
+
+    def _set_image(self, api, image: EngineImage) -> None:
+        from PIL import Image
+
+        if isinstance(image, Image.Image):
+            api.SetImage(image)
+        else:
+            api.SetImageFile(str(image))
+
+    def _recognize(self, api) -> None:
+        timeout = remaining()
+        if timeout is None:
+            api.Recognize()
+        elif not api.Recognize(int(timeout * 1000)):
+            # Tesseract's progress monitor cancelled recognition
+            raise PageTimeout("OCR exceeded the page time limit")
+
+    def image_to_string(self, image: EngineImage, lang: str) -> str:
+        api = self._api(lang)
+        try:
+            self._set_image(api, image)
+            self._recognize(api)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, image: EngineImage, lang: str) -> OcrData:
+        api = self._api(lang)
+        try:
+            self._set_image(api, image)
+            self._recognize(api)
+            return parse_tsv(api.GetTSVText(0), has_header=False)
+        finally:
+            api.Clear()
+
+    def detect_script(self, image: EngineImage) -> Tuple[str, float]:
+        api = self._osd_api()
+        try:
+            self._set_image(api, image)
+            osd = api.DetectOrientationScript()
+        finally:
+            api.Clear()
+        if not osd:
+            raise RuntimeError("script detection found no text")
+        return str(osd["script_name"]), float(osd["script_conf"])
+
+    def version(self) -> str:
+        return self._tesserocr.tesseract_version().splitlines()[0]
+
+
+ENGINES = {
+    "tesserocr": TesserocrEngine,
+    "pytesseract": PytesseractEngine,
+}
+
+_engines: Dict[str, OcrEngine] = {}
+
+
+def get_engine(name: str = "auto") -> OcrEngine:
+    """
+    Return this process's engine instance, creating it on first use.
+
+    Args:
+        name: "tesserocr", "pytesseract" or "auto" (tesserocr when installed,
+            otherwise pytesseract)
+
+    Returns:
+        OcrEngine instance shared by all calls in the process
+    """
+    if name not in ENGINE_NAMES:
+        raise ValueError(f"Unknown OCR engine: {name}")
+
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+
+    if name == "auto":
+        try:
+            engine = TesserocrEngine()
+        except ImportError:
+            engine = get_engine("pytesseract")
+    else:
+        try:
+            engine = ENGINES[name]()
+        except ImportError as exc:
+            raise RuntimeError(f"OCR engine '{name}' is not installed: {exc}") from exc
+
+    _engines[name] = engine
+    logger.debug(f"OCR engine: {engine.name}")
+    return engine
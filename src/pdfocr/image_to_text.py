@@ -1,73 +1,288 @@
 """
 Extract text from images using OCR.
 """
+from __future__ import annotations
+
 import logging
+from functools import partial
 from pathlib import Path
-from typing import Dict, Sequence
-
-import pytesseract
-from PIL import Image
+from typing import TYPE_CHECKING, Dict, Sequence, TextIO, Tuple, Union
 
+from pdfocr.cache import CacheConfig, open_cache, page_cache_key
+from pdfocr.engines import OcrData, get_engine
+from pdfocr.limits import deadline
+from pdfocr.metrics import image_pixels, stage
+from pdfocr.parallel import create_ocr_pool
 from pdfocr.types import PathLike
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from pdfocr.prefilter import PageFilter
+
 TextDict = Dict[str, str]
+ImageSource = Union[PathLike, "Image.Image"]
 logger = logging.getLogger(__name__)
 
 
-def extract_text_from_image(image_path: PathLike, lang: str = "kor") -> str:
+def _preprocess_tag(dpi: int | str | None, preprocess: Sequence[str]) -> int | str | None:
+    # Preprocessing changes the OCR input, so its steps are part of the cache key
+    if not preprocess:
+        return dpi
+    return f"{dpi} pre={'+'.join(preprocess)}"
+
+
+def extract_text_from_image(image_path: ImageSource,
+                            lang: str = "kor",
+                            engine: str = "auto",
+                            preprocess: Sequence[str] = ()) -> str:
     """
     Extract text from a single image.
     
     Args:
-        image_path: Path to image file
+        image_path: Path to image file, or an already loaded PIL image
         lang: OCR language code (default: "kor")
+        engine: OCR backend, see engines.get_engine (default: "auto")
+        preprocess: Steps of pipeline.PREPROCESS_STEPS to run first (default: none)
     
     Returns:
         Extracted text
     """
+    from PIL import Image
+
+    ocr_engine = get_engine(engine)
+    if isinstance(image_path, Image.Image):
+        try:
+            if preprocess:
+                from pdfocr.preprocess import preprocess_image
+                image_path = preprocess_image(image_path, preprocess)[0]
+            with stage("ocr", engine=ocr_engine.name, pixels=image_pixels(image_path)):
+                return ocr_engine.image_to_string(image_path, lang)
+        except Exception as exc:
+            raise RuntimeError(f"Text extraction failed for in-memory image: {exc}") from exc
+
     image_path = Path(image_path)
     if not image_path.exists():
         raise FileNotFoundError(f"Image file not found: {image_path}")
+    if preprocess:
+        with Image.open(image_path) as image:
+            return extract_text_from_image(image, lang=lang, engine=engine, preprocess=preprocess)
 
     try:
-        with Image.open(image_path) as image:
-            text = pytesseract.image_to_string(image, lang=lang)
-        return text
+        with stage("ocr", engine=ocr_engine.name, image=image_path.name):
+            return ocr_engine.image_to_string(str(image_path), lang)
     except Exception as exc:
         raise RuntimeError(f"Text extraction failed for {image_path}: {exc}") from exc
 
 
-def extract_text_from_images(image_paths: Sequence[PathLike], lang: str = "kor") -> TextDict:
+def extract_page_data(image: Image.Image,
+                      lang: str = "kor",
+                      engine: str = "auto",
+                      preprocess: Sequence[str] = ()) -> OcrData:
+    """
+    Run Tesseract on an in-memory image and return its word-level output.
+    
+    Args:
+        image: Page image
+        lang: OCR language code (default: "kor")
+        engine: OCR backend, see engines.get_engine (default: "auto")
+        preprocess: Steps of pipeline.PREPROCESS_STEPS to run first (default: none)
+    
+    Returns:
+        image_to_data columns (words, boxes, confidences); boxes are in
+        coordinates of ``image`` even when preprocessing cropped or rotated it
+    """
+    ocr_engine = get_engine(engine)
+    try:
+        transform = None
+        if preprocess:
+            from pdfocr.preprocess import preprocess_image
+            image, transform = preprocess_image(image, preprocess)
+        with stage("ocr", engine=ocr_engine.name, pixels=image_pixels(image)):
+            data = ocr_engine.image_to_data(image, lang)
+        return transform.map_data(data) if transform is not None else data
+    except Exception as exc:
+        raise RuntimeError(f"Text extraction failed for in-memory image: {exc}") from exc
+
+
+def extract_text_cached(image_path: ImageSource,
+                        lang: str = "kor",
+                        dpi: int | None = None,
+                        cache: CacheConfig | None = None,
+                        engine: str = "auto",
+                        preprocess: Sequence[str] = ()) -> Tuple[str, bool]:
+    """
+    Extract text from a single image, consulting the OCR cache first.
+    
+    Args:
+        image_path: Path to image file, or an already loaded PIL image
+        lang: OCR language code (default: "kor")
+        dpi: Resolution the image was rendered at (part of the cache key)
+        cache: OCR cache settings (default: no cache)
+        engine: OCR backend, see engines.get_engine (default: "auto")
+        preprocess: Steps of pipeline.PREPROCESS_STEPS to run before OCR
+            (part of the cache key; default: none)
+    
+    Returns:
+        Tuple of (extracted text, whether it came from the cache)
+    """
+    if cache is None:
+        return extract_text_from_image(image_path, lang=lang, engine=engine, preprocess=preprocess), False
+
+    from PIL import Image
+
+    if not isinstance(image_path, Image.Image):
+        path = Path(image_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Image file not found: {path}")
+        with Image.open(path) as image:
+            return extract_text_cached(image, lang=lang, dpi=dpi, cache=cache, engine=engine,
+                                       preprocess=preprocess)
+
+    ocr_cache = open_cache(cache)
+    ocr_engine = get_engine(engine)
+    key = page_cache_key(image_path, lang, _preprocess_tag(dpi, preprocess), ocr_engine.cache_tag())
+    text = ocr_cache.get(key)
+    if text is not None:
+        return text, True
+
+    text = extract_text_from_image(image_path, lang=lang, engine=engine, preprocess=preprocess)
+    ocr_cache.put(key, text)
+    return text, False
+
+
+def _extract_or_empty(image_path: ImageSource,
+                      lang: str,
+                      dpi: int | None = None,
+                      cache: CacheConfig | None = None,
+                      engine: str = "auto",
+                      timeout: float | None = None) -> str:
+    try:
+        with deadline(timeout):
+            return extract_text_cached(image_path, lang=lang, dpi=dpi, cache=cache, engine=engine)[0]
+    except Exception as exc:
+        logger.error(f"Error: {exc}")
+        return ""
+
+
+def extract_text_from_images(image_paths: Sequence[PathLike],
+                             lang: str = "kor",
+                             workers: int = 1,
+                             dpi: int | None = None,
+                             cache: CacheConfig | None = None,
+                             engine: str = "auto",
+                             page_filter: PageFilter | None = None,
+                             timeout: float | None = None,
+                             max_memory_mb: int | None = None) -> TextDict:
     """
     Extract text from multiple images.
     
     Args:
         image_paths: List of image file paths
         lang: OCR language code (default: "kor")
+        workers: Number of OCR processes (default: 1, 0 = one per CPU)
+        dpi: Resolution the images were rendered at (part of the cache key)
+        cache: OCR cache settings (default: no cache)
+        engine: OCR backend, see engines.get_engine (default: "auto")
+        page_filter: Skip blank images and reuse the text of images already
+            seen by this filter instead of OCRing them (default: OCR all)
+        timeout: Seconds allowed to OCR one image; images that take longer
+            are given up and left empty (default: no limit)
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
     
     Returns:
-        Dictionary mapping image paths to extracted text
+        Dictionary mapping image paths to extracted text, in input order
     """
     image_paths = [Path(p) for p in image_paths]
+    if page_filter is not None:
+        return _extract_prefiltered(image_paths, page_filter, lang=lang, workers=workers,
+                                    dpi=dpi, cache=cache, engine=engine, timeout=timeout,
+                                    max_memory_mb=max_memory_mb)
+
     logger.info(f"Starting OCR (language: {lang})")
     logger.info(f"Processing {len(image_paths)} image(s)")
     
     results: TextDict = {}
+
+    if workers != 1 and len(image_paths) > 1:
+        with create_ocr_pool(workers, max_memory_mb) as pool:
+            texts = pool.map(partial(_extract_or_empty, lang=lang, dpi=dpi, cache=cache, engine=engine,
+                                     timeout=timeout), image_paths)
+            for image_path, text in zip(image_paths, texts):
+                results[str(image_path)] = text
+        logger.info("OCR extraction completed")
+        return results
     
     for i, image_path in enumerate(image_paths, start=1):
         logger.debug(f"[{i}/{len(image_paths)}] Processing: {image_path.name}")
-        try:
-            text = extract_text_from_image(image_path, lang=lang)
-            results[str(image_path)] = text
-            logger.debug(f"Extracted {len(text)} characters")
-        except Exception as exc:
-            logger.error(f"Error: {exc}")
-            results[str(image_path)] = ""
+        text = _extract_or_empty(image_path, lang, dpi=dpi, cache=cache, engine=engine, timeout=timeout)
+        results[str(image_path)] = text
+        logger.debug(f"Extracted {len(text)} characters")
     
     logger.info("OCR extraction completed")
     return results
 
 
+def _extract_prefiltered(image_paths: Sequence[Path],
+                         page_filter: PageFilter,
+                         **ocr_kwargs) -> TextDict:
+    from pdfocr.prefilter import PAGE_BLANK, PAGE_OCR
+
+    plan = []
+    to_ocr = []
+    for image_path in image_paths:
+        try:
+            status, ref = page_filter.classify(image_path)
+        except Exception as exc:
+            # Let the OCR step report unreadable images as usual
+            logger.debug(f"Prefilter skipped {image_path}: {exc}")
+            status, ref = PAGE_OCR, None
+        plan.append((image_path, status, ref))
+        if status == PAGE_OCR:
+            to_ocr.append(image_path)
+
+    texts = extract_text_from_images(to_ocr, **ocr_kwargs) if to_ocr else {}
+
+    results: TextDict = {}
+    for image_path, status, ref in plan:
+        if status == PAGE_OCR:
+            text = texts[str(image_path)]
+            if ref is not None:
+                page_filter.record(ref, text)
+        elif status == PAGE_BLANK:
+            text = ""
+        else:
+            text = page_filter.text(ref)
+        results[str(image_path)] = text
+    logger.info(page_filter.summary())
+    return results
+
+
+def write_page_text(f: TextIO,
+                    page_number: int,
+                    page_name: str,
+                    text: str,
+                    source: str | None = None) -> None:
+    """
+    Append one page section to an open text file.
+    
+    Args:
+        f: Text file opened for writing
+        page_number: 1-based page number shown in the header
+        page_name: Page label shown in the header (image file name)
+        text: Extracted text
+        source: How the text was obtained (e.g. "ocr", "text-layer"), shown in the header when given
+    """
+    header = f"Page {page_number}: {page_name}"
+    if source:
+        header += f" [{source}]"
+    f.write(f"{'='*80}\n")
+    f.write(f"{header}\n")
+    f.write(f"{'='*80}\n\n")
+    f.write(text)
+    f.write("\n\n\n")
+
+
 def save_extracted_text(text_dict: TextDict, output_path: PathLike = "output/extracted_text.txt") -> None:
     """
     Save extracted text to a file.
@@ -85,14 +300,9 @@ def save_extracted_text(text_dict: TextDict, output_path: PathLike = "output/ext
     
     logger.info(f"Saving text file: {output_path}")
     
-    with output_path.open('w', encoding='utf-8') as f:
+    with stage("write", pages=len(text_dict)), output_path.open('w', encoding='utf-8') as f:
         for i, (image_path, text) in enumerate(sorted(text_dict.items()), start=1):
-            page_name = Path(image_path).name
-            f.write(f"{'='*80}\n")
-            f.write(f"Page {i}: {page_name}\n")
-            f.write(f"{'='*80}\n\n")
-            f.write(text)
-            f.write("\n\n\n")
+            write_page_text(f, i, Path(image_path).name, text)
     
     logger.info(f"Saved: {output_path}")
 
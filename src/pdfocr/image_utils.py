@@ -2,12 +2,17 @@
 Shared image loading utilities.
 """
 from pathlib import Path
+from typing import Union
 
 import cv2
 import numpy as np
+from PIL import Image
 
 from pdfocr.types import PathLike
 
+# 경로뿐 아니라 래스터라이저가 넘겨준 메모리 이미지도 그대로 받는다
+ImageInput = Union[PathLike, np.ndarray, Image.Image]
+
 
 def read_image(path: PathLike) -> np.ndarray:
     """
@@ -17,3 +22,47 @@ def read_image(path: PathLike) -> np.ndarray:
     if image is None:
         raise FileNotFoundError(f"이미지를 읽을 수 없습니다: {path}")
     return image
+
+
+def load_image(source: ImageInput) -> np.ndarray:
+    """
+    Return a BGR array for a path, a BGR/grayscale array or a PIL image.
+
+    Arrays are returned as-is (no copy), so in-memory pages skip PNG decoding.
+    """
+    if isinstance(source, np.ndarray):
+        if source.ndim == 2:
+            return cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+        return source
+    if isinstance(source, Image.Image):
+        rgb = np.asarray(source.convert("RGB"))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    return read_image(source)
+
+
+def load_gray(source: ImageInput) -> np.ndarray:
+    """
+    Return a grayscale array for any image source.
+
+    Grayscale arrays and PIL "L" images (e.g. pages rasterized in grayscale)
+    are used without conversion; files are decoded straight to grayscale.
+    """
+    if isinstance(source, np.ndarray):
+        if source.ndim == 2:
+            return source
+        return cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+    if isinstance(source, Image.Image):
+        return np.asarray(source if source.mode == "L" else source.convert("L"))
+    image = cv2.imread(str(Path(source)), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise FileNotFoundError(f"이미지를 읽을 수 없습니다: {source}")
+    return image
+
+
+def describe_source(source: ImageInput) -> str | None:
+    """
+    Return the resolved file path of an image source, or None for in-memory images.
+    """
+    if isinstance(source, (np.ndarray, Image.Image)):
+        return None
+    return str(Path(source).resolve())
@@ -0,0 +1,471 @@
+"""
+Page-level job queue in a shared SQLite file, for spreading OCR over many hosts.
+
+A coordinator runs ``pdfocr enqueue`` to register PDFs; every page that
+still needs OCR becomes a task. Any number of ``pdfocr worker`` processes,
+on any host that sees the same queue file and PDFs, claim tasks under a
+time-limited lease. A task whose lease expires (crashed worker, lost node)
+is handed out again, up to a maximum number of attempts. ``pdfocr assemble``
+writes the text file of every document whose pages are all finished.
+
+The queue uses SQLite's rollback journal instead of WAL, because WAL needs
+shared memory that network file systems do not provide.
+"""
+import argparse
+import dataclasses
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from pdfocr.cache import DEFAULT_CACHE_MB, CacheConfig
+from pdfocr.limits import set_memory_limit
+from pdfocr.parallel import create_ocr_pool, resolve_workers
+from pdfocr.pdf_to_image import get_page_count, page_image_name
+from pdfocr.pipeline import (
+    SOURCE_FAILED,
+    OcrOptions,
+    PageResult,
+    PageTask,
+    add_ocr_arguments,
+    ocr_options_from_args,
+    ocr_pdf_page,
+    save_page_results,
+    text_layer_results,
+)
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed page may take before another worker may take it over
+DEFAULT_LEASE_S = 600
+# Claims per page before it is given up and marked failed
+DEFAULT_MAX_ATTEMPTS = 3
+# Seconds an idle worker waits before looking for new tasks (with --wait)
+POLL_INTERVAL = 5.0
+
+TASK_PENDING = "pending"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    pdf_path TEXT NOT NULL UNIQUE,
+    output_path TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    use_text_layer INTEGER NOT NULL,
+    skip_blank INTEGER NOT NULL,
+    assembled INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    doc_id INTEGER NOT NULL REFERENCES documents(id),
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    text TEXT,
+    source TEXT,
+    dpi INTEGER,
+    confidence REAL,
+    error TEXT,
+    PRIMARY KEY (doc_id, page)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until);
+"""
+
+
+@dataclass(frozen=True)
+class Claim:
+    doc_id: int
+    page: int
+    pdf_path: Path
+    options: OcrOptions
+    skip_blank: bool
+    attempt: int
+
+
+def worker_id() -> str:
+    """
+    Identify this process across hosts (hostname:pid).
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _options_json(options: OcrOptions) -> str:
+    # Each worker brings its own cache, so it is not part of the job
+    return json.dumps(dataclasses.asdict(dataclasses.replace(options, cache=None)))
+
+
+def _options_from_json(value: str) -> OcrOptions:
+    fields = json.loads(value)
+    # JSON has no tuples
+    fields["preprocess"] = tuple(fields.get("preprocess", ()))
+    return OcrOptions(**fields)
+
+
+class JobQueue:
+    """
+    Handle to a queue file; open one per process.
+
+    Args:
+        path: SQLite file on storage shared by the coordinator and all workers
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path).expanduser().resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def enqueue(self,
+                pdf_path: PathLike,
+                output_path: PathLike,
+                options: OcrOptions,
+                use_text_layer: bool = False,
+                skip_blank: bool = False) -> int | None:
+        """
+        Register a PDF and queue its pages.
+
+        Pages with a usable text layer (when use_text_layer is set) are
+        stored as finished right away.
+
+        Returns:
+            Number of pages queued for OCR, or None when the PDF was already queued
+        """
+        pdf_path = Path(pdf_path).expanduser().resolve()
+        page_count = get_page_count(pdf_path)
+        known = text_layer_results(pdf_path) if use_text_layer else {}
+
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO documents"
+                " (pdf_path, output_path, page_count, options, use_text_layer, skip_blank)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (str(pdf_path), str(Path(output_path).expanduser().resolve()), page_count,
+                 _options_json(options), int(use_text_layer), int(skip_blank)),
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute("ROLLBACK")
+                return None
+            doc_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO tasks (doc_id, page, status, text, source) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (doc_id, page, TASK_DONE, known[page].text, known[page].source) if page in known
+                    else (doc_id, page, TASK_PENDING, None, None)
+                    for page in range(1, page_count + 1)
+                ],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return page_count - len(known)
+
+    def claim(self,
+              worker: str,
+              lease_s: float = DEFAULT_LEASE_S,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Claim | None:
+        """
+        Lease the next pending page, or a page whose lease has expired.
+
+        Returns:
+            The claimed page, or None when nothing is claimable right now
+        """
+        while True:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT t.doc_id, t.page, t.attempts, d.pdf_path, d.options, d.skip_blank"
+                    " FROM tasks t JOIN documents d ON d.id = t.doc_id"
+                    " WHERE t.status = ? OR (t.status = ? AND t.lease_until < ?)"
+                    " ORDER BY t.doc_id, t.page LIMIT 1",
+                    (TASK_PENDING, TASK_LEASED, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                doc_id, page, attempts, pdf_path, options, skip_blank = row
+                if attempts >= max_attempts:
+                    self._conn.execute(
+                        "UPDATE tasks SET status = ?, worker = NULL, lease_until = NULL, error = ?"
+                        " WHERE doc_id = ? AND page = ?",
+                        (TASK_FAILED, f"lease expired {attempts} time(s)", doc_id, page),
+                    )
+                    self._conn.execute("COMMIT")
+                    logger.warning(f"Giving up on page {page} of {Path(pdf_path).name} after {attempts} attempt(s)")
+                    continue
+                self._conn.execute(
+                    "UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1"
+                    " WHERE doc_id = ? AND page = ?",
+                    (TASK_LEASED, worker, now + lease_s, doc_id, page),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return Claim(doc_id, page, Path(pdf_path), _options_from_json(options),
+                         bool(skip_blank), attempts + 1)
+
+    def complete(self, claim: Claim, worker: str, result: PageResult) -> bool:
+        """
+        Store the result of a claimed page.
+
+        Returns:
+            False when the lease was lost to another worker in the meantime
+        """
+        cursor = self._conn.execute(
+            "UPDATE tasks SET status = ?, lease_until = NULL, text = ?, source = ?, dpi = ?, confidence = ?"
+            " WHERE doc_id = ? AND page = ? AND status = ? AND worker = ?",
+            (TASK_DONE, result.text, result.source, result.dpi, result.confidence,
+             claim.doc_id, claim.page, TASK_LEASED, worker),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, claim: Claim, worker: str, error: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        """
+        Give a claimed page back after an error; it fails for good after max_attempts.
+        """
+        status = TASK_FAILED if claim.attempt >= max_attempts else TASK_PENDING
+        self._conn.execute(
+            "UPDATE tasks SET status = ?, worker = NULL, lease_until = NULL, error = ?"
+            " WHERE doc_id = ? AND page = ? AND status = ? AND worker = ?",
+            (status, error, claim.doc_id, claim.page, TASK_LEASED, worker),
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of tasks per status.
+        """
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+        return {status: count for status, count in rows}
+
+    def remaining(self) -> int:
+        """
+        Number of tasks not finished yet (pending or leased).
+        """
+        counts = self.counts()
+        return counts.get(TASK_PENDING, 0) + counts.get(TASK_LEASED, 0)
+
+    def assemble(self, doc_id: int | None = None) -> List[Path]:
+        """
+        Write the text file of every finished, not yet assembled document.
+
+        Each document is claimed for assembly in a transaction, so concurrent
+        callers never write the same output twice.
+
+        Args:
+            doc_id: Only consider this document (default: all)
+
+        Returns:
+            Output paths written by this call
+        """
+        written = []
+        query = ("SELECT id, pdf_path, output_path, page_count FROM documents d WHERE assembled = 0"
+                 " AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.doc_id = d.id AND t.status IN (?, ?))")
+        params: tuple = (TASK_PENDING, TASK_LEASED)
+        if doc_id is not None:
+            query += " AND id = ?"
+            params += (doc_id,)
+        for doc, pdf_path, output_path, page_count in self._conn.execute(query, params).fetchall():
+            cursor = self._conn.execute("UPDATE documents SET assembled = 1 WHERE id = ? AND assembled = 0", (doc,))
+            if cursor.rowcount == 0:
+                continue
+            try:
+                written.append(self._write_document(doc, Path(pdf_path), Path(output_path)))
+            except BaseException:
+                self._conn.execute("UPDATE documents SET assembled = 0 WHERE id = ?", (doc,))
+                raise
+        return written
+
+    def _write_document(self, doc_id: int, pdf_path: Path, output_path: Path) -> Path:
+        rows = self._conn.execute(
+            "SELECT page, status, text, source, dpi, confidence, error FROM tasks WHERE doc_id = ? ORDER BY page",
+            (doc_id,),
+        ).fetchall()
+        results = []
+        for page, status, text, source, dpi, confidence, error in rows:
+            name = page_image_name(pdf_path.stem, page)
+            if status == TASK_FAILED:
+                logger.warning(f"{pdf_path.name} page {page} failed: {error}")
+                results.append(PageResult(page, name, "", SOURCE_FAILED))
+            else:
+                results.append(PageResult(page, name, text or "", source, dpi=dpi, confidence=confidence))
+        # Write next to the target and rename, so readers on other hosts never see a partial file
+        partial = output_path.with_name(output_path.name + ".partial")
+        save_page_results(results, partial, document=pdf_path.name)
+        os.replace(partial, output_path)
+        return output_path
+
+
+def _process_claim(claim: Claim, cache: CacheConfig | None) -> PageResult:
+    options = dataclasses.replace(claim.options, cache=cache)
+    task = PageTask(claim.pdf_path, claim.page, options, None, "png", claim.skip_blank)
+    return ocr_pdf_page(task)
+
+
+def run_worker(queue_path: PathLike,
+               cache: CacheConfig | None = None,
+               lease_s: float = DEFAULT_LEASE_S,
+               max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+               wait: bool = False,
+               assemble: bool = False) -> int:
+    """
+    Claim and OCR pages until the queue is drained.
+
+    Args:
+        queue_path: Shared queue file
+        cache: This host's OCR cache (default: none)
+        lease_s: Lease length in seconds; must exceed the slowest page
+        max_attempts: Claims per page before it is marked failed
+        wait: Keep polling for new tasks instead of exiting when none are left
+        assemble: Write a document's output as soon as its last page is done
+
+    Returns:
+        Number of pages this worker completed
+    """
+    queue = JobQueue(queue_path)
+    worker = worker_id()
+    done = 0
+    try:
+        while True:
+            claim = queue.claim(worker, lease_s, max_attempts)
+            if claim is None:
+                if wait or queue.remaining() > 0:
+                    # Leases held by others may still expire and come back
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                break
+            if not claim.pdf_path.exists():
+                queue.release(claim, worker, f"PDF not found on {socket.gethostname()}", max_attempts)
+                continue
+            try:
+                result = _process_claim(claim, cache)
+            except Exception as exc:
+                logger.error(f"Page {claim.page} of {claim.pdf_path.name} failed: {exc}")
+                queue.release(claim, worker, str(exc), max_attempts)
+                continue
+            if result.source == SOURCE_FAILED:
+                # Not even the reduced-DPI retry worked here; another attempt may run elsewhere
+                queue.release(claim, worker, "page could not be rendered or recognized", max_attempts)
+                continue
+            if not queue.complete(claim, worker, result):
+                logger.warning(f"Lease lost for page {claim.page} of {claim.pdf_path.name}; result dropped")
+                continue
+            done += 1
+            if assemble:
+                for path in queue.assemble(claim.doc_id):
+                    print(f"Completed: {path}")
+    finally:
+        queue.close()
+    return done
+
+
+def enqueue_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pdfocr enqueue",
+        description="Queue the pages of PDFs in a shared job queue for pdfocr worker processes",
+    )
+    parser.add_argument('pdf_files', nargs='+', help='PDF file path(s); must be readable by every worker host')
+    parser.add_argument('-q', '--queue', required=True, help='Queue file (SQLite) on shared storage')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='Output directory for text files (default: same as PDF)')
+    add_ocr_arguments(parser)
+    parser.add_argument('--text-layer', action='store_true',
+                        help='Take pages with a usable text layer as-is; only queue the others')
+    parser.add_argument('--prefilter', action='store_true', help='Let workers skip OCR of blank pages')
+    args = parser.parse_args(argv)
+
+    options = ocr_options_from_args(args)
+    queue = JobQueue(args.queue)
+    try:
+        for pdf_file in args.pdf_files:
+            pdf_path = Path(pdf_file).expanduser().resolve()
+            target_dir = pdf_path.parent if args.output_dir is None else Path(args.output_dir)
+            try:
+                queued = queue.enqueue(pdf_path, target_dir / f"{pdf_path.stem}.txt", options,
+                                       args.text_layer, args.prefilter)
+            except Exception as exc:
+                print(f"Error: {pdf_path.name} - {exc}")
+                continue
+            if queued is None:
+                print(f"Already queued: {pdf_path}")
+            else:
+                print(f"Queued {queued} page(s): {pdf_path}")
+        print(f"Queue {queue.path}: {queue.counts()}")
+    finally:
+        queue.close()
+
+
+def _run_worker_process(args: argparse.Namespace) -> int:
+    cache = CacheConfig.from_dir(args.cache_dir, args.cache_size) if args.cache_dir is not None else None
+    return run_worker(args.queue, cache, args.lease, args.max_attempts, args.wait, args.assemble)
+
+
+def worker_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pdfocr worker",
+        description="Claim and OCR pages from a shared job queue until it is drained",
+    )
+    parser.add_argument('-q', '--queue', required=True, help='Queue file (SQLite) on shared storage')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Worker processes on this host, 0 = one per CPU (default: 1)')
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE_S,
+                        help=f'Seconds before an unfinished page is handed to another worker (default: {DEFAULT_LEASE_S})')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f'Claims per page before it is marked failed (default: {DEFAULT_MAX_ATTEMPTS})')
+    parser.add_argument('--wait', action='store_true', help='Keep polling for new tasks instead of exiting')
+    parser.add_argument('--assemble', action='store_true',
+                        help='Write each document as soon as its last page is done')
+    parser.add_argument('--cache-dir', default=None, help='OCR result cache on this host (default: no cache)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MB,
+                        help=f'OCR cache size limit in MB (default: {DEFAULT_CACHE_MB})')
+    parser.add_argument('--max-memory', type=int, default=None, metavar='MB',
+                        help='Address-space limit of each worker process (default: none)')
+    args = parser.parse_args(argv)
+
+    workers = resolve_workers(args.workers)
+    if workers == 1:
+        set_memory_limit(args.max_memory)
+        done = _run_worker_process(args)
+    else:
+        with create_ocr_pool(workers, args.max_memory) as pool:
+            done = sum(pool.map(_run_worker_process, [args] * workers))
+    print(f"Worker finished: {done} page(s) processed on {socket.gethostname()}")
+
+
+def assemble_main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pdfocr assemble",
+        description="Write the text files of all documents whose pages are finished",
+    )
+    parser.add_argument('-q', '--queue', required=True, help='Queue file (SQLite) on shared storage')
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.queue)
+    try:
+        for path in queue.assemble():
+            print(f"Completed: {path}")
+        counts = queue.counts()
+        remaining = queue.remaining()
+    finally:
+        queue.close()
+    if counts.get(TASK_FAILED):
+        print(f"Warning: {counts[TASK_FAILED]} page(s) failed and were written as empty pages")
+    if remaining:
+        print(f"{remaining} page(s) still pending or leased; run assemble again when the workers are done")
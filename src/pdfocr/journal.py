@@ -0,0 +1,158 @@
+"""
+Per-document page journal that lets an interrupted run resume.
+
+Every finished page is committed to ``<output>.journal.sqlite3`` next to the
+text output. The journal is removed once the output file is complete, so a
+surviving journal marks a document that still needs work.
+"""
+import dataclasses
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Optional
+
+from pdfocr.pipeline import SOURCE_FAILED, OcrOptions, PageResult
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal.sqlite3"
+
+
+def journal_path(output_path: PathLike) -> Path:
+    """
+    Return the journal file that belongs to a text output.
+    """
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + JOURNAL_SUFFIX)
+
+
+def is_finished(output_path: PathLike) -> bool:
+    """
+    Return True when an output was completely written by an earlier run.
+
+    Outputs with failed pages keep their journal, so they are not finished.
+    """
+    return Path(output_path).exists() and not journal_path(output_path).exists()
+
+
+def run_settings(options: OcrOptions, use_text_layer: bool) -> str:
+    """
+    Describe the settings that affect page text; journals only resume under the same ones.
+    """
+    # The cache location and time limit do not change results
+    return f"{dataclasses.replace(options, cache=None, page_timeout=None)!r} text_layer={use_text_layer}"
+
+
+def _remove_journal(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.unlink(f"{path}{suffix}")
+        except FileNotFoundError:
+            pass
+
+
+def _pdf_fingerprint(pdf_path: Path) -> str:
+    stat = pdf_path.stat()
+    return f"{pdf_path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _details_value(result: PageResult) -> Optional[str]:
+    # Word boxes, page size and routed language, so resumed pages write the same output
+    if result.words is None and result.size is None and result.lang is None:
+        return None
+    return json.dumps({"words": result.words, "size": result.size, "lang": result.lang}, ensure_ascii=False)
+
+
+def _journaled_result(page: int,
+                      name: str,
+                      text: str,
+                      source: Optional[str],
+                      dpi: Optional[int],
+                      confidence: Optional[float],
+                      details: Optional[str]) -> PageResult:
+    result = PageResult(page, name, text, source, dpi=dpi, confidence=confidence)
+    if details is not None:
+        entry = json.loads(details)
+        result.words = entry["words"]
+        result.size = tuple(entry["size"]) if entry["size"] is not None else None
+        result.lang = entry["lang"]
+    return result
+
+
+class PageJournal:
+    """
+    SQLite journal of the finished pages of one document.
+
+    Args:
+        output_path: Text output the journal belongs to
+        pdf_path: Source PDF (its size and mtime are recorded)
+        settings: run_settings() of the current run
+        resume: Keep pages of an earlier run with the same PDF and settings;
+            otherwise any old journal is discarded
+    """
+
+    def __init__(self, output_path: PathLike, pdf_path: PathLike, settings: str, resume: bool = False):
+        self.path = journal_path(output_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not resume:
+            _remove_journal(self.path)
+
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " page INTEGER PRIMARY KEY, name TEXT NOT NULL, text TEXT NOT NULL,"
+            " source TEXT, dpi INTEGER, confidence REAL, details TEXT)"
+        )
+
+        fingerprint = f"{_pdf_fingerprint(Path(pdf_path))}|{settings}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is not None and row[0] != fingerprint:
+            logger.warning(f"PDF or settings changed since the journaled run; starting over: {self.path.name}")
+            self._conn.execute("DELETE FROM pages")
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+        # Pages of this run that failed; their document is not finished yet
+        self.failed = 0
+
+    def completed(self) -> Dict[int, PageResult]:
+        """
+        Return the pages finished so far, keyed by page number.
+        """
+        rows = self._conn.execute("SELECT page, name, text, source, dpi, confidence, details FROM pages")
+        return {
+            page: _journaled_result(page, name, text, source, dpi, confidence, details)
+            for page, name, text, source, dpi, confidence, details in rows
+        }
+
+    def record(self, result: PageResult) -> None:
+        """
+        Commit one finished page; failed pages are left for a resumed run to retry.
+        """
+        if result.source == SOURCE_FAILED:
+            self.failed += 1
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pages (page, name, text, source, dpi, confidence, details)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (result.page, result.name, result.text, result.source, result.dpi, result.confidence,
+             _details_value(result)),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def finish(self) -> None:
+        """
+        Close the journal after the output file was written, and delete it
+        unless pages failed: a kept journal makes --resume OCR those pages again.
+        """
+        self.close()
+        if self.failed:
+            logger.warning(f"{self.failed} failed page(s) kept in {self.path.name}; rerun with --resume to retry them")
+            return
+        _remove_journal(self.path)
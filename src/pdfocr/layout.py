@@ -3,13 +3,21 @@
 """
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Sequence
+from typing import Iterator, Sequence, Union, overload
 
 import cv2
+import numpy as np
 
-from pdfocr.image_utils import read_image
+from pdfocr.image_utils import ImageInput, load_gray, load_image
+from pdfocr.metrics import stage
 from pdfocr.types import PathLike
 
+# 감지는 이 배율로 축소한 흑백 이미지에서 수행한다 (300 DPI 페이지 → 150 DPI 상당)
+DEFAULT_DETECT_SCALE = 0.5
+# 적응형 이진화 창 크기와 상수 (원본 해상도 기준)
+THRESHOLD_WINDOW = 35
+THRESHOLD_C = 15
+
 
 @dataclass(frozen=True)
 class Block:
@@ -26,47 +34,150 @@ class Block:
         return self.x, self.y, self.w, self.h
 
 
-def detect_blocks(image_path: PathLike,
-                  min_area: int = 800,
-                  merge_kernel: tuple[int, int] = (15, 7)) -> List[Block]:
+class BlockArray(Sequence[Block]):
     """
-    간단한 형태학적 연산으로 텍스트/표 블록 후보를 감지한다.
-    - 흑백 변환 → 적응형 이진화 → 팽창으로 인접 문자/셀 병합 → 외곽선 감지
+    블록 목록을 (N, 4) int32 배열(x, y, w, h) 하나로 보관하는 시퀀스.
+    블록마다 파이썬 객체를 만들지 않고, 인덱싱/순회할 때만 Block을 돌려준다.
     """
-    path = Path(image_path)
-    image = read_image(path)
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 35, 15
-    )
+    def __init__(self, boxes: np.ndarray | None = None):
+        if boxes is None:
+            boxes = np.empty((0, 4), dtype=np.int32)
+        self.boxes = np.ascontiguousarray(boxes, dtype=np.int32).reshape(-1, 4)
+
+    @classmethod
+    def from_blocks(cls, blocks: Sequence[Block]) -> "BlockArray":
+        if isinstance(blocks, BlockArray):
+            return blocks
+        return cls(np.array([b.as_bbox() for b in blocks], dtype=np.int32))
+
+    @property
+    def areas(self) -> np.ndarray:
+        return self.boxes[:, 2].astype(np.int64) * self.boxes[:, 3]
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @overload
+    def __getitem__(self, index: int) -> Block: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "BlockArray": ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Block, "BlockArray"]:
+        if isinstance(index, slice):
+            return BlockArray(self.boxes[index])
+        return Block(*(int(v) for v in self.boxes[index]))
+
+    def __iter__(self) -> Iterator[Block]:
+        for x, y, w, h in self.boxes.tolist():
+            yield Block(x, y, w, h)
 
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, merge_kernel)
-    dilated = cv2.dilate(thresh, kernel, iterations=1)
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, BlockArray):
+            return np.array_equal(self.boxes, other.boxes)
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
 
-    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def __repr__(self) -> str:
+        return f"BlockArray({len(self)} blocks)"
 
-    blocks: List[Block] = []
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-        if w * h < min_area:
-            continue
-        blocks.append(Block(x, y, w, h))
 
-    # 좌상단→우하단 순서로 정렬
-    blocks.sort(key=lambda b: (b.y, b.x))
-    return blocks
+def block_boxes(blocks: Sequence[Block]) -> np.ndarray:
+    """
+    블록 목록을 (N, 4) 배열(x, y, w, h)로 반환한다. BlockArray는 복사 없이 그대로 쓴다.
+    """
+    return BlockArray.from_blocks(blocks).boxes
+
+
+def _drop_nested(boxes: np.ndarray) -> np.ndarray:
+    # findContours(RETR_EXTERNAL)처럼 다른 블록 안쪽(표 테두리 안의 셀 등)에 있는 블록은 버린다
+    if len(boxes) < 2:
+        return boxes
+    x0, y0 = boxes[:, 0].astype(np.int64), boxes[:, 1].astype(np.int64)
+    x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+    area = (x1 - x0) * (y1 - y0)
+    inside = (
+        (x0[:, None] >= x0[None, :]) & (y0[:, None] >= y0[None, :])
+        & (x1[:, None] <= x1[None, :]) & (y1[:, None] <= y1[None, :])
+        & (area[:, None] < area[None, :])
+    )
+    return boxes[~inside.any(axis=1)]
+
+
+def ink_mask(gray: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """
+    적응형 이진화로 잉크(글자/선) 픽셀은 255, 배경은 0인 마스크를 만든다.
+    scale은 원본 해상도 대비 gray의 배율이며, 이진화 창을 그만큼 줄인다.
+    """
+    window = max(3, round(THRESHOLD_WINDOW * scale)) | 1
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, window, THRESHOLD_C
+    )
 
 
-def draw_blocks(image_path: PathLike, blocks: Sequence[Block], output_path: PathLike) -> Path:
+def detect_blocks(image_path: ImageInput,
+                  min_area: int = 800,
+                  merge_kernel: tuple[int, int] = (15, 7),
+                  scale: float = DEFAULT_DETECT_SCALE) -> BlockArray:
+    """
+    간단한 형태학적 연산으로 텍스트/표 블록 후보를 감지한다.
+    - 흑백 변환 → 축소 → 적응형 이진화 → 팽창으로 인접 문자/셀 병합 → 연결 요소 통계
+    - 이진화 창과 팽창 커널은 축소 배율에 맞춰 줄이고, bbox는 원본 해상도로 되돌린다.
+    - 면적 필터와 정렬은 배열 연산으로 처리한다. min_area는 원본 해상도 기준이다.
+    - 흑백 이미지(2차원 배열, PIL "L")는 변환 없이, 경로는 흑백으로 바로 디코딩한다.
+    - scale=1.0이면 축소 없이 원본 해상도에서 감지한다.
+    """
+    if not 0 < scale <= 1:
+        raise ValueError(f"scale은 0보다 크고 1 이하여야 합니다: {scale}")
+    with stage("detect_blocks", scale=scale) as record:
+        gray = load_gray(image_path)
+        height, width = gray.shape[:2]
+        small = gray
+        if scale < 1:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        # 실제 축소 비율 (반올림된 크기 기준)
+        sx, sy = width / small.shape[1], height / small.shape[0]
+
+        thresh = ink_mask(small, 1 / sx)
+
+        # 내림: 축소 이미지의 흐린 획 가장자리가 이미 간격을 조금 메운다
+        kernel_size = (max(1, int(merge_kernel[0] / sx)), max(1, int(merge_kernel[1] / sy)))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
+        dilated = cv2.dilate(thresh, kernel, iterations=1)
+
+        # stats 행: x, y, w, h, 픽셀 수 (0번은 배경)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(dilated, connectivity=8)
+        stats = stats[1:]
+
+        # 원본 해상도로 되돌린 bbox; 내림한 커널만큼 덜 팽창한 폭/높이를 양쪽에 보탠다
+        pad_x = (merge_kernel[0] - kernel_size[0] * sx) / 2
+        pad_y = (merge_kernel[1] - kernel_size[1] * sy) / 2
+        x0 = np.maximum(np.floor(stats[:, 0] * sx - pad_x), 0)
+        y0 = np.maximum(np.floor(stats[:, 1] * sy - pad_y), 0)
+        x1 = np.minimum(np.ceil((stats[:, 0] + stats[:, 2]) * sx + pad_x), width)
+        y1 = np.minimum(np.ceil((stats[:, 1] + stats[:, 3]) * sy + pad_y), height)
+        boxes = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).astype(np.int32)
+
+        boxes = boxes[boxes[:, 2].astype(np.int64) * boxes[:, 3] >= min_area]
+        boxes = _drop_nested(boxes)
+        # 좌상단→우하단 순서로 정렬
+        boxes = boxes[np.lexsort((boxes[:, 0], boxes[:, 1]))]
+        record.update(pixels=height * width, blocks=len(boxes))
+
+    return BlockArray(boxes)
+
+
+def draw_blocks(image_path: ImageInput, blocks: Sequence[Block], output_path: PathLike) -> Path:
     """
     감지된 블록을 직사각형으로 표시한 이미지를 저장한다.
     """
-    path = Path(image_path)
-    image = read_image(path)
+    # 메모리 이미지를 넘긴 경우 호출자의 배열에 그리지 않도록 복사한다
+    image = load_image(image_path).copy()
 
-    for idx, block in enumerate(blocks, start=1):
-        x, y, w, h = block.as_bbox()
+    for idx, (x, y, w, h) in enumerate(block_boxes(blocks).tolist(), start=1):
         cv2.rectangle(image, (x, y), (x + w, y + h), (0, 128, 255), 2)
         cv2.putText(
             image, str(idx), (x, y - 5),
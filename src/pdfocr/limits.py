@@ -0,0 +1,90 @@
+"""
+Per-page time limits and per-worker memory caps.
+
+Rasterization (pdftoppm) and OCR (tesseract, or tesserocr in-process) are
+the calls that can hang or balloon on a malformed page. Time limits are
+enforced by those calls themselves: the subprocess is killed or Tesseract's
+recognition is aborted, so the worker stays usable for the next page. The
+memory cap is an address-space limit on a pool worker, inherited by the
+subprocesses it starts.
+"""
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Retries of a failed or timed-out page render at this fraction of its DPI, but not below MIN_RETRY_DPI
+RETRY_DPI_FACTOR = 0.5
+MIN_RETRY_DPI = 100
+
+_local = threading.local()
+
+
+class PageTimeout(RuntimeError):
+    """
+    A page's rasterization or OCR exceeded its time limit.
+    """
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    """
+    Limit the rasterization and OCR calls made inside the block to ``seconds`` in total.
+
+    Nested deadlines never extend an outer one. None means no limit.
+    """
+    previous = getattr(_local, "deadline", None)
+    if seconds is not None:
+        end = time.monotonic() + seconds
+        _local.deadline = end if previous is None else min(previous, end)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def remaining() -> float | None:
+    """
+    Seconds left under the current deadline, None without one.
+
+    Raises:
+        PageTimeout: When the deadline has already passed
+    """
+    end = getattr(_local, "deadline", None)
+    if end is None:
+        return None
+    left = end - time.monotonic()
+    if left <= 0:
+        raise PageTimeout("page time limit exceeded")
+    return left
+
+
+def retry_dpi(dpi: int) -> int | None:
+    """
+    Resolution for retrying a failed page, None when it cannot go lower.
+    """
+    lower = max(MIN_RETRY_DPI, int(dpi * RETRY_DPI_FACTOR))
+    return lower if lower < dpi else None
+
+
+def set_memory_limit(max_mb: int | None) -> None:
+    """
+    Cap this process's address space (and that of the subprocesses it starts).
+
+    An allocation beyond the cap fails with MemoryError (or a failing OCR
+    subprocess) instead of pushing the machine into swap or the OOM killer.
+    """
+    if not max_mb:
+        return
+    limit = max_mb * 1024 * 1024
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as exc:
+        logger.warning(f"Could not set memory limit of {max_mb} MB: {exc}")
@@ -2,18 +2,47 @@
 """
 PDF to Image to Text extraction pipeline.
 """
+from __future__ import annotations
+
 import argparse
 import glob
+import heapq
 import logging
 import os
 import sys
 import tempfile
+from contextlib import nullcontext
+from importlib import import_module
+from operator import attrgetter
 from pathlib import Path
-from typing import Iterable, List, Sequence
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
 
-from pdfocr.image_to_text import extract_text_from_images, save_extracted_text
-from pdfocr.pdf_to_image import convert_pdf_to_images
+from pdfocr.cache import DEFAULT_CACHE_MB, CacheConfig, open_cache
+from pdfocr.engines import ENGINE_NAMES
+from pdfocr.journal import PageJournal, is_finished, run_settings
+from pdfocr.metrics import enable_metrics, finish_metrics, pyinstrument_session
+from pdfocr.parallel import resolve_workers
+from pdfocr.pdf_to_image import IMAGE_FORMATS, get_page_count
+from pdfocr.routing import routing_summary
+from pdfocr.pipeline import (
+    DEFAULT_MIN_CONFIDENCE,
+    PREPROCESS_STEPS,
+    SOURCE_OCR,
+    OcrOptions,
+    PageResult,
+    ocr_page_images,
+    preprocess_arg,
+    render_pdf_pages,
+    stream_pdf_pages,
+    text_layer_results,
+)
+from pdfocr.scheduler import run_page_scheduler
+from pdfocr.selection import PageSelection, format_pages, parse_page_ranges
 from pdfocr.types import PathLike
+from pdfocr.writers import MERGED_STEM, OUTPUT_FORMATS, DocumentWriter, MergedWriter, output_suffix
+
+if TYPE_CHECKING:
+    from pdfocr.prefilter import PageFilter
 
 # Configure logging
 logging.basicConfig(
@@ -43,22 +72,118 @@ def _resolve_image_dir(image_dir: PathLike | None) -> tuple[Path, bool]:
     return Path(image_dir).expanduser().resolve(), False
 
 
-def _cleanup_images(image_paths: Sequence[str], image_dir: Path, remove_dir: bool) -> None:
-    logger.debug("Cleaning up temporary image files...")
-    for img_path in image_paths:
-        try:
-            Path(img_path).unlink(missing_ok=True)
-        except Exception as exc:
-            logger.warning(f"Failed to delete {img_path}: {exc}")
+def _build_ocr_options(lang: str,
+                       dpi: int,
+                       cache_dir: PathLike | None,
+                       cache_size_mb: int,
+                       engine: str,
+                       adaptive_dpi: int | None,
+                       min_confidence: float,
+                       words: bool = False,
+                       page_timeout: float | None = None,
+                       route_lang: bool = False,
+                       preprocess: Tuple[str, ...] = ()) -> OcrOptions:
+    cache = CacheConfig.from_dir(cache_dir, cache_size_mb) if cache_dir is not None else None
+    if adaptive_dpi is not None and adaptive_dpi >= dpi:
+        logger.warning(f"--adaptive-dpi {adaptive_dpi} is not below --dpi {dpi}; adaptive mode disabled")
+        adaptive_dpi = None
+    if route_lang and "+" not in lang:
+        logger.warning(f"--route-lang needs several languages (e.g. eng+kor); OCR uses {lang} for every page")
+    return OcrOptions(lang=lang, dpi=dpi, cache=cache, engine=engine,
+                      adaptive_dpi=adaptive_dpi, min_confidence=min_confidence, words=words,
+                      page_timeout=page_timeout, route_lang=route_lang, preprocess=preprocess)
+
+
+def _cache_snapshot(options: OcrOptions) -> Dict[str, int] | None:
+    if options.cache is None:
+        return None
+    try:
+        return open_cache(options.cache).stats()
+    except Exception as exc:
+        logger.warning(f"OCR cache unavailable: {exc}")
+        return None
+
+
+def _report_cache(options: OcrOptions, before: Dict[str, int] | None) -> None:
+    # Counters live in the cache file, so hits from pool workers are included
+    after = _cache_snapshot(options)
+    if before is None or after is None:
+        return
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    print(f"OCR cache: {hits} hit(s), {misses} miss(es), "
+          f"{after['entries']} entr(ies) / {after['bytes'] / 1024 / 1024:.1f} MB stored")
+
+
+def _report_adaptive(options: OcrOptions, results: Iterable[PageResult]) -> None:
+    if options.adaptive_dpi is None:
+        return
+    ocr_count = 0
+    rerendered = 0
+    for result in results:
+        if result.dpi is None:
+            continue
+        ocr_count += 1
+        rerendered += result.dpi == options.dpi
+        confidence = "n/a" if result.confidence is None else f"{result.confidence:.1f}"
+        logger.info(f"Page {result.page}: {result.dpi} DPI, confidence {confidence}")
+    if ocr_count == 0:
+        return
+    print(f"Adaptive DPI: {rerendered}/{ocr_count} page(s) re-rendered at {options.dpi} DPI, "
+          f"{ocr_count - rerendered} kept at {options.adaptive_dpi} DPI")
 
-    if remove_dir:
-        try:
-            if image_dir.exists() and not any(image_dir.iterdir()):
-                image_dir.rmdir()
-        except Exception:
-            pass
 
-    logger.debug("Cleanup completed")
+def _report_routing(results: Iterable[PageResult]) -> None:
+    summary = routing_summary(results)
+    if summary is not None:
+        print(summary)
+
+
+def _process_single_pdf_streaming(pdf_path: Path,
+                                  output_path: Path,
+                                  image_dir: Path | None,
+                                  options: OcrOptions,
+                                  chunk_size: int,
+                                  workers: int,
+                                  use_text_layer: bool,
+                                  image_format: str,
+                                  page_filter: PageFilter | None,
+                                  journal: PageJournal,
+                                  output_format: str,
+                                  merged: MergedWriter | None,
+                                  max_memory_mb: int | None,
+                                  pages: List[int] | None) -> Path | None:
+    print("\n[1/1] Streaming pages through OCR...")
+    results: List[PageResult] = []
+    completed = journal.completed()
+    try:
+        with DocumentWriter(output_path, pdf_path.name, output_format, merged) as writer:
+            for result in stream_pdf_pages(pdf_path, options,
+                                           chunk_size=chunk_size, image_dir=image_dir,
+                                           workers=workers, use_text_layer=use_text_layer,
+                                           image_format=image_format, page_filter=page_filter,
+                                           completed=completed, max_memory_mb=max_memory_mb,
+                                           pages=pages):
+                writer.write(result)
+                if result.page not in completed:
+                    journal.record(result)
+                logger.info(f"Page {result.page}: {len(result.text)} characters")
+                # Only the stats are kept, page text is already on disk
+                results.append(PageResult(result.page, result.name, "", dpi=result.dpi,
+                                          confidence=result.confidence, lang=result.lang,
+                                          lang_saved_s=result.lang_saved_s))
+    except Exception as exc:
+        print(f"Error: Streaming OCR failed - {exc}")
+        journal.close()
+        return None
+
+    journal.finish()
+    _report_adaptive(options, results)
+    _report_routing(results)
+    print(f"\nCompleted: {output_path}")
+    print("=" * 80 + "\n")
+
+    return output_path
 
 
 def process_single_pdf(pdf_path: PathLike,
@@ -66,62 +191,215 @@ def process_single_pdf(pdf_path: PathLike,
                        image_dir: PathLike | None = None,
                        lang: str = "kor",
                        dpi: int = 300,
-                       keep_images: bool = False):
+                       keep_images: bool = False,
+                       stream: bool = False,
+                       chunk_size: int = 4,
+                       workers: int = 1,
+                       use_text_layer: bool = False,
+                       cache_dir: PathLike | None = None,
+                       cache_size_mb: int = DEFAULT_CACHE_MB,
+                       image_format: str = "png",
+                       engine: str = "auto",
+                       adaptive_dpi: int | None = None,
+                       min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                       prefilter: bool = False,
+                       page_filter: PageFilter | None = None,
+                       resume: bool = False,
+                       output_format: str = "text",
+                       merged: MergedWriter | None = None,
+                       page_timeout: float | None = None,
+                       max_memory_mb: int | None = None,
+                       route_lang: bool = False,
+                       preprocess: Tuple[str, ...] = (),
+                       pages: PageSelection | None = None):
     """
     Process a single PDF file through the OCR pipeline.
     
     Args:
         pdf_path: Path to PDF file
         output_dir: Output directory for text (defaults to PDF directory)
-        image_dir: Directory for temporary images (defaults to temp directory)
+        image_dir: Directory for kept page images (defaults to temp directory)
         lang: OCR language code (default: "kor")
         dpi: Image resolution
-        keep_images: Keep images after processing
+        keep_images: Save page images to image_dir (otherwise they never touch disk)
+        stream: Rasterize, OCR and write page by page instead of per stage
+        chunk_size: Pages rendered per rasterizer call
+        workers: Number of OCR processes (default: 1, 0 = one per CPU)
+        use_text_layer: Read pages with a usable embedded text layer directly
+            and OCR only the rest; each page header records its source
+        cache_dir: Directory of the OCR result cache (default: no cache)
+        cache_size_mb: Size limit of the OCR result cache in MB
+        image_format: File format of page images saved with keep_images
+        engine: OCR backend: "tesserocr", "pytesseract" or "auto"
+        adaptive_dpi: OCR every page at this resolution first and re-render
+            only pages below min_confidence at dpi (default: off)
+        min_confidence: Mean word confidence (0-100) a first-pass page needs
+        prefilter: Skip OCR for blank pages and reuse text for repeated pages
+        page_filter: Filter shared with other files of the same run, so
+            repeats across files are found too (created when prefilter is set)
+        resume: Continue an interrupted run from its page journal, or skip
+            the file when its output was already completed
+        output_format: "text", "jsonl" (page records with word boxes) or
+            "hocr"; pages are written as soon as they are finished
+        merged: Merged file shared with the other files of the run; this
+            file's pages are appended in the same pass
+        page_timeout: Seconds allowed to rasterize and OCR one page; a page
+            that fails or takes longer is retried once at reduced DPI and
+            otherwise marked [failed] (default: no limit)
+        max_memory_mb: Address-space limit of each OCR worker process in MB;
+            OCR runs in a worker process even with one worker (default: none)
+        route_lang: Detect each page's script and OCR it with only the
+            languages of lang written in it (default: all languages)
+        preprocess: Image preprocessing steps run before OCR, see
+            pipeline.PREPROCESS_STEPS (default: none)
+        pages: Pages to process (--pages/--first/--last/--sample); the
+            output holds only these, under their real page numbers
     
     Returns:
-        Path to generated text file
+        Path to generated output file
     """
     pdf_path = _resolve_pdf_path(pdf_path)
     output_dir = _resolve_output_dir(pdf_path, output_dir)
-    image_dir, is_temp_dir = _resolve_image_dir(image_dir)
+    # Word boxes are only collected for the structured formats
+    options = _build_ocr_options(lang, dpi, cache_dir, cache_size_mb, engine, adaptive_dpi, min_confidence,
+                                 words=output_format != "text", page_timeout=page_timeout,
+                                 route_lang=route_lang, preprocess=preprocess)
+    cache_before = _cache_snapshot(options)
+    owns_filter = prefilter and page_filter is None
+    if owns_filter:
+        # OpenCV/NumPy are only loaded when the prefilter is on
+        from pdfocr.prefilter import PageFilter
+        page_filter = PageFilter()
+    
+    output_path = Path(output_dir) / f"{pdf_path.stem}{output_suffix(output_format)}"
     
     print("=" * 80)
     print(f"Processing: {pdf_path.name}")
     print(f"Location: {pdf_path}")
     print(f"Output: {output_dir}")
     print("=" * 80)
+
+    if resume and is_finished(output_path):
+        print(f"Skipping finished file: {output_path}")
+        if merged is not None:
+            merged.add_file(merged.add_document(pdf_path.name), output_path)
+        return output_path
+
+    # Finished pages are committed here, so a crash loses at most the pages in flight
+    journal = PageJournal(output_path, pdf_path, run_settings(options, use_text_layer), resume=resume)
+    completed = journal.completed()
+    selected: List[int] | None = None
+    selected_set: Set[int] | None = None
+    if pages is not None and not pages.all_pages:
+        try:
+            selected = pages.resolve(get_page_count(pdf_path))
+        except Exception as exc:
+            print(f"Error: PDF conversion failed - {exc}")
+            journal.close()
+            return None
+        print(f"Selected {len(selected)} page(s): {format_pages(selected) or 'none'}")
+        selected_set = set(selected)
+        completed = {page: result for page, result in completed.items() if page in selected_set}
+    if completed:
+        print(f"Resuming: {len(completed)} page(s) already done")
+
+    if stream:
+        stream_image_dir = _resolve_image_dir(image_dir)[0] if keep_images else None
+        output_path = _process_single_pdf_streaming(
+            pdf_path,
+            output_path,
+            stream_image_dir,
+            options,
+            chunk_size,
+            workers,
+            use_text_layer,
+            image_format,
+            page_filter,
+            journal,
+            output_format,
+            merged,
+            max_memory_mb,
+            selected
+        )
+        if owns_filter:
+            print(page_filter.summary())
+        _report_cache(options, cache_before)
+        return output_path
+
+    # Page images stay in memory; they are written to disk only for --keep-images
+    kept_image_dir = _resolve_image_dir(image_dir)[0] if keep_images else None
+
+    known_pages: Dict[int, PageResult] = dict(completed)
+    ocr_pages: List[int] | None = selected
+    if use_text_layer:
+        print("\n[0/2] Checking embedded text layer...")
+        try:
+            page_numbers = selected if selected is not None else range(1, get_page_count(pdf_path) + 1)
+            text_pages = {page: result for page, result in text_layer_results(pdf_path).items()
+                          if selected_set is None or page in selected_set}
+            for page, result in text_pages.items():
+                known_pages.setdefault(page, result)
+            ocr_pages = [p for p in page_numbers if p not in known_pages]
+        except Exception as exc:
+            print(f"Error: Text layer check failed - {exc}")
+            journal.close()
+            return None
+        print(f"Text layer used for {len(text_pages)} page(s), OCR needed for {len(ocr_pages)} page(s)")
+    elif completed:
+        try:
+            page_numbers = selected if selected is not None else range(1, get_page_count(pdf_path) + 1)
+            ocr_pages = [p for p in page_numbers if p not in known_pages]
+        except Exception as exc:
+            print(f"Error: PDF conversion failed - {exc}")
+            journal.close()
+            return None
     
-    # Step 1: PDF to Image
-    print("\n[1/3] Converting PDF to images...")
-    try:
-        image_paths = convert_pdf_to_images(pdf_path, output_dir=image_dir, dpi=dpi)
-    except Exception as exc:
-        print(f"Error: PDF conversion failed - {exc}")
-        return None
+    # Step 1: PDF to Image; an unreadable PDF is reported before any output is opened
+    print("\n[1/2] Converting PDF to images...")
+    if ocr_pages is None:
+        try:
+            get_page_count(pdf_path)
+        except Exception as exc:
+            print(f"Error: PDF conversion failed - {exc}")
+            journal.close()
+            return None
+    # Pages are rendered as OCR consumes them, so only the pages in flight are held in memory
+    rendered = render_pdf_pages(pdf_path, dpi=options.render_dpi, chunk_size=chunk_size,
+                                image_dir=kept_image_dir,
+                                pages=ocr_pages, image_format=image_format,
+                                page_timeout=options.page_timeout)
     
-    # Step 2: Image to Text OCR
-    print("[2/3] Extracting text via OCR...")
+    # Step 2: Image to Text OCR, each page written as soon as the pages before it are
+    print("[2/2] Extracting text via OCR...")
+    ocr_stats: List[PageResult] = []
+
+    def ocr_results() -> Iterator[PageResult]:
+        for result in ocr_page_images(rendered, options, workers, pdf_path, page_filter, max_memory_mb):
+            if use_text_layer:
+                result.source = result.source or SOURCE_OCR
+            journal.record(result)
+            # Only the stats are kept, page text goes straight to the output
+            ocr_stats.append(PageResult(result.page, result.name, "", dpi=result.dpi,
+                                        confidence=result.confidence, lang=result.lang,
+                                        lang_saved_s=result.lang_saved_s))
+            yield result
+
     try:
-        text_results = extract_text_from_images(image_paths, lang=lang)
+        with DocumentWriter(output_path, pdf_path.name, output_format, merged) as writer:
+            known = (known_pages.pop(p) for p in sorted(known_pages))
+            for result in heapq.merge(known, ocr_results(), key=attrgetter("page")):
+                writer.write(result)
     except Exception as exc:
         print(f"Error: OCR extraction failed - {exc}")
+        journal.close()
         return None
+    journal.finish()
     
-    # Step 3: Save text file
-    print("[3/3] Saving text file...")
-    pdf_basename = pdf_path.stem
-    output_path = Path(output_dir) / f"{pdf_basename}.txt"
-    
-    try:
-        save_extracted_text(text_results, output_path)
-    except Exception as exc:
-        print(f"Error: File save failed - {exc}")
-        return None
-    
-    # Cleanup temporary images
-    if not keep_images:
-        _cleanup_images(image_paths, image_dir, is_temp_dir)
-    
+    _report_adaptive(options, ocr_stats)
+    _report_routing(ocr_stats)
+    if owns_filter:
+        print(page_filter.summary())
+    _report_cache(options, cache_before)
     print(f"\nCompleted: {output_path}")
     print("=" * 80 + "\n")
     
@@ -134,7 +412,25 @@ def process_multiple_pdfs(pdf_paths: Sequence[PathLike],
                          lang: str = "kor",
                          dpi: int = 300,
                          keep_images: bool = False,
-                         merge: bool = False):
+                         merge: bool = False,
+                         stream: bool = False,
+                         chunk_size: int = 4,
+                         workers: int = 1,
+                         use_text_layer: bool = False,
+                         cache_dir: PathLike | None = None,
+                         cache_size_mb: int = DEFAULT_CACHE_MB,
+                         image_format: str = "png",
+                         engine: str = "auto",
+                         adaptive_dpi: int | None = None,
+                         min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                         prefilter: bool = False,
+                         resume: bool = False,
+                         output_format: str = "text",
+                         page_timeout: float | None = None,
+                         max_memory_mb: int | None = None,
+                         route_lang: bool = False,
+                         preprocess: Tuple[str, ...] = (),
+                         pages: PageSelection | None = None):
     """
     Process multiple PDF files in batch.
     
@@ -146,6 +442,30 @@ def process_multiple_pdfs(pdf_paths: Sequence[PathLike],
         dpi: Image resolution
         keep_images: Keep images after processing
         merge: Merge all texts into one file
+        stream: Rasterize, OCR and write page by page instead of per stage
+        chunk_size: Pages rendered per rasterizer call in streaming mode
+        workers: Number of OCR processes (default: 1, 0 = one per CPU);
+            with more than one, pages of all files share a single pool
+        use_text_layer: Read pages with a usable embedded text layer directly
+            and OCR only the rest
+        cache_dir: Directory of the OCR result cache (default: no cache)
+        cache_size_mb: Size limit of the OCR result cache in MB
+        image_format: File format of page images saved with keep_images
+        engine: OCR backend: "tesserocr", "pytesseract" or "auto"
+        adaptive_dpi: OCR every page at this resolution first and re-render
+            only pages below min_confidence at dpi (default: off)
+        min_confidence: Mean word confidence (0-100) a first-pass page needs
+        prefilter: Skip OCR for blank pages and reuse text for pages repeated
+            anywhere in the batch (blank pages only with a shared pool)
+        resume: Skip files completed by an earlier run and continue
+            interrupted ones from their page journals
+        output_format: "text", "jsonl" or "hocr"; the merged file uses the
+            same format and is written in the same pass as the per-file outputs
+        page_timeout: Seconds allowed to rasterize and OCR one page (default: no limit)
+        max_memory_mb: Address-space limit of each OCR worker process in MB (default: none)
+        route_lang: OCR each page with only the languages of its detected script
+        preprocess: Image preprocessing steps run before OCR (default: none)
+        pages: Pages to process in every file (--pages/--first/--last/--sample)
     """
     print(f"\nProcessing {len(pdf_paths)} PDF file(s)\n")
     
@@ -153,38 +473,80 @@ def process_multiple_pdfs(pdf_paths: Sequence[PathLike],
     if merge and output_dir is None:
         output_dir = Path.cwd()
     
-    output_files: List[Path] = []
-    all_texts: List[str] = []
+    # Pages are appended to the merged file while the per-file outputs are written
+    merged = None
+    if merge:
+        merged = MergedWriter(Path(output_dir) / f"{MERGED_STEM}{output_suffix(output_format)}", output_format)
     
-    for i, pdf_path in enumerate(pdf_paths, start=1):
-        print(f"\n[{i}/{len(pdf_paths)}] Processing...")
-        output_file = process_single_pdf(
-            pdf_path,
+    if workers != 1:
+        # Shared page queue across all files instead of one file at a time
+        print("Scheduling pages of all files on a shared worker pool...")
+        options = _build_ocr_options(lang, dpi, cache_dir, cache_size_mb, engine,
+                                     adaptive_dpi, min_confidence, words=output_format != "text",
+                                     page_timeout=page_timeout, route_lang=route_lang,
+                                     preprocess=preprocess)
+        cache_before = _cache_snapshot(options)
+        outputs = run_page_scheduler(
+            pdf_paths,
             output_dir=output_dir,
-            image_dir=image_dir,
-            lang=lang,
-            dpi=dpi,
-            keep_images=keep_images
+            image_dir=_resolve_image_dir(image_dir)[0] if keep_images else None,
+            options=options,
+            workers=workers,
+            use_text_layer=use_text_layer,
+            image_format=image_format,
+            skip_blank=prefilter,
+            resume=resume,
+            output_format=output_format,
+            merged=merged,
+            max_memory_mb=max_memory_mb,
+            pages=pages
         )
-        
-        if output_file:
-            output_files.append(Path(output_file))
-            if merge:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    all_texts.append(f.read())
-    
-    # Create merged file
-    if merge and all_texts:
-        merged_path = Path(output_dir) / "merged_all_texts.txt"
-        print(f"\nMerging all texts into one file...")
-        with merged_path.open('w', encoding='utf-8') as f:
-            for i, text in enumerate(all_texts, start=1):
-                f.write(f"\n{'#'*80}\n")
-                f.write(f"# Document {i}: {Path(pdf_paths[i-1]).name}\n")
-                f.write(f"{'#'*80}\n\n")
-                f.write(text)
-                f.write("\n\n")
-        print(f"Merged file created: {merged_path}\n")
+        _report_cache(options, cache_before)
+    else:
+        # One filter for the whole batch so repeated pages are found across files
+        page_filter = None
+        if prefilter:
+            from pdfocr.prefilter import PageFilter
+            page_filter = PageFilter()
+        outputs = []
+        for i, pdf_path in enumerate(pdf_paths, start=1):
+            print(f"\n[{i}/{len(pdf_paths)}] Processing...")
+            outputs.append(process_single_pdf(
+                pdf_path,
+                output_dir=output_dir,
+                image_dir=image_dir,
+                lang=lang,
+                dpi=dpi,
+                keep_images=keep_images,
+                stream=stream,
+                chunk_size=chunk_size,
+                workers=workers,
+                use_text_layer=use_text_layer,
+                cache_dir=cache_dir,
+                cache_size_mb=cache_size_mb,
+                image_format=image_format,
+                engine=engine,
+                adaptive_dpi=adaptive_dpi,
+                min_confidence=min_confidence,
+                page_filter=page_filter,
+                resume=resume,
+                output_format=output_format,
+                merged=merged,
+                page_timeout=page_timeout,
+                max_memory_mb=max_memory_mb,
+                route_lang=route_lang,
+                preprocess=preprocess,
+                pages=pages
+            ))
+        if page_filter is not None:
+            print(page_filter.summary())
+
+    output_files = [Path(output_file) for output_file in outputs if output_file]
+    
+    if merged is not None:
+        merged.close()
+        if merged.documents:
+            print(f"Merged file created: {merged.output_path}\n")
     
     print("\n" + "="*80)
     print(f"Completed: {len(output_files)}/{len(pdf_paths)} successful")
@@ -216,7 +578,149 @@ def _collect_valid_pdfs(patterns: Iterable[str]) -> List[Path]:
     return sorted(valid, key=lambda p: str(p))
 
 
+def _print_metrics_summary(summary: List[Dict[str, object]], metrics_out: PathLike) -> None:
+    print(f"\nStage metrics ({metrics_out}):")
+    print(f"  {'stage':<14}{'count':>7}{'wall s':>11}{'cpu s':>11}{'Mpixels':>10}{'peak RSS MB':>13}")
+    for entry in summary:
+        print(f"  {entry['stage']:<14}{entry['count']:>7}{entry['wall_s']:>11.3f}{entry['cpu_s']:>11.3f}"
+              f"{entry['pixels'] / 1e6:>10.1f}{entry['rss_peak_mb']:>13.1f}")
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 5400:
+        return f"{seconds / 3600:.1f} h"
+    if seconds >= 120:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds:.0f} s"
+
+
+def _print_previews(args: argparse.Namespace, valid_pdfs: List[Path], pages: PageSelection | None) -> None:
+    from pdfocr.preview import PREVIEW_DPI, preview_pdf
+
+    options = _build_ocr_options(args.lang, args.dpi, None, DEFAULT_CACHE_MB, args.engine,
+                                 args.adaptive_dpi, args.min_confidence, route_lang=args.route_lang,
+                                 preprocess=args.preprocess)
+    print(f"Preview: sample pages OCRed at {min(PREVIEW_DPI, options.render_dpi)} DPI, projected to "
+          f"{options.render_dpi} DPI on {resolve_workers(args.workers)} worker(s)\n")
+    total_s = 0.0
+    for pdf_path in valid_pdfs:
+        try:
+            estimate = preview_pdf(pdf_path, options, pages, args.workers)
+        except Exception as exc:
+            print(f"Error: {pdf_path.name} - {exc}")
+            continue
+        confidence = "n/a" if estimate.mean_confidence is None else f"{estimate.mean_confidence:.0f}"
+        print(f"{pdf_path.name}: {estimate.page_count} page(s), {estimate.selected_pages} selected, "
+              f"text layer on {estimate.text_layer_pages}")
+        print(f"  sample {format_pages(estimate.sampled_pages) or 'none'}: {estimate.sample_s_per_page:.2f} s/page, "
+              f"confidence {confidence}, {estimate.sample_chars} character(s)")
+        print(f"  projected OCR time: {_format_seconds(estimate.projected_ocr_s)} "
+              f"({_format_seconds(estimate.projected_text_layer_s)} with --text-layer)")
+        total_s += estimate.projected_text_layer_s if args.text_layer else estimate.projected_ocr_s
+    if len(valid_pdfs) > 1:
+        print(f"\nProjected OCR time for {len(valid_pdfs)} file(s): {_format_seconds(total_s)}")
+
+
+def _page_selection(args: argparse.Namespace) -> PageSelection | None:
+    selection = PageSelection(ranges=args.pages or (), first=args.first, last=args.last, sample=args.sample)
+    return None if selection.all_pages else selection
+
+
+def _page_ranges_arg(value: str):
+    try:
+        return parse_page_ranges(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def _positive_int_arg(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return number
+
+
+def _run(args: argparse.Namespace, valid_pdfs: List[Path]) -> None:
+    pages = _page_selection(args)
+    if args.preview:
+        _print_previews(args, valid_pdfs, pages)
+        return
+
+    # Run pipeline
+    if len(valid_pdfs) == 1:
+        process_single_pdf(
+            valid_pdfs[0],
+            output_dir=args.output_dir,
+            image_dir=args.image_dir,
+            lang=args.lang,
+            dpi=args.dpi,
+            keep_images=args.keep_images,
+            stream=args.stream,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            use_text_layer=args.text_layer,
+            cache_dir=args.cache_dir,
+            cache_size_mb=args.cache_size,
+            image_format=args.image_format,
+            engine=args.engine,
+            adaptive_dpi=args.adaptive_dpi,
+            min_confidence=args.min_confidence,
+            prefilter=args.prefilter,
+            resume=args.resume,
+            output_format=args.format,
+            page_timeout=args.page_timeout,
+            max_memory_mb=args.max_memory,
+            route_lang=args.route_lang,
+            preprocess=args.preprocess,
+            pages=pages
+        )
+    else:
+        process_multiple_pdfs(
+            valid_pdfs,
+            output_dir=args.output_dir,
+            image_dir=args.image_dir,
+            lang=args.lang,
+            dpi=args.dpi,
+            keep_images=args.keep_images,
+            merge=args.merge,
+            stream=args.stream,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            use_text_layer=args.text_layer,
+            cache_dir=args.cache_dir,
+            cache_size_mb=args.cache_size,
+            image_format=args.image_format,
+            engine=args.engine,
+            adaptive_dpi=args.adaptive_dpi,
+            min_confidence=args.min_confidence,
+            prefilter=args.prefilter,
+            resume=args.resume,
+            output_format=args.format,
+            page_timeout=args.page_timeout,
+            max_memory_mb=args.max_memory,
+            route_lang=args.route_lang,
+            preprocess=args.preprocess,
+            pages=pages
+        )
+
+
+# Subcommand -> (module, entry point); loaded only when used
+_SUBCOMMANDS = {
+    "serve": ("pdfocr.server", "main"),
+    "enqueue": ("pdfocr.jobqueue", "enqueue_main"),
+    "worker": ("pdfocr.jobqueue", "worker_main"),
+    "assemble": ("pdfocr.jobqueue", "assemble_main"),
+    "watch": ("pdfocr.watch", "main"),
+}
+
+
 def main():
+    command = _SUBCOMMANDS.get(sys.argv[1]) if len(sys.argv) > 1 else None
+    if command is not None:
+        module, name = command
+        getattr(import_module(module), name)(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description="PDF to Text extraction pipeline using OCR",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -234,8 +738,59 @@ Examples:
   # Merge all texts into one file
   pdfocr pdfs/*.pdf --merge
   
+  # Page records with word boxes and confidences, one JSON line per page
+  pdfocr pdfs/*.pdf --format jsonl --merge
+  
   # Keep images for debugging
   pdfocr lecture.pdf --keep-images
+  
+  # Stream large PDFs page by page (flat memory, early output)
+  pdfocr book.pdf --stream
+  
+  # OCR pages on 8 worker processes
+  pdfocr book.pdf --workers 8
+  
+  # Use the embedded text layer where present, OCR only scanned pages
+  pdfocr mixed.pdf --text-layer
+  
+  # Reuse OCR results of unchanged pages across runs
+  pdfocr book.pdf --cache-dir ~/.cache/pdfocr
+  
+  # OCR at 150 DPI first, re-render only low-confidence pages at 300 DPI
+  pdfocr book.pdf --adaptive-dpi 150
+  
+  # Mixed Korean/English batch: OCR each page only with the languages it needs
+  pdfocr pdfs/*.pdf --lang kor+eng --route-lang
+  
+  # Scanned pages: crop borders, straighten and binarize before OCR
+  pdfocr scan.pdf --preprocess crop,deskew,binarize
+  
+  # OCR only the first 20 pages, or 10 pages spread over the document
+  pdfocr book.pdf --last 20
+  pdfocr book.pdf --sample 10
+  
+  # Triage a batch: page counts, text layers and projected OCR time, no full run
+  pdfocr pdfs/*.pdf --preview --workers 0
+  
+  # Pick up an interrupted batch where it stopped
+  pdfocr pdfs/*.pdf --workers 0 --resume
+  
+  # Give up on pages that hang for more than 2 minutes; cap workers at 2 GB each
+  pdfocr pdfs/*.pdf --workers 0 --page-timeout 120 --max-memory 2048
+  
+  # Per-stage timing report plus a cProfile dump of the hot stages
+  pdfocr book.pdf --workers 4 --metrics-out metrics.jsonl --profile run.prof
+  
+  # Long-running service with warm workers (see: pdfocr serve --help)
+  pdfocr serve --socket /run/pdfocr.sock
+  
+  # Hot folder: OCR PDFs within seconds of landing in a directory (see: pdfocr watch --help)
+  pdfocr watch /srv/scans -o /srv/ocr
+  
+  # Spread pages over several hosts through a queue on shared storage
+  pdfocr enqueue /shared/pdfs/*.pdf --queue /shared/jobs.db
+  pdfocr worker --queue /shared/jobs.db --workers 0   # on every host
+  pdfocr assemble --queue /shared/jobs.db
         """
     )
     
@@ -282,6 +837,195 @@ Examples:
         help='Merge all texts into one file'
     )
     
+    parser.add_argument(
+        '--format',
+        choices=OUTPUT_FORMATS,
+        default='text',
+        help='Output format: text, jsonl (one record per page with word boxes and confidences) '
+             'or hocr; pages are written as they finish (default: text)'
+    )
+    
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Rasterize, OCR and write one page at a time (constant memory)'
+    )
+    
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=4,
+        help='Pages rendered per rasterizer call in --stream mode (default: 4)'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Number of parallel OCR processes, 0 = one per CPU (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--text-layer',
+        action='store_true',
+        help='Use the embedded PDF text layer where usable and OCR only the remaining pages'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Directory of the OCR result cache; unchanged pages are not re-OCR\'d (default: no cache)'
+    )
+    
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        help=f'OCR cache size limit in MB, least recently used entries are evicted (default: {DEFAULT_CACHE_MB})'
+    )
+    
+    parser.add_argument(
+        '--image-format',
+        choices=sorted(IMAGE_FORMATS),
+        default='png',
+        help='File format for --keep-images; ppm/bmp skip compression and are fastest (default: png)'
+    )
+    
+    parser.add_argument(
+        '--engine',
+        choices=ENGINE_NAMES,
+        default='auto',
+        help='OCR backend: in-process tesserocr (models loaded once per worker) or '
+             'pytesseract (one tesseract process per call); auto prefers tesserocr when installed'
+    )
+    
+    parser.add_argument(
+        '--adaptive-dpi',
+        type=int,
+        default=None,
+        metavar='DPI',
+        help='OCR each page at this lower resolution first and re-render only pages '
+             'below --min-confidence at --dpi (default: off)'
+    )
+    
+    parser.add_argument(
+        '--min-confidence',
+        type=float,
+        default=DEFAULT_MIN_CONFIDENCE,
+        help=f'Mean Tesseract word confidence (0-100) a page needs to keep its '
+             f'--adaptive-dpi result (default: {DEFAULT_MIN_CONFIDENCE:g})'
+    )
+    
+    parser.add_argument(
+        '--route-lang',
+        action='store_true',
+        help='Detect each page\'s script with Tesseract OSD (needs osd.traineddata) and OCR it '
+             'with only the --lang languages written in that script'
+    )
+    
+    parser.add_argument(
+        '--preprocess',
+        type=preprocess_arg,
+        default=(),
+        metavar='STEPS',
+        help=f'Preprocess page images before OCR: comma-separated steps from '
+             f'{", ".join(PREPROCESS_STEPS)}, or "all" (default: none)'
+    )
+    
+    parser.add_argument(
+        '--prefilter',
+        action='store_true',
+        help='Skip OCR for blank pages and reuse the text of pages identical to an earlier page of the run'
+    )
+    
+    parser.add_argument(
+        '--pages',
+        type=_page_ranges_arg,
+        default=None,
+        metavar='LIST',
+        help='Process only these pages, e.g. "1-5,8,20-" (default: all pages)'
+    )
+    
+    parser.add_argument(
+        '--first',
+        type=_positive_int_arg,
+        default=None,
+        metavar='N',
+        help='First page to process'
+    )
+    
+    parser.add_argument(
+        '--last',
+        type=_positive_int_arg,
+        default=None,
+        metavar='N',
+        help='Last page to process'
+    )
+    
+    parser.add_argument(
+        '--sample',
+        type=_positive_int_arg,
+        default=None,
+        metavar='K',
+        help='Process only K pages spread evenly over the selected ones (quick look at a document)'
+    )
+    
+    parser.add_argument(
+        '--preview',
+        action='store_true',
+        help='Do not OCR the documents; report page count, text-layer coverage and a projected '
+             'OCR time from a low-DPI sample (--sample pages, default 3)'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted run: skip files whose output is complete and '
+             'pages recorded in the <output>.journal.sqlite3 page journal'
+    )
+    
+    parser.add_argument(
+        '--page-timeout',
+        type=float,
+        default=None,
+        metavar='SECONDS',
+        help='Time limit for rasterizing and OCRing one page; failed or timed-out pages are '
+             'retried once at half the DPI, then marked [failed] (default: no limit)'
+    )
+    
+    parser.add_argument(
+        '--max-memory',
+        type=int,
+        default=None,
+        metavar='MB',
+        help='Address-space limit of each OCR worker process; a page that exceeds it fails '
+             'or restarts its worker instead of stalling the batch (default: no limit)'
+    )
+    
+    parser.add_argument(
+        '--metrics-out',
+        default=None,
+        metavar='PATH',
+        help='Write one JSON line per pipeline stage (wall/CPU time, peak RSS, pixels) '
+             'and per-stage totals to PATH (default: off)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        default=None,
+        metavar='PATH',
+        help='Profile the run: cProfile stats of the instrumented stages (workers write PATH.<pid>), '
+             'or a pyinstrument report with --profiler pyinstrument (default: off)'
+    )
+    
+    parser.add_argument(
+        '--profiler',
+        choices=('cprofile', 'pyinstrument'),
+        default='cprofile',
+        help='Profiler used by --profile; pyinstrument must be installed and covers the main process only '
+             '(default: cprofile)'
+    )
+    
     args = parser.parse_args()
     
     valid_pdfs = _collect_valid_pdfs(args.pdf_files)
@@ -290,26 +1034,17 @@ Examples:
         print("Error: No PDF files to process")
         sys.exit(1)
     
-    # Run pipeline
-    if len(valid_pdfs) == 1:
-        process_single_pdf(
-            valid_pdfs[0],
-            output_dir=args.output_dir,
-            image_dir=args.image_dir,
-            lang=args.lang,
-            dpi=args.dpi,
-            keep_images=args.keep_images
-        )
-    else:
-        process_multiple_pdfs(
-            valid_pdfs,
-            output_dir=args.output_dir,
-            image_dir=args.image_dir,
-            lang=args.lang,
-            dpi=args.dpi,
-            keep_images=args.keep_images,
-            merge=args.merge
-        )
+    use_cprofile = args.profile is not None and args.profiler == 'cprofile'
+    enable_metrics(args.metrics_out, args.profile if use_cprofile else None)
+    session = (pyinstrument_session(args.profile)
+               if args.profile is not None and not use_cprofile else nullcontext())
+    with session:
+        _run(args, valid_pdfs)
+    
+    summary = finish_metrics()
+    if summary:
+        _print_metrics_summary(summary, args.metrics_out)
+
 
 
 if __name__ == "__main__":
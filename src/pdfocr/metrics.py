@@ -0,0 +1,240 @@
+"""
+Stage-level timing and resource instrumentation.
+
+When enabled, every ``stage()`` section appends one JSON line to the metrics
+file: wall time, CPU time (including child processes such as ``tesseract``
+and ``pdftoppm``), peak RSS and pixel count. The settings travel through
+environment variables, so pool workers started after enable_metrics() write
+to the same file.
+"""
+import cProfile
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENV = "PDFOCR_METRICS_OUT"
+PROFILE_ENV = "PDFOCR_PROFILE"
+
+# Per-process state, keyed by pid so forked workers do not reuse the parent's handles
+_state: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def enable_metrics(metrics_out: PathLike | None = None, profile_out: PathLike | None = None) -> None:
+    """
+    Turn on instrumentation for this process and the workers it starts.
+
+    Args:
+        metrics_out: JSONL file for stage records (truncated here)
+        profile_out: cProfile output for the instrumented stages; each
+            process writes ``<profile_out>.<pid>`` (the main process writes
+            ``profile_out`` itself)
+    """
+    if metrics_out is not None:
+        path = Path(metrics_out).expanduser().resolve()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("", encoding="utf-8")
+        os.environ[METRICS_ENV] = str(path)
+    if profile_out is not None:
+        path = Path(profile_out).expanduser().resolve()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.environ[PROFILE_ENV] = str(path)
+        _state["profile_owner"] = os.getpid()
+    _state.pop("pid", None)
+
+
+def _process_state() -> Dict[str, object]:
+    if _state.get("pid") == os.getpid():
+        return _state
+    with _lock:
+        if _state.get("pid") != os.getpid():
+            _state["pid"] = os.getpid()
+            _state["sink"] = None
+            _state["profiler"] = None
+            _state["depth"] = 0
+            metrics_out = os.environ.get(METRICS_ENV)
+            if metrics_out:
+                # Line-buffered append: each record is one small write, so processes do not interleave
+                _state["sink"] = open(metrics_out, "a", encoding="utf-8", buffering=1)
+            profile_out = os.environ.get(PROFILE_ENV)
+            if profile_out:
+                _state["profiler"] = cProfile.Profile()
+                _register_profile_dump(profile_out)
+    return _state
+
+
+def _register_profile_dump(profile_out: str) -> None:
+    if _state.get("profile_owner") == os.getpid():
+        target = profile_out
+    else:
+        target = f"{profile_out}.{os.getpid()}"
+
+    def dump() -> None:
+        profiler = _state.get("profiler")
+        if profiler is not None and _state.get("pid") == os.getpid():
+            profiler.dump_stats(target)
+
+    # Runs at interpreter exit in the main process and when a pool worker shuts down
+    Finalize(None, dump, exitpriority=10)
+
+
+def metrics_enabled() -> bool:
+    """
+    Return True when stage records are being written.
+    """
+    return _process_state()["sink"] is not None
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _cpu_seconds() -> float:
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+@contextmanager
+def stage(name: str, /, **fields) -> Iterator[Dict[str, object]]:
+    """
+    Record one pipeline stage when instrumentation is enabled.
+
+    Extra keyword fields (page, pixels, ...) are copied into the record; the
+    yielded dict can be updated inside the block, e.g. with a pixel count
+    that is only known afterwards.
+
+    Args:
+        name: Stage name, e.g. "rasterize", "ocr", "write"
+        **fields: Additional record fields
+    """
+    state = _process_state()
+    sink = state["sink"]
+    profiler = state["profiler"]
+    if sink is None and profiler is None:
+        yield fields
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    # Only the outermost stage toggles the profiler
+    outermost = state["depth"] == 0
+    state["depth"] += 1
+    if profiler is not None and outermost:
+        profiler.enable()
+    try:
+        yield fields
+    finally:
+        state["depth"] -= 1
+        if profiler is not None and outermost:
+            profiler.disable()
+        if sink is not None:
+            record = {
+                "stage": name,
+                **fields,
+                "wall_s": round(time.perf_counter() - wall_start, 6),
+                "cpu_s": round(_cpu_seconds() - cpu_start, 6),
+                "rss_peak_mb": round(_peak_rss_mb(), 1),
+                "pid": os.getpid(),
+                "ts": round(time.time(), 3),
+            }
+            with _lock:
+                sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def image_pixels(image) -> int:
+    """
+    Pixel count of a PIL image or numpy array.
+    """
+    if hasattr(image, "size") and isinstance(image.size, tuple):
+        return image.size[0] * image.size[1]
+    return int(image.shape[0] * image.shape[1])
+
+
+def summarize_metrics(metrics_out: PathLike) -> List[Dict[str, object]]:
+    """
+    Aggregate a metrics file per stage.
+
+    Args:
+        metrics_out: JSONL file written by stage()
+
+    Returns:
+        One dict per stage with call count, wall/CPU totals, pixels and peak RSS
+    """
+    totals: Dict[str, Dict[str, float]] = defaultdict(
+        lambda: {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "pixels": 0, "rss_peak_mb": 0.0}
+    )
+    with Path(metrics_out).open(encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("stage") == "summary":
+                continue
+            total = totals[record["stage"]]
+            total["count"] += 1
+            total["wall_s"] += record["wall_s"]
+            total["cpu_s"] += record["cpu_s"]
+            total["pixels"] += record.get("pixels", 0)
+            total["rss_peak_mb"] = max(total["rss_peak_mb"], record["rss_peak_mb"])
+    return [
+        {"stage": name, **{k: round(v, 6) if isinstance(v, float) else v for k, v in total.items()}}
+        for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall_s"])
+    ]
+
+
+@contextmanager
+def pyinstrument_session(output: PathLike) -> Iterator[None]:
+    """
+    Profile the enclosed block of the main process with pyinstrument.
+
+    Writes an HTML report when ``output`` ends in .html, text otherwise.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError as exc:
+        raise RuntimeError("pyinstrument is not installed (pip install pyinstrument)") from exc
+
+    output = Path(output).expanduser().resolve()
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        output.parent.mkdir(parents=True, exist_ok=True)
+        report = profiler.output_html() if output.suffix == ".html" else profiler.output_text(unicode=True)
+        output.write_text(report, encoding="utf-8")
+        logger.info(f"Profile written: {output}")
+
+
+def finish_metrics() -> List[Dict[str, object]] | None:
+    """
+    Append per-stage totals to the metrics file and return them.
+
+    Call once in the main process after all workers have exited.
+    """
+    metrics_out = os.environ.get(METRICS_ENV)
+    if not metrics_out:
+        return None
+    summary = summarize_metrics(metrics_out)
+    state = _process_state()
+    sink = state["sink"]
+    for entry in summary:
+        sink.write(json.dumps({"stage": "summary", "of": entry["stage"], **{
+            k: v for k, v in entry.items() if k != "stage"
+        }}) + "\n")
+    sink.flush()
+    return summary
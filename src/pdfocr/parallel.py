@@ -0,0 +1,170 @@
+"""
+Process pool helpers for parallel page OCR.
+
+Page images are handed to workers through shared memory rather than being
+pickled through the pool's pipe.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Callable, Deque, Iterable, Iterator, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """
+    Return the number of CPUs this process may run on.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def resolve_workers(workers: int) -> int:
+    """
+    Normalize a --workers value; 0 or less means one worker per CPU.
+    """
+    if workers <= 0:
+        return available_cpus()
+    return workers
+
+
+def tesseract_thread_budget(workers: int) -> int:
+    """
+    Split the CPUs between workers so that workers x threads matches the box.
+
+    Args:
+        workers: Number of OCR worker processes
+
+    Returns:
+        OpenMP thread count for each Tesseract instance
+    """
+    return max(1, available_cpus() // max(1, workers))
+
+
+def _init_ocr_worker(threads: int, max_memory_mb: int | None = None) -> None:
+    from pdfocr.limits import set_memory_limit
+
+    # Inherited by every tesseract subprocess launched from this worker
+    os.environ["OMP_THREAD_LIMIT"] = str(threads)
+    set_memory_limit(max_memory_mb)
+
+
+def create_ocr_pool(workers: int, max_memory_mb: int | None = None) -> ProcessPoolExecutor:
+    """
+    Create a process pool whose workers cap Tesseract's OpenMP threads.
+
+    Args:
+        workers: Number of worker processes (0 = one per CPU)
+        max_memory_mb: Address-space limit of each worker in MB (default: none)
+
+    Returns:
+        ProcessPoolExecutor ready for OCR tasks
+    """
+    workers = resolve_workers(workers)
+    threads = tesseract_thread_budget(workers)
+    logger.info(f"Starting {workers} OCR worker(s) with {threads} Tesseract thread(s) each")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ocr_worker,
+        initargs=(threads, max_memory_mb),
+    )
+
+
+def imap_ordered(executor: Executor,
+                 fn: Callable[[T], R],
+                 items: Iterable[T],
+                 window: int) -> Iterator[R]:
+    """
+    Map ``fn`` over ``items`` on ``executor``, yielding results in input order.
+
+    At most ``window`` tasks are in flight, so a lazy ``items`` iterator is
+    consumed only as fast as results are taken.
+
+    Args:
+        executor: Executor to submit tasks to
+        fn: Picklable callable applied to each item
+        items: Input items (may be a generator)
+        window: Maximum number of pending tasks
+
+    Yields:
+        fn(item) for each item, in the order of ``items``
+    """
+    window = max(1, window)
+    pending: Deque[Future] = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+@dataclass(frozen=True)
+class SharedImage:
+    shm_name: str
+    mode: str
+    size: Tuple[int, int]
+    nbytes: int
+
+
+def share_image(image: Image.Image) -> Tuple[SharedImage, SharedMemory]:
+    """
+    Copy a PIL image into a shared memory block for a pool worker.
+
+    The caller owns the returned SharedMemory and must close and unlink it
+    once the worker is done.
+
+    Args:
+        image: Image to share
+
+    Returns:
+        Tuple of (picklable reference for the worker, shared memory block)
+    """
+    data = image.tobytes()
+    shm = SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[:len(data)] = data
+    return SharedImage(shm.name, image.mode, image.size, len(data)), shm
+
+
+def load_shared_image(ref: SharedImage) -> Image.Image:
+    """
+    Rebuild an image shared with share_image() inside a worker process.
+    """
+    from PIL import Image
+
+    # Pool workers share the parent's resource tracker, so attaching here
+    # does not take ownership; the parent unlinks via release_shared()
+    shm = SharedMemory(name=ref.shm_name)
+    try:
+        with shm.buf[:ref.nbytes] as view:
+            return Image.frombytes(ref.mode, ref.size, view)
+    finally:
+        shm.close()
+
+
+def release_shared(shm: SharedMemory) -> None:
+    """
+    Close and unlink a shared memory block created by share_image().
+    """
+    try:
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
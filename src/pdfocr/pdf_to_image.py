@@ -1,16 +1,30 @@
 """
 Convert PDF to page-by-page images.
 """
+from __future__ import annotations
+
 import logging
 from pathlib import Path
-from typing import List
-
-from pdf2image import convert_from_path
+from typing import TYPE_CHECKING, Iterator, List, Sequence, Tuple
 
+from pdfocr.limits import PageTimeout, deadline, remaining, retry_dpi
+from pdfocr.metrics import image_pixels, stage
 from pdfocr.types import PathLike
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 logger = logging.getLogger(__name__)
 
+# --image-format choices -> PIL format names; PNG is the default but slowest to encode
+IMAGE_FORMATS = {
+    "png": "PNG",
+    "ppm": "PPM",
+    "bmp": "BMP",
+    "tiff": "TIFF",
+    "jpeg": "JPEG",
+}
+
 
 def _ensure_output_dir(output_dir: Path) -> None:
     created = not output_dir.exists()
@@ -19,7 +33,178 @@ def _ensure_output_dir(output_dir: Path) -> None:
         logger.debug(f"Created directory: {output_dir}")
 
 
-def convert_pdf_to_images(pdf_path: PathLike, output_dir: PathLike = "images", dpi: int = 300) -> List[str]:
+def page_image_name(pdf_basename: str, page_number: int, image_format: str = "png") -> str:
+    """
+    Return the image file name used for a given page of a PDF.
+    """
+    return f"{pdf_basename}_page_{page_number:03d}.{image_format}"
+
+
+def save_page_image(image: Image.Image, image_path: PathLike, image_format: str = "png") -> Path:
+    """
+    Save a rendered page in one of IMAGE_FORMATS.
+
+    Args:
+        image: Page image
+        image_path: Destination file path
+        image_format: Key of IMAGE_FORMATS (default: "png")
+
+    Returns:
+        Path to the saved image
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    image_path = Path(image_path)
+    pil_format = IMAGE_FORMATS[image_format]
+    if pil_format == "JPEG" and image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    with stage("save_image", format=image_format, pixels=image_pixels(image)):
+        image.save(image_path, pil_format)
+    return image_path
+
+
+def get_page_count(pdf_path: PathLike) -> int:
+    """
+    Read the page count of a PDF without rasterizing it.
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        Number of pages
+    """
+    from pdf2image import pdfinfo_from_path
+
+    try:
+        info = pdfinfo_from_path(str(pdf_path))
+        return int(info["Pages"])
+    except Exception as exc:
+        raise RuntimeError(f"PDF info error: {exc}") from exc
+
+
+def _page_runs(pages: Sequence[int], chunk_size: int) -> List[Tuple[int, int]]:
+    # Group sorted page numbers into consecutive (first, last) runs of at most chunk_size pages
+    runs: List[Tuple[int, int]] = []
+    for page in sorted(set(pages)):
+        if runs and page == runs[-1][1] + 1 and page - runs[-1][0] < chunk_size:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
+
+
+def _convert(pdf_path: Path, dpi: int, first: int, last: int) -> List[Image.Image]:
+    from pdf2image import convert_from_path
+    from pdf2image.exceptions import PDFPopplerTimeoutError
+
+    timeout = remaining()
+    with stage("rasterize", page=first, pages=last - first + 1, dpi=dpi) as record:
+        try:
+            images = convert_from_path(str(pdf_path), dpi=dpi, first_page=first, last_page=last, timeout=timeout)
+        except PDFPopplerTimeoutError as exc:
+            raise PageTimeout(f"rasterization exceeded the page time limit ({exc})") from exc
+        record["pixels"] = sum(image_pixels(image) for image in images)
+    return images
+
+
+def _render_alone(pdf_path: Path, page: int, dpi: int, page_timeout: float | None) -> Image.Image | None:
+    # Last resort for a page that failed inside its chunk: alone, then once at reduced DPI
+    for attempt_dpi in (dpi, retry_dpi(dpi)):
+        if attempt_dpi is None:
+            break
+        try:
+            with deadline(page_timeout):
+                images = _convert(pdf_path, attempt_dpi, page, page)
+            if images:
+                return images[0]
+        except Exception as exc:
+            logger.warning(f"PDF conversion error (page {page} at {attempt_dpi} DPI): {exc}")
+    return None
+
+
+def iter_pdf_pages(pdf_path: PathLike,
+                   dpi: int = 300,
+                   chunk_size: int = 4,
+                   pages: Sequence[int] | None = None,
+                   page_timeout: float | None = None,
+                   skip_failed: bool = False) -> Iterator[Tuple[int, Image.Image | None]]:
+    """
+    Rasterize a PDF lazily, a few pages at a time.
+
+    Only ``chunk_size`` pages are held in memory at once, so peak memory does
+    not grow with the page count.
+
+    Args:
+        pdf_path: Path to PDF file
+        dpi: Image resolution (default: 300)
+        chunk_size: Number of pages rendered per pdftoppm call (default: 4)
+        pages: 1-based page numbers to render (default: all pages)
+        page_timeout: Seconds allowed per page; a chunk gets this times its
+            page count (default: no limit)
+        skip_failed: When a chunk fails, render its pages one at a time
+            (retrying a failing page once at reduced DPI) and yield None for
+            pages that still fail, instead of raising
+
+    Yields:
+        Tuples of (1-based page number, PIL image or None), in page order
+    """
+    pdf_path = Path(pdf_path).expanduser().resolve()
+    if not pdf_path.exists():
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    chunk_size = max(1, chunk_size)
+    if pages is None:
+        pages = range(1, get_page_count(pdf_path) + 1)
+    runs = _page_runs(pages, chunk_size)
+    logger.info(f"Streaming {sum(last - first + 1 for first, last in runs)} page(s) from: {pdf_path}")
+
+    for first, last in runs:
+        try:
+            with deadline(page_timeout * (last - first + 1) if page_timeout else None):
+                images = _convert(pdf_path, dpi, first, last)
+        except Exception as exc:
+            if not skip_failed:
+                raise RuntimeError(f"PDF conversion error (pages {first}-{last}): {exc}") from exc
+            logger.warning(f"PDF conversion error (pages {first}-{last}): {exc}; rendering pages one at a time")
+            for page_number in range(first, last + 1):
+                yield page_number, _render_alone(pdf_path, page_number, dpi, page_timeout)
+            continue
+
+        page_number = first
+        # Pop pages off the chunk so each image can be freed once consumed
+        while images:
+            yield page_number, images.pop(0)
+            page_number += 1
+
+
+def render_page(pdf_path: PathLike, page_number: int, dpi: int = 300) -> Image.Image:
+    """
+    Rasterize a single PDF page (within the current limits.deadline(), if any).
+
+    Args:
+        pdf_path: Path to PDF file
+        page_number: 1-based page number
+        dpi: Image resolution (default: 300)
+
+    Returns:
+        PIL image of the page
+    """
+    try:
+        images = _convert(Path(pdf_path), dpi, page_number, page_number)
+    except PageTimeout:
+        raise
+    except Exception as exc:
+        raise RuntimeError(f"PDF conversion error (page {page_number}): {exc}") from exc
+    if not images:
+        raise RuntimeError(f"PDF conversion error: page {page_number} not rendered")
+    return images[0]
+
+
+def convert_pdf_to_images(pdf_path: PathLike,
+                          output_dir: PathLike = "images",
+                          dpi: int = 300,
+                          pages: Sequence[int] | None = None,
+                          image_format: str = "png") -> List[str]:
     """
     Convert PDF file to page-by-page images.
     
@@ -27,6 +212,8 @@ def convert_pdf_to_images(pdf_path: PathLike, output_dir: PathLike = "images", d
         pdf_path: Path to PDF file
         output_dir: Directory to save images (default: "images")
         dpi: Image resolution (default: 300)
+        pages: 1-based page numbers to convert (default: all pages)
+        image_format: Key of IMAGE_FORMATS (default: "png")
     
     Returns:
         List of generated image file paths
@@ -39,19 +226,35 @@ def convert_pdf_to_images(pdf_path: PathLike, output_dir: PathLike = "images", d
 
     _ensure_output_dir(output_dir)
 
+    image_paths: List[str] = []
+    pdf_basename = pdf_path.stem
+
+    if pages is not None:
+        logger.info(f"Converting {len(pages)} page(s) of PDF: {pdf_path}")
+        for page_number, image in iter_pdf_pages(pdf_path, dpi=dpi, pages=pages):
+            image_path = output_dir / page_image_name(pdf_basename, page_number, image_format)
+            save_page_image(image, image_path, image_format)
+            image.close()
+            image_paths.append(str(image_path))
+            logger.debug(f"Saved: {image_path}")
+        logger.info(f"Generated {len(image_paths)} image(s)")
+        return image_paths
+
+    from pdf2image import convert_from_path
+
     logger.info(f"Converting PDF: {pdf_path}")
     try:
-        images = convert_from_path(str(pdf_path), dpi=dpi)
+        with stage("rasterize", page=1, dpi=dpi) as record:
+            images = convert_from_path(str(pdf_path), dpi=dpi)
+            record["pages"] = len(images)
+            record["pixels"] = sum(image_pixels(image) for image in images)
         logger.info(f"Detected {len(images)} page(s)")
     except Exception as exc:
         raise RuntimeError(f"PDF conversion error: {exc}") from exc
 
-    image_paths: List[str] = []
-    pdf_basename = pdf_path.stem
-
     for i, image in enumerate(images, start=1):
-        image_path = output_dir / f"{pdf_basename}_page_{i:03d}.png"
-        image.save(image_path, "PNG")
+        image_path = output_dir / page_image_name(pdf_basename, i, image_format)
+        save_page_image(image, image_path, image_format)
         image_paths.append(str(image_path))
         logger.debug(f"Saved: {image_path}")
 
@@ -0,0 +1,667 @@
+"""
+Page-level OCR pipeline shared by the CLI processing modes.
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from pdfocr.cache import CacheConfig, open_cache, page_cache_key
+from pdfocr.engines import ENGINE_NAMES, OcrData, data_to_text, data_to_words, get_engine, mean_confidence
+from pdfocr.image_to_text import extract_page_data, extract_text_cached
+from pdfocr.limits import deadline, retry_dpi
+from pdfocr.metrics import image_pixels, stage
+from pdfocr.parallel import (
+    SharedImage,
+    create_ocr_pool,
+    imap_ordered,
+    load_shared_image,
+    release_shared,
+    resolve_workers,
+    share_image,
+)
+from pdfocr.pdf_to_image import (
+    get_page_count,
+    iter_pdf_pages,
+    page_image_name,
+    render_page,
+    save_page_image,
+)
+from pdfocr.routing import finish_route, route_page
+from pdfocr.text_layer import usable_text_layer_pages
+from pdfocr.types import PathLike
+from pdfocr.writers import DocumentWriter
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from pdfocr.prefilter import PageFilter
+
+logger = logging.getLogger(__name__)
+
+
+SOURCE_OCR = "ocr"
+SOURCE_TEXT_LAYER = "text-layer"
+SOURCE_BLANK = "blank"
+SOURCE_DUPLICATE = "duplicate"
+# Page given up after repeated errors (distributed workers)
+SOURCE_FAILED = "failed"
+
+# Pages whose mean word confidence is below this are re-rendered in adaptive mode
+DEFAULT_MIN_CONFIDENCE = 70.0
+
+# Image preprocessing steps (see preprocess), in the order they run
+PREPROCESS_STEPS = ("gray", "crop", "deskew", "binarize", "despeckle")
+
+
+def parse_preprocess(spec: str) -> Tuple[str, ...]:
+    """
+    Parse "gray", "crop,deskew", "binarize+despeckle", "all" or "none" into steps in run order.
+
+    "gray" is dropped when combined with other steps, so equivalent specs
+    give the same steps (and the same OCR cache keys).
+
+    Raises:
+        ValueError: For unknown step names
+    """
+    spec = spec.strip().lower()
+    if spec in ("", "none"):
+        return ()
+    if spec == "all":
+        names = set(PREPROCESS_STEPS)
+    else:
+        names = {name.strip() for name in spec.replace("+", ",").split(",") if name.strip()}
+    unknown = names - set(PREPROCESS_STEPS)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing step(s): {', '.join(sorted(unknown))} "
+                         f"(choose from {', '.join(PREPROCESS_STEPS)}, all, none)")
+    if len(names) > 1:
+        # Every other step converts to grayscale first
+        names.discard("gray")
+    return tuple(step for step in PREPROCESS_STEPS if step in names)
+
+
+def preprocess_arg(value: str) -> Tuple[str, ...]:
+    """
+    argparse type for --preprocess options (see parse_preprocess).
+    """
+    try:
+        return parse_preprocess(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from None
+
+
+def add_ocr_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the OCR setting options shared by the subcommands (see ocr_options_from_args).
+    """
+    parser.add_argument('-l', '--lang', default='eng+kor', help='OCR language code (default: eng+kor)')
+    parser.add_argument('-d', '--dpi', type=int, default=300, help='Image resolution (default: 300)')
+    parser.add_argument('--engine', choices=ENGINE_NAMES, default='auto', help='OCR backend (default: auto)')
+    parser.add_argument('--adaptive-dpi', type=int, default=None, metavar='DPI',
+                        help='OCR at this lower resolution first, re-render low-confidence pages at --dpi')
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help=f'Confidence a page needs to keep its --adaptive-dpi result '
+                             f'(default: {DEFAULT_MIN_CONFIDENCE:g})')
+    parser.add_argument('--page-timeout', type=float, default=None, metavar='SECONDS',
+                        help='Time limit per page; failing pages are retried once at half the DPI (default: none)')
+    parser.add_argument('--route-lang', action='store_true',
+                        help='OCR each page with only the --lang languages of its detected script')
+    parser.add_argument('--preprocess', type=preprocess_arg, default=(), metavar='STEPS',
+                        help=f'Preprocess page images before OCR ({", ".join(PREPROCESS_STEPS)} or all)')
+
+
+def ocr_options_from_args(args: argparse.Namespace, **fields) -> OcrOptions:
+    """
+    Build OcrOptions from the options of add_ocr_arguments.
+
+    Args:
+        args: Parsed arguments
+        **fields: Further OcrOptions fields (e.g. cache, words)
+    """
+    adaptive_dpi = args.adaptive_dpi if args.adaptive_dpi is not None and args.adaptive_dpi < args.dpi else None
+    return OcrOptions(lang=args.lang, dpi=args.dpi, engine=args.engine, adaptive_dpi=adaptive_dpi,
+                      min_confidence=args.min_confidence, page_timeout=args.page_timeout,
+                      route_lang=args.route_lang, preprocess=args.preprocess, **fields)
+
+
+@dataclass(frozen=True)
+class OcrOptions:
+    lang: str = "kor"
+    dpi: int = 300
+    cache: CacheConfig | None = None
+    engine: str = "auto"
+    # First-pass resolution; pages under min_confidence are re-rendered at dpi
+    adaptive_dpi: int | None = None
+    min_confidence: float = DEFAULT_MIN_CONFIDENCE
+    # Keep word boxes and confidences (structured output formats)
+    words: bool = False
+    # Seconds allowed to rasterize a page, and again to OCR it
+    page_timeout: float | None = None
+    # OCR each page with only the languages of its detected script (see routing)
+    route_lang: bool = False
+    # Image preprocessing steps run before OCR (see parse_preprocess)
+    preprocess: Tuple[str, ...] = ()
+
+    @property
+    def render_dpi(self) -> int:
+        """
+        Resolution pages are rasterized at before OCR.
+        """
+        return self.adaptive_dpi or self.dpi
+
+
+@dataclass
+class PageResult:
+    page: int
+    name: str
+    text: str
+    source: str | None = None
+    cached: bool = False
+    dpi: int | None = None
+    confidence: float | None = None
+    # Word boxes (see engines.data_to_words) and page image size, with OcrOptions.words
+    words: List[Dict[str, object]] | None = None
+    size: Tuple[int, int] | None = None
+    # Language set chosen by routing and the OCR seconds it is estimated to have saved
+    lang: str | None = None
+    lang_saved_s: float | None = None
+
+
+@dataclass(frozen=True)
+class PageTask:
+    pdf_path: Path
+    page: int
+    options: OcrOptions = OcrOptions()
+    image_dir: Path | None = None
+    image_format: str = "png"
+    skip_blank: bool = False
+
+
+# The image is None for a page that could not be rasterized
+RenderedPage = Tuple[int, str, "Image.Image | None"]
+
+
+def _data_result(page_number: int,
+                 name: str,
+                 data: OcrData,
+                 image: Image.Image,
+                 dpi: int,
+                 words: bool) -> PageResult:
+    result = PageResult(page_number, name, data_to_text(data), dpi=dpi, confidence=mean_confidence(data))
+    if words:
+        result.words = data_to_words(data)
+        result.size = image.size
+    return result
+
+
+def _cache_value(result: PageResult, words: bool) -> str:
+    if not words:
+        return result.text
+    return json.dumps({"text": result.text, "confidence": result.confidence,
+                       "words": result.words, "size": result.size}, ensure_ascii=False)
+
+
+def _cached_result(page_number: int, name: str, value: str, words: bool) -> PageResult:
+    if not words:
+        return PageResult(page_number, name, value, cached=True)
+    entry = json.loads(value)
+    return PageResult(page_number, name, entry["text"], cached=True, confidence=entry["confidence"],
+                      words=entry["words"], size=tuple(entry["size"]))
+
+
+def _ocr_adaptive_page(page: RenderedPage, options: OcrOptions, pdf_path: Path) -> PageResult:
+    page_number, name, image = page
+    ocr_cache = open_cache(options.cache) if options.cache is not None else None
+    key = None
+    if ocr_cache is not None:
+        # Keyed on the first-pass image and the whole policy, so a hit skips both passes
+        policy = f"adaptive {options.adaptive_dpi}->{options.dpi} @{options.min_confidence:g}"
+        if options.words:
+            policy += " words"
+        if options.preprocess:
+            policy += f" pre={'+'.join(options.preprocess)}"
+        key = page_cache_key(image, options.lang, policy, get_engine(options.engine).cache_tag())
+        value = ocr_cache.get(key)
+        if value is not None:
+            return _cached_result(page_number, name, value, options.words)
+
+    data = extract_page_data(image, options.lang, options.engine, options.preprocess)
+    result = _data_result(page_number, name, data, image, options.adaptive_dpi, options.words)
+    if result.confidence is None or result.confidence < options.min_confidence:
+        logger.info(f"Page {page_number}: confidence {result.confidence or 0:.1f} at {result.dpi} DPI, "
+                    f"re-rendering at {options.dpi} DPI")
+        image.close()
+        with render_page(pdf_path, page_number, dpi=options.dpi) as image:
+            data = extract_page_data(image, options.lang, options.engine, options.preprocess)
+            result = _data_result(page_number, name, data, image, options.dpi, options.words)
+
+    if ocr_cache is not None:
+        ocr_cache.put(key, _cache_value(result, options.words))
+    return result
+
+
+def _ocr_words_page(page: RenderedPage, options: OcrOptions) -> PageResult:
+    page_number, name, image = page
+    ocr_cache = open_cache(options.cache) if options.cache is not None else None
+    key = None
+    if ocr_cache is not None:
+        policy = f"{options.render_dpi} words"
+        if options.preprocess:
+            policy += f" pre={'+'.join(options.preprocess)}"
+        key = page_cache_key(image, options.lang, policy, get_engine(options.engine).cache_tag())
+        value = ocr_cache.get(key)
+        if value is not None:
+            return _cached_result(page_number, name, value, words=True)
+
+    data = extract_page_data(image, options.lang, options.engine, options.preprocess)
+    result = _data_result(page_number, name, data, image, options.render_dpi, words=True)
+    if ocr_cache is not None:
+        ocr_cache.put(key, _cache_value(result, words=True))
+    return result
+
+
+def _ocr_image(page: RenderedPage, options: OcrOptions, pdf_path: Path | None) -> PageResult:
+    page_number, name, image = page
+    with deadline(options.page_timeout), stage("page", page=page_number, name=name, pixels=image_pixels(image)):
+        if not options.route_lang or "+" not in options.lang:
+            return _recognize_page(page, options, pdf_path)
+        route = route_page(image, options)
+        started = time.perf_counter()
+        result = _recognize_page(page, dataclasses.replace(options, lang=route.lang), pdf_path)
+        result.lang = route.lang
+        result.lang_saved_s = finish_route(route, options, time.perf_counter() - started)
+        if route.lang != options.lang:
+            logger.info(f"Page {page_number}: OCR with {route.lang} ({route.script}), "
+                        f"~{result.lang_saved_s:.1f}s saved")
+        else:
+            logger.info(f"Page {page_number}: OCR with all of {route.lang}")
+        return result
+
+
+def _recognize_page(page: RenderedPage, options: OcrOptions, pdf_path: Path | None) -> PageResult:
+    page_number, name, image = page
+    if options.adaptive_dpi is not None and pdf_path is not None:
+        return _ocr_adaptive_page(page, options, pdf_path)
+    if options.words:
+        return _ocr_words_page(page, options)
+    text, cached = extract_text_cached(image, lang=options.lang, dpi=options.render_dpi,
+                                       cache=options.cache, engine=options.engine,
+                                       preprocess=options.preprocess)
+    return PageResult(page_number, name, text, cached=cached,
+                      dpi=None if cached else options.render_dpi)
+
+
+def _retry_page(page_number: int,
+                name: str,
+                options: OcrOptions,
+                pdf_path: Path | None,
+                error: Exception) -> PageResult:
+    # One more try at reduced resolution, which is what usually makes a page blow up or hang
+    dpi = retry_dpi(options.render_dpi)
+    if pdf_path is None or dpi is None:
+        logger.error(f"Error: page {page_number}: {error}")
+        return PageResult(page_number, name, "", SOURCE_FAILED)
+    logger.warning(f"Page {page_number} failed ({error}); retrying at {dpi} DPI")
+    retry_options = dataclasses.replace(options, dpi=dpi, adaptive_dpi=None)
+    try:
+        with deadline(options.page_timeout):
+            image = render_page(pdf_path, page_number, dpi=dpi)
+        try:
+            return _ocr_image((page_number, name, image), retry_options, pdf_path)
+        finally:
+            image.close()
+    except Exception as exc:
+        logger.error(f"Error: page {page_number} failed again at {dpi} DPI: {exc}")
+        return PageResult(page_number, name, "", SOURCE_FAILED)
+
+
+def _ocr_rendered_page(page: RenderedPage,
+                       options: OcrOptions,
+                       pdf_path: Path | None = None) -> PageResult:
+    page_number, name, image = page
+    if image is None:
+        # Rasterization already failed (and was retried)
+        return PageResult(page_number, name, "", SOURCE_FAILED)
+    try:
+        return _ocr_image(page, options, pdf_path)
+    except Exception as exc:
+        error = exc
+    finally:
+        image.close()
+    return _retry_page(page_number, name, options, pdf_path, error)
+
+
+def _ocr_shared_page(page: Tuple[int, str, SharedImage],
+                     options: OcrOptions,
+                     pdf_path: Path | None = None) -> PageResult:
+    page_number, name, ref = page
+    image = load_shared_image(ref) if ref is not None else None
+    return _ocr_rendered_page((page_number, name, image), options, pdf_path)
+
+
+def ocr_pdf_page(task: PageTask) -> PageResult:
+    """
+    Render and OCR one page of a PDF; meant to run inside a pool worker.
+
+    Args:
+        task: Page to process and its OCR settings
+
+    Returns:
+        PageResult; a page whose rendering or OCR fails (or exceeds
+        options.page_timeout) is retried once at reduced DPI, and has empty
+        text and source SOURCE_FAILED when that fails too
+    """
+    name = page_image_name(task.pdf_path.stem, task.page, task.image_format)
+    try:
+        with deadline(task.options.page_timeout):
+            image = render_page(task.pdf_path, task.page, dpi=task.options.render_dpi)
+    except Exception as exc:
+        return _retry_page(task.page, name, task.options, task.pdf_path, exc)
+
+    if task.image_dir is not None:
+        try:
+            save_page_image(image, task.image_dir / name, task.image_format)
+        except Exception as exc:
+            logger.warning(f"Failed to save {name}: {exc}")
+    if task.skip_blank:
+        from pdfocr.prefilter import is_blank_page
+
+        if is_blank_page(image):
+            image.close()
+            return PageResult(task.page, name, "", SOURCE_BLANK)
+    return _ocr_rendered_page((task.page, name, image), task.options, task.pdf_path)
+
+
+def text_layer_results(pdf_path: PathLike) -> Dict[int, PageResult]:
+    """
+    Build results for the pages whose embedded text layer makes OCR unnecessary.
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        Dictionary mapping page numbers to text-layer PageResults
+    """
+    pdf_path = Path(pdf_path).expanduser().resolve()
+    return {
+        page: PageResult(page, page_image_name(pdf_path.stem, page), text, SOURCE_TEXT_LAYER)
+        for page, text in usable_text_layer_pages(pdf_path).items()
+    }
+
+
+def save_page_results(results: Iterable[PageResult],
+                      output_path: PathLike,
+                      output_format: str = "text",
+                      document: str | None = None) -> Path:
+    """
+    Write page results, already in page order, to an output file.
+
+    Args:
+        results: Page results in page order
+        output_path: Output file path
+        output_format: "text", "jsonl" or "hocr" (default: "text")
+        document: Document name recorded in structured formats (default: file stem)
+
+    Returns:
+        Path to the written file
+    """
+    output_path = Path(output_path)
+    with DocumentWriter(output_path, document or output_path.stem, output_format) as writer:
+        for result in results:
+            writer.write(result)
+    logger.info(f"Saved: {output_path}")
+    return output_path
+
+
+def render_pdf_pages(pdf_path: PathLike,
+                     dpi: int = 300,
+                     chunk_size: int = 4,
+                     image_dir: PathLike | None = None,
+                     pages: Sequence[int] | None = None,
+                     image_format: str = "png",
+                     page_timeout: float | None = None) -> Iterator[RenderedPage]:
+    """
+    Rasterize PDF pages into memory, saving them to disk only when asked.
+
+    Args:
+        pdf_path: Path to PDF file
+        dpi: Image resolution (default: 300)
+        chunk_size: Number of pages rendered per pdftoppm call
+        image_dir: Save page images here when given (for --keep-images)
+        pages: 1-based page numbers to render (default: all pages)
+        image_format: File format for saved images (default: "png")
+        page_timeout: Seconds allowed to rasterize one page (default: no limit)
+
+    Yields:
+        Tuples of (page number, page name, PIL image), in page order; the
+        image is None for a page that could not be rasterized even alone
+        and at reduced DPI
+    """
+    pdf_path = Path(pdf_path).expanduser().resolve()
+    if image_dir is not None:
+        Path(image_dir).mkdir(parents=True, exist_ok=True)
+
+    for page_number, image in iter_pdf_pages(pdf_path, dpi=dpi, chunk_size=chunk_size, pages=pages,
+                                             page_timeout=page_timeout, skip_failed=True):
+        name = page_image_name(pdf_path.stem, page_number, image_format)
+        if image is None:
+            logger.error(f"Error: page {page_number} could not be rasterized")
+        elif image_dir is not None:
+            try:
+                save_page_image(image, Path(image_dir) / name, image_format)
+            except Exception as exc:
+                logger.warning(f"Failed to save {name}: {exc}")
+        yield page_number, name, image
+
+
+def _ocr_page_images(pages: Iterable[RenderedPage],
+                     options: OcrOptions,
+                     workers: int,
+                     pdf_path: Path | None,
+                     max_memory_mb: int | None = None) -> Iterator[PageResult]:
+    # A memory cap needs a worker process, even for a single worker
+    if workers == 1 and max_memory_mb is None:
+        for page in pages:
+            yield _ocr_rendered_page(page, options, pdf_path)
+        return
+
+    blocks = {}
+    # Shared pages handed to the pool and not yielded yet, in input order
+    in_flight: Dict[int, Tuple[int, str, SharedImage | None]] = {}
+
+    def shared_pages() -> Iterator[Tuple[int, str, SharedImage]]:
+        for page_number, name, image in pages:
+            ref = None
+            if image is not None:
+                ref, shm = share_image(image)
+                image.close()
+                blocks[page_number] = shm
+            in_flight[page_number] = (page_number, name, ref)
+            yield page_number, name, ref
+
+    def finish(result: PageResult) -> PageResult:
+        in_flight.pop(result.page, None)
+        shm = blocks.pop(result.page, None)
+        if shm is not None:
+            release_shared(shm)
+        return result
+
+    ocr_shared = partial(_ocr_shared_page, options=options, pdf_path=pdf_path)
+    window = 2 * resolve_workers(workers)
+    source = shared_pages()
+    pool = create_ocr_pool(workers, max_memory_mb)
+    try:
+        while True:
+            try:
+                for result in imap_ordered(pool, ocr_shared, source, window):
+                    yield finish(result)
+                break
+            except BrokenProcessPool:
+                logger.warning("An OCR worker died; restarting the worker pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = create_ocr_pool(workers, max_memory_mb)
+            # The pages in flight come first in page order; run them one at a time to find the culprit
+            for page in list(in_flight.values()):
+                try:
+                    result = pool.submit(ocr_shared, page).result()
+                except BrokenProcessPool:
+                    logger.error(f"Error: page {page[0]} crashed its worker; marked as failed")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = create_ocr_pool(workers, max_memory_mb)
+                    result = PageResult(page[0], page[1], "", SOURCE_FAILED)
+                yield finish(result)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        for shm in blocks.values():
+            release_shared(shm)
+
+
+def _prefiltered_page_images(pages: Iterable[RenderedPage],
+                             options: OcrOptions,
+                             workers: int,
+                             pdf_path: Path | None,
+                             page_filter: PageFilter,
+                             max_memory_mb: int | None = None) -> Iterator[PageResult]:
+    from pdfocr.prefilter import PAGE_BLANK, PAGE_OCR
+
+    # (input index, filter ref) of pages sent to OCR, and skipped pages waiting for their turn
+    ocr_refs: Deque[Tuple[int, int]] = deque()
+    skipped: Deque[Tuple[int, int, str, str, int | None]] = deque()
+
+    def pages_to_ocr() -> Iterator[RenderedPage]:
+        for index, (page_number, name, image) in enumerate(pages):
+            # Unrendered pages go through to be reported as failed
+            status, ref = page_filter.classify(image) if image is not None else (PAGE_OCR, None)
+            if status == PAGE_OCR:
+                ocr_refs.append((index, ref))
+                yield page_number, name, image
+            else:
+                image.close()
+                skipped.append((index, page_number, name, status, ref))
+
+    def skipped_before(index: int | None) -> Iterator[PageResult]:
+        # A duplicate always follows its original, whose text is recorded by now
+        while skipped and (index is None or skipped[0][0] < index):
+            _, page_number, name, status, ref = skipped.popleft()
+            if status == PAGE_BLANK:
+                yield PageResult(page_number, name, "", SOURCE_BLANK)
+            else:
+                yield PageResult(page_number, name, page_filter.text(ref), SOURCE_DUPLICATE)
+
+    for result in _ocr_page_images(pages_to_ocr(), options, workers, pdf_path, max_memory_mb):
+        index, ref = ocr_refs.popleft()
+        if ref is not None and result.source != SOURCE_FAILED:
+            page_filter.record(ref, result.text)
+        yield from skipped_before(index)
+        yield result
+    yield from skipped_before(None)
+
+
+def ocr_page_images(pages: Iterable[RenderedPage],
+                    options: OcrOptions = OcrOptions(),
+                    workers: int = 1,
+                    pdf_path: PathLike | None = None,
+                    page_filter: PageFilter | None = None,
+                    max_memory_mb: int | None = None) -> Iterator[PageResult]:
+    """
+    OCR rendered page images straight from memory.
+
+    With several workers, each image is copied into shared memory for its
+    worker instead of being encoded to a file or pickled.
+
+    Args:
+        pages: Tuples of (page number, page name, PIL image), rendered at options.render_dpi
+        options: OCR settings (language, resolution, cache, engine)
+        workers: Number of OCR processes (default: 1, 0 = one per CPU)
+        pdf_path: Source PDF, needed to re-render low-confidence pages in
+            adaptive DPI mode
+        page_filter: Skip blank pages and reuse the text of pages already
+            seen by this filter instead of OCRing them (default: OCR all)
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
+
+    Yields:
+        PageResult for each page, in input order
+    """
+    if pdf_path is not None:
+        pdf_path = Path(pdf_path).expanduser().resolve()
+
+    if page_filter is not None:
+        yield from _prefiltered_page_images(pages, options, workers, pdf_path, page_filter, max_memory_mb)
+        return
+    yield from _ocr_page_images(pages, options, workers, pdf_path, max_memory_mb)
+
+
+def stream_pdf_pages(pdf_path: PathLike,
+                     options: OcrOptions = OcrOptions(),
+                     chunk_size: int = 4,
+                     image_dir: PathLike | None = None,
+                     workers: int = 1,
+                     use_text_layer: bool = False,
+                     image_format: str = "png",
+                     page_filter: PageFilter | None = None,
+                     completed: Dict[int, PageResult] | None = None,
+                     max_memory_mb: int | None = None,
+                     pages: Sequence[int] | None = None) -> Iterator[PageResult]:
+    """
+    Rasterize and OCR a PDF one page at a time.
+
+    Each page is handed to OCR as soon as it is rendered and released right
+    after, so memory stays flat regardless of the page count. With several
+    workers, only a small window of pages is in flight at once.
+
+    Args:
+        pdf_path: Path to PDF file
+        options: OCR settings (language, resolution, cache, engine)
+        chunk_size: Number of pages rendered per pdftoppm call
+        image_dir: Save page images here when given (for --keep-images)
+        workers: Number of OCR processes (default: 1, 0 = one per CPU)
+        use_text_layer: Use the embedded text layer where usable and only
+            rasterize/OCR the remaining pages
+        image_format: File format for saved images (default: "png")
+        page_filter: Skip blank and already seen pages (default: OCR all)
+        completed: Results of an earlier, interrupted run; these pages are
+            yielded as-is instead of being rendered again
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
+        pages: Sorted 1-based page numbers to process (default: all pages)
+
+    Yields:
+        PageResult for each page, in page order
+    """
+    pdf_path = Path(pdf_path).expanduser().resolve()
+
+    if not use_text_layer and not completed:
+        rendered = render_pdf_pages(pdf_path, options.render_dpi, chunk_size, image_dir, pages, image_format,
+                                    options.page_timeout)
+        yield from ocr_page_images(rendered, options, workers, pdf_path, page_filter, max_memory_mb)
+        return
+
+    if pages is None:
+        pages = range(1, get_page_count(pdf_path) + 1)
+    known_pages = dict(completed or {})
+    if use_text_layer:
+        for page, result in text_layer_results(pdf_path).items():
+            known_pages.setdefault(page, result)
+    ocr_pages = [page for page in pages if page not in known_pages]
+    rendered = render_pdf_pages(pdf_path, options.render_dpi, chunk_size, image_dir, ocr_pages, image_format,
+                                options.page_timeout)
+    ocr_iter = ocr_page_images(rendered, options, workers, pdf_path, page_filter, max_memory_mb)
+
+    # Both sources are in page order, so interleave them by page number
+    for page in pages:
+        if page in known_pages:
+            yield known_pages.pop(page)
+        else:
+            result = next(ocr_iter)
+            if use_text_layer:
+                result.source = result.source or SOURCE_OCR
+            yield result
@@ -0,0 +1,170 @@
+"""
+Cheap pre-OCR checks: skip blank pages and reuse OCR text for repeated pages.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Set, Tuple
+
+import cv2
+import numpy as np
+
+from pdfocr.image_utils import ImageInput, load_gray
+
+logger = logging.getLogger(__name__)
+
+PAGE_OCR = "ocr"
+PAGE_BLANK = "blank"
+PAGE_DUPLICATE = "duplicate"
+
+# Width pages are downscaled to for the blank check (~6 px per character line at 300 DPI)
+THUMB_WIDTH = 512
+# Pages with a smaller share of ink pixels are treated as blank
+BLANK_INK_RATIO = 0.0005
+# Distinct pages whose text is kept for reuse; the least recently matched are dropped first
+MAX_TRACKED_PAGES = 1000
+
+
+@dataclass(frozen=True)
+class PageSignature:
+    ink_ratio: float
+    # SHA-256 of the full-resolution grayscale pixels; only identical pages share it
+    digest: str
+
+
+def _ink_ratio(gray: np.ndarray) -> float:
+    height, width = gray.shape[:2]
+    thumb_height = max(1, round(height * THUMB_WIDTH / max(1, width)))
+    thumb = cv2.resize(gray, (THUMB_WIDTH, thumb_height), interpolation=cv2.INTER_AREA)
+    # Same binarization as layout.detect_blocks, scaled down to the thumbnail
+    ink = cv2.adaptiveThreshold(
+        thumb, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 15, 15
+    )
+    return float((ink > 0).mean())
+
+
+def page_signature(source: ImageInput) -> PageSignature:
+    """
+    Compute the ink ratio and exact pixel digest of a page.
+
+    A near-identical page (one erased character) can OCR differently, so text
+    is only reused for pages whose rendered pixels are identical. Tesseract
+    binarizes from grayscale, so the grayscale pixels are what is compared.
+
+    Args:
+        source: Page image (path, array or PIL image)
+
+    Returns:
+        PageSignature of the page
+    """
+    gray = np.ascontiguousarray(load_gray(source))
+    height, width = gray.shape[:2]
+    digest = hashlib.sha256(f"{width}x{height}|".encode("ascii"))
+    digest.update(gray.data)
+    return PageSignature(ink_ratio=_ink_ratio(gray), digest=digest.hexdigest())
+
+
+@dataclass
+class PageFilter:
+    """
+    Run-wide blank/duplicate tracker.
+
+    classify() every page in processing order; pages it returns as PAGE_OCR
+    must have their text handed back through record() before a later
+    duplicate of them asks for text().
+    """
+
+    blank_ratio: float = BLANK_INK_RATIO
+    max_pages: int = MAX_TRACKED_PAGES
+    blank: int = 0
+    duplicates: int = 0
+    # Pixel digest -> id of the first page with those pixels, least recently matched first
+    _seen: "OrderedDict[str, int]" = field(default_factory=OrderedDict, repr=False)
+    _texts: Dict[int, str] = field(default_factory=dict, repr=False)
+    # Duplicates classified but not yet answered by text(), per original page id
+    _pending: Dict[int, int] = field(default_factory=dict, repr=False)
+    # Ids in _seen, and ids dropped from it whose text is still owed to pending duplicates
+    _live: Set[int] = field(default_factory=set, repr=False)
+    _retired: Set[int] = field(default_factory=set, repr=False)
+    _next_ref: int = field(default=0, repr=False)
+
+    @property
+    def saved(self) -> int:
+        """
+        Number of OCR calls avoided so far.
+        """
+        return self.blank + self.duplicates
+
+    def classify(self, source: ImageInput) -> Tuple[str, int | None]:
+        """
+        Decide whether a page needs OCR.
+
+        Args:
+            source: Page image
+
+        Returns:
+            Tuple of (PAGE_OCR, id to record() its text under),
+            (PAGE_DUPLICATE, id of the original page) or (PAGE_BLANK, None)
+        """
+        signature = page_signature(source)
+        if signature.ink_ratio < self.blank_ratio:
+            self.blank += 1
+            return PAGE_BLANK, None
+
+        ref = self._seen.get(signature.digest)
+        if ref is not None:
+            self._seen.move_to_end(signature.digest)
+            self._pending[ref] = self._pending.get(ref, 0) + 1
+            self.duplicates += 1
+            return PAGE_DUPLICATE, ref
+
+        ref = self._next_ref
+        self._next_ref += 1
+        self._seen[signature.digest] = ref
+        self._live.add(ref)
+        while len(self._seen) > max(1, self.max_pages):
+            _, old = self._seen.popitem(last=False)
+            self._retire(old)
+        return PAGE_OCR, ref
+
+    def _retire(self, ref: int) -> None:
+        self._live.discard(ref)
+        if self._pending.get(ref):
+            self._retired.add(ref)
+        else:
+            self._texts.pop(ref, None)
+
+    def record(self, ref: int, text: str) -> None:
+        """
+        Store the OCR text of a page classified as PAGE_OCR.
+        """
+        if ref in self._live or ref in self._retired:
+            self._texts[ref] = text
+
+    def text(self, ref: int) -> str:
+        """
+        Return the OCR text of the original page a duplicate refers to.
+
+        Call once per PAGE_DUPLICATE result.
+        """
+        pending = self._pending.get(ref, 0) - 1
+        if pending > 0:
+            self._pending[ref] = pending
+            return self._texts.get(ref, "")
+        self._pending.pop(ref, None)
+        if ref in self._retired:
+            self._retired.discard(ref)
+            return self._texts.pop(ref, "")
+        return self._texts.get(ref, "")
+
+    def summary(self) -> str:
+        return (f"Prefilter: {self.blank} blank and {self.duplicates} duplicate page(s) skipped, "
+                f"{self.saved} OCR call(s) saved")
+
+
+def is_blank_page(source: ImageInput, blank_ratio: float = BLANK_INK_RATIO) -> bool:
+    """
+    Return True when a page has (almost) no ink.
+    """
+    return _ink_ratio(load_gray(source)) < blank_ratio
@@ -0,0 +1,232 @@
+"""
+Optional image preprocessing before Tesseract.
+
+Pages are rasterized as full-color RGB and Tesseract binarizes them itself,
+spending time on noise, scanner borders and skew along the way. These steps
+do that work once with NumPy/OpenCV and hand Tesseract a smaller 8-bit or
+1-bit image:
+
+- gray: 8-bit grayscale (implied by every other step)
+- crop: cut margins and dark scanner borders down to the inked area
+- deskew: straighten text lines, angle found with a projection profile
+- binarize: adaptive threshold (layout.ink_mask), sent as a 1-bit image
+- despeckle: drop isolated specks (binarized) or median-filter (grayscale)
+
+Steps always run in that order (pipeline.PREPROCESS_STEPS). Cropping and deskewing move pixels, so word
+boxes are mapped back to page coordinates with PageTransform.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from pdfocr.image_utils import load_gray
+from pdfocr.layout import DEFAULT_DETECT_SCALE, ink_mask
+from pdfocr.metrics import stage
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from pdfocr.engines import OcrData
+
+# Crop box and skew angle are found on a copy downscaled by this factor
+ANALYSIS_SCALE = DEFAULT_DETECT_SCALE
+# Margin kept around the inked area, as a fraction of the page width
+CROP_MARGIN = 0.01
+# Ink components up to this many pixels (at analysis scale) do not extend the crop box
+MIN_CONTENT_AREA = 4
+# Skew angles searched, in degrees
+MAX_SKEW = 5.0
+SKEW_STEP = 0.1
+# Ink pixels sampled for the skew search
+SKEW_SAMPLES = 20000
+# Specks are ink components no wider or taller than this fraction of the page width (~3 px at 300 DPI)
+SPECK_SIZE = 0.0012
+
+
+@dataclass(frozen=True, eq=False)
+class PageTransform:
+    """
+    Maps coordinates of a preprocessed image back to the page.
+
+    Attributes:
+        matrix: 2x3 affine matrix from preprocessed-image to page coordinates
+        size: Page (width, height)
+    """
+
+    matrix: np.ndarray
+    size: Tuple[int, int]
+
+    def map_data(self, data: OcrData) -> OcrData:
+        """
+        Move the boxes of image_to_data output to page coordinates, in place.
+
+        Rotated boxes are replaced by their axis-aligned bounds.
+        """
+        if not data["left"]:
+            return data
+        left = np.asarray(data["left"], dtype=np.float64)
+        top = np.asarray(data["top"], dtype=np.float64)
+        right = left + np.asarray(data["width"], dtype=np.float64)
+        bottom = top + np.asarray(data["height"], dtype=np.float64)
+        # Corners (4, N) -> page coordinates
+        xs = np.stack([left, right, left, right])
+        ys = np.stack([top, top, bottom, bottom])
+        a, b, c = self.matrix[0]
+        d, e, f = self.matrix[1]
+        page_x = a * xs + b * ys + c
+        page_y = d * xs + e * ys + f
+        width, height = self.size
+        x0 = np.clip(np.floor(page_x.min(axis=0)), 0, width)
+        y0 = np.clip(np.floor(page_y.min(axis=0)), 0, height)
+        x1 = np.clip(np.ceil(page_x.max(axis=0)), 0, width)
+        y1 = np.clip(np.ceil(page_y.max(axis=0)), 0, height)
+        data["left"] = x0.astype(int).tolist()
+        data["top"] = y0.astype(int).tolist()
+        data["width"] = (x1 - x0).astype(int).tolist()
+        data["height"] = (y1 - y0).astype(int).tolist()
+        return data
+
+
+def _content_mask(gray: np.ndarray) -> Tuple[np.ndarray, float]:
+    # Ink at analysis scale without components touching the image edge (scanner borders, shadows)
+    height, width = gray.shape
+    size = (max(1, round(width * ANALYSIS_SCALE)), max(1, round(height * ANALYSIS_SCALE)))
+    small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    scale = small.shape[1] / width
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink_mask(small, scale), connectivity=8)
+    x, y, w, h, area = stats.T
+    edge = (x == 0) | (y == 0) | (x + w == small.shape[1]) | (y + h == small.shape[0])
+    keep = ~edge & (area > MIN_CONTENT_AREA)
+    keep[0] = False
+    return keep[labels], scale
+
+
+def content_box(gray: np.ndarray) -> Tuple[int, int, int, int] | None:
+    """
+    Bounding box (x, y, w, h) of the inked area plus a margin, None for a blank page.
+    """
+    mask, scale = _content_mask(gray)
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return None
+    height, width = gray.shape
+    margin = CROP_MARGIN * width
+    x0 = max(0, int(cols[0] / scale - margin))
+    y0 = max(0, int(rows[0] / scale - margin))
+    x1 = min(width, int(np.ceil((cols[-1] + 1) / scale + margin)))
+    y1 = min(height, int(np.ceil((rows[-1] + 1) / scale + margin)))
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def skew_angle(gray: np.ndarray) -> float:
+    """
+    Text-line angle in degrees (counter-clockwise positive), 0 when no text is found.
+
+    Ink pixels are projected onto the vertical axis at every candidate angle;
+    the angle whose row histogram is most peaked lines up the text lines.
+    """
+    mask, _ = _content_mask(gray)
+    ys, xs = np.nonzero(mask)
+    if len(ys) < 2:
+        return 0.0
+    step = max(1, len(ys) // SKEW_SAMPLES)
+    ys, xs = ys[::step].astype(np.float64), xs[::step].astype(np.float64)
+
+    angles = np.arange(-MAX_SKEW, MAX_SKEW + SKEW_STEP / 2, SKEW_STEP)
+    radians = np.deg2rad(angles)
+    # Row of every sampled pixel after rotating the page by each angle: (angles, samples)
+    rows = np.outer(np.cos(radians), ys) + np.outer(np.sin(radians), xs)
+    rows = np.floor(rows - rows.min(axis=1, keepdims=True)).astype(np.int64)
+    span = int(rows.max()) + 1
+    counts = np.bincount((rows + np.arange(len(angles))[:, None] * span).ravel(),
+                         minlength=len(angles) * span).reshape(len(angles), span)
+    scores = (counts.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(scores.argmax())])
+
+
+def _rotate(gray: np.ndarray, angle: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Rotate on an enlarged white canvas so no corner is cut off; returns the image and its 2x3 matrix
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width = int(np.ceil(width * cos + height * sin))
+    new_height = int(np.ceil(width * sin + height * cos))
+    matrix[0, 2] += (new_width - width) / 2
+    matrix[1, 2] += (new_height - height) / 2
+    rotated = cv2.warpAffine(gray, matrix, (new_width, new_height),
+                             flags=cv2.INTER_LINEAR, borderValue=255)
+    return rotated, matrix
+
+
+def _despeckle_binary(ink: np.ndarray) -> np.ndarray:
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    speck = max(1, round(SPECK_SIZE * ink.shape[1]))
+    keep = (stats[:, cv2.CC_STAT_WIDTH] > speck) | (stats[:, cv2.CC_STAT_HEIGHT] > speck)
+    keep[0] = False
+    return np.where(keep[labels], 255, 0).astype(np.uint8)
+
+
+def preprocess_image(image: Image.Image, steps: Sequence[str]) -> Tuple[Image.Image, PageTransform | None]:
+    """
+    Run preprocessing steps on a page image.
+
+    Args:
+        image: Page image
+        steps: Steps from pipeline.PREPROCESS_STEPS (run in that order whatever the input order)
+
+    Returns:
+        Tuple of (image for Tesseract: mode "L", or "1" after binarize;
+        transform back to page coordinates, None when pixels did not move)
+    """
+    from PIL import Image
+
+    steps = set(steps)
+    with stage("preprocess", step="gray", pixels=image.size[0] * image.size[1]):
+        gray = load_gray(image)
+    # Processed-image -> page coordinates, as a 3x3 matrix
+    to_page = np.eye(3)
+
+    if "crop" in steps:
+        with stage("preprocess", step="crop", pixels=gray.size) as record:
+            box = content_box(gray)
+            if box is not None:
+                x, y, w, h = box
+                gray = gray[y:y + h, x:x + w]
+                to_page = to_page @ np.array([[1, 0, x], [0, 1, y], [0, 0, 1]], dtype=np.float64)
+            record.update(box=box)
+
+    if "deskew" in steps:
+        with stage("preprocess", step="deskew", pixels=gray.size) as record:
+            angle = skew_angle(gray)
+            if abs(angle) >= SKEW_STEP:
+                gray, matrix = _rotate(gray, -angle)
+                forward = np.vstack([matrix, [0, 0, 1]])
+                to_page = to_page @ np.linalg.inv(forward)
+            record.update(angle=angle)
+
+    ink = None
+    if "binarize" in steps:
+        with stage("preprocess", step="binarize", pixels=gray.size):
+            ink = ink_mask(gray)
+
+    if "despeckle" in steps:
+        with stage("preprocess", step="despeckle", pixels=gray.size):
+            if ink is not None:
+                ink = _despeckle_binary(ink)
+            else:
+                gray = cv2.medianBlur(gray, 3)
+
+    if ink is not None:
+        # Black text on white, one bit per pixel
+        result = Image.fromarray(255 - ink).convert("1", dither=Image.Dither.NONE)
+    else:
+        result = Image.fromarray(gray)
+    transform = None
+    if not np.allclose(to_page, np.eye(3)):
+        transform = PageTransform(to_page[:2].copy(), image.size)
+    return result, transform
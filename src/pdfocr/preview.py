@@ -0,0 +1,110 @@
+"""
+Fast triage of a PDF before paying for a full OCR run.
+
+A preview reads the page count and the embedded text layer, then renders
+and OCRs a small, evenly spread sample of pages at a low resolution. The
+sample's time per page, scaled by pixel count to the target resolution,
+projects how long a full run would take; the sample's mean word confidence
+and character count show whether the pages hold recognizable text at all.
+"""
+import dataclasses
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+from pdfocr.parallel import resolve_workers
+from pdfocr.pdf_to_image import get_page_count
+from pdfocr.pipeline import OcrOptions, ocr_page_images, render_pdf_pages
+from pdfocr.selection import PageSelection, sample_pages
+from pdfocr.text_layer import usable_text_layer_pages
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+# Sample pages are rendered and OCRed at this resolution
+PREVIEW_DPI = 100
+DEFAULT_PREVIEW_SAMPLE = 3
+
+
+@dataclass
+class PreviewEstimate:
+    """
+    Per-document preview result.
+
+    Attributes:
+        pdf_path: Previewed PDF
+        page_count: Pages in the document
+        selected_pages: Pages covered by the page selection
+        text_layer_pages: Selected pages with a usable embedded text layer
+        sampled_pages: Page numbers rendered and OCRed for the estimate
+        sample_s_per_page: Render + OCR seconds per sample page at PREVIEW_DPI
+        mean_confidence: Mean word confidence of the sample (None without words)
+        sample_chars: Characters recognized on the sample
+        projected_ocr_s: Projected time to OCR every selected page
+        projected_text_layer_s: Projected time with --text-layer (only pages
+            without a usable text layer are OCRed)
+    """
+
+    pdf_path: Path
+    page_count: int
+    selected_pages: int
+    text_layer_pages: int
+    sampled_pages: List[int]
+    sample_s_per_page: float
+    mean_confidence: float | None
+    sample_chars: int
+    projected_ocr_s: float
+    projected_text_layer_s: float
+
+
+def preview_pdf(pdf_path: PathLike,
+                options: OcrOptions | None = None,
+                selection: PageSelection | None = None,
+                workers: int = 1) -> PreviewEstimate:
+    """
+    Estimate page count, text-layer coverage and OCR time of a full run.
+
+    Args:
+        pdf_path: Path to PDF file
+        options: Settings of the planned run; its render DPI is the
+            projection target (default: OcrOptions())
+        selection: Pages of the planned run; its ``sample`` is the number of
+            pages OCRed for the estimate (default: DEFAULT_PREVIEW_SAMPLE)
+        workers: OCR processes of the planned run (0 = one per CPU)
+
+    Returns:
+        PreviewEstimate for the document
+    """
+    options = options or OcrOptions()
+    selection = selection or PageSelection()
+    pdf_path = Path(pdf_path).expanduser().resolve()
+
+    page_count = get_page_count(pdf_path)
+    selected = dataclasses.replace(selection, sample=None).resolve(page_count)
+    text_pages = set(usable_text_layer_pages(pdf_path)).intersection(selected)
+    sampled = sample_pages(selected, selection.sample or DEFAULT_PREVIEW_SAMPLE)
+
+    # Uncached and single-pass, so the sample is timed like a cold full run
+    preview_dpi = min(PREVIEW_DPI, options.render_dpi)
+    preview_options = dataclasses.replace(options, dpi=preview_dpi, adaptive_dpi=None, cache=None, words=True)
+    started = time.perf_counter()
+    results = list(ocr_page_images(render_pdf_pages(pdf_path, dpi=preview_dpi, pages=sampled), preview_options))
+    per_page = (time.perf_counter() - started) / len(results) if results else 0.0
+
+    confidences = [result.confidence for result in results if result.confidence is not None]
+    # OCR time grows about linearly with the page's pixel count
+    full_page_s = per_page * (options.render_dpi / preview_dpi) ** 2 / resolve_workers(workers)
+    return PreviewEstimate(
+        pdf_path=pdf_path,
+        page_count=page_count,
+        selected_pages=len(selected),
+        text_layer_pages=len(text_pages),
+        sampled_pages=sampled,
+        sample_s_per_page=per_page,
+        mean_confidence=sum(confidences) / len(confidences) if confidences else None,
+        sample_chars=sum(len(result.text.strip()) for result in results),
+        projected_ocr_s=full_page_s * len(selected),
+        projected_text_layer_s=full_page_s * (len(selected) - len(text_pages)),
+    )
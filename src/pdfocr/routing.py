@@ -0,0 +1,176 @@
+"""
+Per-page OCR language routing.
+
+Tesseract runs every model of a language set such as ``eng+kor`` on each
+page, and every extra language makes it slower. With routing, the dominant
+script of a page is detected first with Tesseract's orientation and script
+detection (OSD) on a downscaled copy, and the page is OCRed with only the
+requested languages written in that script. Pages whose script is uncertain
+or not covered by the set keep the full set.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable
+
+from pdfocr.cache import open_cache, page_cache_key
+from pdfocr.engines import get_engine
+from pdfocr.metrics import stage
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from pdfocr.pipeline import OcrOptions, PageResult
+
+logger = logging.getLogger(__name__)
+
+# Script reported by OSD for the text of each Tesseract language
+LANG_SCRIPTS: Dict[str, str] = {
+    "eng": "Latin", "fra": "Latin", "deu": "Latin", "spa": "Latin", "ita": "Latin",
+    "por": "Latin", "nld": "Latin", "pol": "Latin", "tur": "Latin", "vie": "Latin",
+    "kor": "Hangul", "kor_vert": "Hangul",
+    "jpn": "Japanese", "jpn_vert": "Japanese",
+    "chi_sim": "Han", "chi_tra": "Han", "chi_sim_vert": "Han", "chi_tra_vert": "Han",
+    "rus": "Cyrillic", "ukr": "Cyrillic", "bul": "Cyrillic", "srp": "Cyrillic",
+    "ell": "Greek", "ara": "Arabic", "heb": "Hebrew", "hin": "Devanagari", "tha": "Thai",
+}
+# OSD reports kana-heavy Japanese pages under these names
+SCRIPT_ALIASES = {"Katakana": "Japanese", "Hiragana": "Japanese"}
+# Below this OSD script confidence a page keeps the full language set
+MIN_SCRIPT_CONFIDENCE = 2.0
+# Pages are reduced to about this resolution for OSD
+OSD_DPI = 150
+
+_warned = False
+
+
+@dataclass
+class Route:
+    """
+    Language set chosen for one page.
+
+    Attributes:
+        lang: Languages the page is OCRed with
+        script: Detected script (None when detection failed)
+        confidence: OSD script confidence
+        detect_s: Seconds spent on detection (0 for a cached decision)
+        cached: The decision came from the OCR cache
+        saved_s: Estimated OCR seconds saved, known for cached decisions
+    """
+
+    lang: str
+    script: str | None = None
+    confidence: float | None = None
+    detect_s: float = 0.0
+    cached: bool = False
+    saved_s: float | None = None
+    key: str | None = None
+
+
+def route_languages(lang: str, script: str, confidence: float,
+                    min_confidence: float = MIN_SCRIPT_CONFIDENCE) -> str:
+    """
+    Smallest subset of ``lang`` (e.g. "eng+kor") for a page written in ``script``.
+
+    Returns the full set when the confidence is too low or no language of
+    the set is written in that script.
+    """
+    if confidence < min_confidence:
+        return lang
+    script = SCRIPT_ALIASES.get(script, script)
+    routed = [code for code in lang.split("+") if LANG_SCRIPTS.get(code) == script]
+    return "+".join(routed) if routed else lang
+
+
+def _osd_image(image: Image.Image, dpi: int) -> Image.Image:
+    factor = dpi // OSD_DPI
+    return image.reduce(factor) if factor > 1 else image
+
+
+def route_page(image: Image.Image, options: OcrOptions) -> Route:
+    """
+    Choose the language set for one page, consulting the OCR cache first.
+
+    Args:
+        image: Page image, rendered at options.render_dpi
+        options: OCR settings; options.lang is the candidate set
+
+    Returns:
+        Route with the chosen languages (the full set when detection fails)
+    """
+    global _warned
+
+    ocr_engine = get_engine(options.engine)
+    ocr_cache = open_cache(options.cache) if options.cache is not None else None
+    key = None
+    if ocr_cache is not None:
+        key = page_cache_key(image, options.lang, f"route {options.render_dpi}", ocr_engine.cache_tag())
+        value = ocr_cache.get(key)
+        if value is not None:
+            entry = json.loads(value)
+            return Route(entry["lang"], entry["script"], entry["confidence"], cached=True,
+                         saved_s=entry["saved_s"], key=key)
+
+    started = time.perf_counter()
+    try:
+        with stage("route", langs=options.lang) as record:
+            script, confidence = ocr_engine.detect_script(_osd_image(image, options.render_dpi))
+            record.update(script=script)
+    except Exception as exc:
+        # Typically a missing osd.traineddata; decisions are not cached so a fixed setup takes effect
+        if not _warned:
+            logger.warning(f"Language routing unavailable, using {options.lang}: {exc}")
+            _warned = True
+        return Route(options.lang, detect_s=time.perf_counter() - started)
+    return Route(route_languages(options.lang, script, confidence), script, confidence,
+                 time.perf_counter() - started, key=key)
+
+
+def finish_route(route: Route, options: OcrOptions, ocr_s: float) -> float:
+    """
+    Estimate the OCR time a route saved and cache the decision with it.
+
+    OCR time grows about linearly with the number of languages, so the page
+    would have taken ``ocr_s * full / routed``; detection time is deducted.
+
+    Args:
+        route: Decision returned by route_page()
+        options: OCR settings with the full language set
+        ocr_s: Seconds the OCR with the routed set took
+
+    Returns:
+        Estimated seconds saved (negative when detection cost more)
+    """
+    if route.cached:
+        return route.saved_s
+    full = len(options.lang.split("+"))
+    routed = len(route.lang.split("+"))
+    saved = ocr_s * (full - routed) / routed - route.detect_s
+    if route.key is not None and route.script is not None:
+        entry = {"lang": route.lang, "script": route.script, "confidence": route.confidence,
+                 "saved_s": round(saved, 3)}
+        open_cache(options.cache).put(route.key, json.dumps(entry))
+    return saved
+
+
+def routing_summary(results: Iterable[PageResult]) -> str | None:
+    """
+    One-line summary of the language sets used and the time saved, None without routed pages.
+    """
+    langs: Counter = Counter()
+    saved = 0.0
+    for result in results:
+        if result.lang is None:
+            continue
+        langs[result.lang] += 1
+        saved += result.lang_saved_s or 0.0
+    if not langs:
+        return None
+    used = ", ".join(f"{count} page(s) {lang}" for lang, count in langs.most_common())
+    if saved < 0:
+        return f"Language routing: {used}; detection cost about {-saved:.1f}s more than it saved"
+    return f"Language routing: {used}; about {saved:.1f}s of OCR time saved (estimate)"
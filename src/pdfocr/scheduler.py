@@ -0,0 +1,301 @@
+"""
+Batch-wide page scheduler: OCR pages of many PDFs on one shared pool.
+"""
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, List, Sequence, Tuple
+
+from pdfocr.journal import PageJournal, is_finished, run_settings
+from pdfocr.parallel import create_ocr_pool, resolve_workers
+from pdfocr.pdf_to_image import get_page_count, page_image_name
+from pdfocr.pipeline import (
+    SOURCE_BLANK,
+    SOURCE_FAILED,
+    SOURCE_OCR,
+    OcrOptions,
+    PageResult,
+    PageTask,
+    ocr_pdf_page,
+    text_layer_results,
+)
+from pdfocr.routing import routing_summary
+from pdfocr.selection import PageSelection
+from pdfocr.types import PathLike
+from pdfocr.writers import DocumentWriter, MergedWriter, output_suffix
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Document:
+    pdf_path: Path
+    output_path: Path
+    # Pages to process, sorted (every page unless a page selection is given)
+    page_numbers: List[int]
+    output_format: str = "text"
+    # Finished pages not written yet; pages are written in order as soon as possible
+    pages: Dict[int, PageResult] = field(default_factory=dict)
+    # Position in page_numbers of the next page to write
+    next_index: int = 0
+    journal: PageJournal | None = None
+    writer: DocumentWriter | None = None
+    merged: MergedWriter | None = None
+    slot: int | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.next_index >= len(self.page_numbers)
+
+    @property
+    def remaining(self) -> int:
+        return len(self.page_numbers) - self.next_index - len(self.pages)
+
+
+def _open_writer(doc: _Document) -> DocumentWriter:
+    if doc.writer is None:
+        doc.writer = DocumentWriter(doc.output_path, doc.pdf_path.name, doc.output_format, doc.merged, doc.slot)
+    return doc.writer
+
+
+def _write_ready_pages(doc: _Document) -> None:
+    # Write the run of finished pages that continues the file; later pages wait in doc.pages
+    while not doc.done and doc.page_numbers[doc.next_index] in doc.pages:
+        _open_writer(doc).write(doc.pages.pop(doc.page_numbers[doc.next_index]))
+        doc.next_index += 1
+
+
+def _write_document(doc: _Document) -> None:
+    _write_ready_pages(doc)
+    _open_writer(doc).close()
+    if doc.journal is not None:
+        doc.journal.finish()
+        doc.journal = None
+
+
+def _abandon_document(doc: _Document) -> None:
+    doc.pages.clear()
+    if doc.journal is not None:
+        doc.journal.close()
+        doc.journal = None
+    if doc.writer is not None:
+        doc.writer.close(completed=False)
+    elif doc.merged is not None:
+        doc.merged.finish_document(doc.slot, completed=False)
+
+
+def _plan_documents(pdf_paths: Sequence[PathLike],
+                    output_dir: PathLike | None,
+                    use_text_layer: bool,
+                    options: OcrOptions,
+                    resume: bool,
+                    output_format: str,
+                    merged: MergedWriter | None,
+                    selection: PageSelection | None) -> List[_Document | Path | None]:
+    docs: List[_Document | Path | None] = []
+    settings = run_settings(options, use_text_layer)
+    for pdf_path in pdf_paths:
+        pdf_path = Path(pdf_path).expanduser().resolve()
+        target_dir = pdf_path.parent if output_dir is None else Path(output_dir).expanduser().resolve()
+        output_path = target_dir / f"{pdf_path.stem}{output_suffix(output_format)}"
+        # Merged file positions follow the input order
+        slot = merged.add_document(pdf_path.name) if merged is not None else None
+        if resume and is_finished(output_path):
+            print(f"Skipping finished file: {output_path}")
+            if merged is not None:
+                merged.add_file(slot, output_path)
+            docs.append(output_path)
+            continue
+        try:
+            page_count = get_page_count(pdf_path)
+        except Exception as exc:
+            print(f"Error: {pdf_path.name} - {exc}")
+            if merged is not None:
+                merged.finish_document(slot, completed=False)
+            docs.append(None)
+            continue
+        page_numbers = selection.resolve(page_count) if selection is not None else list(range(1, page_count + 1))
+        doc = _Document(pdf_path, output_path, page_numbers, output_format, merged=merged, slot=slot)
+        doc.journal = PageJournal(output_path, pdf_path, settings, resume=resume)
+        selected = set(page_numbers)
+        doc.pages.update((page, result) for page, result in doc.journal.completed().items() if page in selected)
+        if use_text_layer:
+            for page, result in text_layer_results(pdf_path).items():
+                if page in selected:
+                    doc.pages.setdefault(page, result)
+        docs.append(doc)
+    return docs
+
+
+def run_page_scheduler(pdf_paths: Sequence[PathLike],
+                       output_dir: PathLike | None = None,
+                       image_dir: PathLike | None = None,
+                       options: OcrOptions = OcrOptions(),
+                       workers: int = 0,
+                       use_text_layer: bool = False,
+                       image_format: str = "png",
+                       skip_blank: bool = False,
+                       resume: bool = False,
+                       output_format: str = "text",
+                       merged: MergedWriter | None = None,
+                       max_memory_mb: int | None = None,
+                       pages: PageSelection | None = None) -> List[Path | None]:
+    """
+    OCR every page of every PDF on a single shared process pool.
+
+    All pages of the batch go into one work queue, so small files do not wait
+    behind large ones and cores stay busy across file boundaries. Pages are
+    appended to their file as soon as all pages before them are done.
+
+    A worker that dies (crash, OOM kill, memory cap) breaks the whole pool.
+    The pool is restarted and the pages that were in flight are run again
+    one at a time; a page that brings down a worker on its own is marked as
+    failed, and the rest of the batch continues at full width.
+
+    Args:
+        pdf_paths: List of PDF file paths
+        output_dir: Output directory for text files (defaults to each PDF's directory)
+        image_dir: Save page images here when given (for --keep-images)
+        options: OCR settings (language, resolution, cache, engine)
+        workers: Number of OCR processes (0 = one per CPU)
+        use_text_layer: Take pages with a usable text layer as-is; only the
+            remaining pages are queued for OCR
+        image_format: File format for saved images (default: "png")
+        skip_blank: Let workers skip OCR of blank pages; duplicate detection
+            needs pages in order and is not available here
+        resume: Skip files finished by an earlier run and pages recorded in
+            their journals
+        output_format: "text", "jsonl" or "hocr" (default: "text")
+        merged: Merged file of the batch, written in the same pass (default: none)
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
+        pages: Pages to process in every file (default: all pages)
+
+    Returns:
+        Output path per input file, in input order (None for failed files)
+    """
+    planned = _plan_documents(pdf_paths, output_dir, use_text_layer, options, resume, output_format, merged, pages)
+    outputs: List[Path | None] = [p if isinstance(p, Path) else None for p in planned]
+    docs = [doc if isinstance(doc, _Document) else None for doc in planned]
+    page_total = sum(doc.remaining for doc in docs if doc is not None)
+
+    saved_image_dir = None
+    if image_dir is not None:
+        saved_image_dir = Path(image_dir).expanduser().resolve()
+        saved_image_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"Scheduling {page_total} page(s) from {len(docs)} file(s) "
+                f"on {resolve_workers(workers)} worker(s)")
+
+    queued: Deque[Tuple[int, PageTask]] = deque()
+    for index, doc in enumerate(docs):
+        if doc is None:
+            continue
+        if doc.remaining == 0:
+            try:
+                _write_document(doc)
+                outputs[index] = doc.output_path
+            except Exception as exc:
+                print(f"Error: File save failed - {exc}")
+                _abandon_document(doc)
+            continue
+        for page_number in doc.page_numbers:
+            if page_number not in doc.pages:
+                queued.append((index, PageTask(doc.pdf_path, page_number, options, saved_image_dir,
+                                               image_format, skip_blank)))
+
+    # Pages are submitted in a window so a crash only puts the pages in flight under suspicion
+    window = 2 * resolve_workers(workers)
+    pending: Dict[Future, Tuple[int, PageTask]] = {}
+    suspects: Deque[Tuple[int, PageTask]] = deque()
+    alone = False
+    finished_files = 0
+    rerendered = 0
+    blank = 0
+    failed = 0
+    # Routed pages without their text, for the routing summary
+    routed: List[PageResult] = []
+    pool = create_ocr_pool(workers, max_memory_mb)
+    try:
+        while queued or suspects or pending:
+            if suspects:
+                # Pages that were in flight when a worker died run one at a time
+                if not pending:
+                    entry = suspects.popleft()
+                    pending[pool.submit(ocr_pdf_page, entry[1])] = entry
+                    alone = True
+            else:
+                alone = False
+                while queued and len(pending) < window:
+                    entry = queued.popleft()
+                    pending[pool.submit(ocr_pdf_page, entry[1])] = entry
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # A broken pool fails every page it holds; collect them all
+                wait(pending)
+                done = set(pending)
+            finished: List[Tuple[int, PageResult]] = []
+            crashed: List[Tuple[int, PageTask]] = []
+            for future in done:
+                index, task = pending.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    crashed.append((index, task))
+                else:
+                    finished.append((index, future.result()))
+
+            if crashed:
+                logger.warning("An OCR worker died; restarting the worker pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = create_ocr_pool(workers, max_memory_mb)
+                if alone:
+                    index, task = crashed[0]
+                    logger.error(f"Page {task.page} of {task.pdf_path.name} crashed its worker; marked as failed")
+                    finished.append((index, PageResult(task.page, page_image_name(task.pdf_path.stem, task.page),
+                                                       "", SOURCE_FAILED)))
+                else:
+                    suspects.extend(crashed)
+
+            for index, result in finished:
+                doc = docs[index]
+                if doc is None:
+                    # Output of this file failed; its remaining pages are dropped
+                    continue
+                if options.adaptive_dpi is not None and result.dpi == options.dpi:
+                    rerendered += 1
+                blank += result.source == SOURCE_BLANK
+                failed += result.source == SOURCE_FAILED
+                if result.lang is not None:
+                    routed.append(PageResult(result.page, result.name, "", lang=result.lang,
+                                             lang_saved_s=result.lang_saved_s))
+                if use_text_layer:
+                    result.source = result.source or SOURCE_OCR
+                doc.pages[result.page] = result
+                doc.journal.record(result)
+                try:
+                    _write_ready_pages(doc)
+                    if not doc.done:
+                        continue
+                    _write_document(doc)
+                    outputs[index] = doc.output_path
+                    finished_files += 1
+                    print(f"[{finished_files}] Completed: {doc.output_path}")
+                except Exception as exc:
+                    print(f"Error: File save failed - {exc}")
+                    _abandon_document(doc)
+                    docs[index] = None
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if failed:
+        print(f"Warning: {failed} page(s) failed and are marked [{SOURCE_FAILED}] in the output")
+    if skip_blank:
+        print(f"Prefilter: {blank} blank page(s) skipped, {blank} OCR call(s) saved")
+    if options.adaptive_dpi is not None:
+        logger.info(f"Adaptive DPI: {rerendered}/{page_total} page(s) re-rendered at {options.dpi} DPI")
+    summary = routing_summary(routed)
+    if summary is not None:
+        print(summary)
+    return outputs
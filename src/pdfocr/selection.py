@@ -0,0 +1,100 @@
+"""
+Page selection for partial runs: ``--pages``, ``--first``/``--last`` and ``--sample``.
+
+Selected pages keep their real page numbers everywhere (page headers,
+JSONL records, page image names), so a partial output lines up with the
+full document.
+"""
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+# Inclusive (first, last) page range; last None means "to the end"
+PageRange = Tuple[int, "int | None"]
+
+
+def parse_page_ranges(spec: str) -> Tuple[PageRange, ...]:
+    """
+    Parse a page list such as "1-5,8,10-" into inclusive ranges.
+
+    Raises:
+        ValueError: For malformed entries or page numbers below 1
+    """
+    ranges: List[PageRange] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        try:
+            start = int(first) if first.strip() else 1
+            end = (int(last) if last.strip() else None) if sep else start
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part!r}") from None
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: {part!r}")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError(f"No pages in {spec!r}")
+    return tuple(ranges)
+
+
+def sample_pages(pages: Sequence[int], count: int) -> List[int]:
+    """
+    Pick ``count`` pages spread evenly over ``pages``: the middle page of each of ``count`` equal stretches.
+    """
+    if count >= len(pages):
+        return list(pages)
+    return [pages[int((i + 0.5) * len(pages) / count)] for i in range(count)]
+
+
+@dataclass(frozen=True)
+class PageSelection:
+    """
+    Pages of a document to process.
+
+    Attributes:
+        ranges: Ranges from --pages (default: every page)
+        first: First page to process (--first)
+        last: Last page to process (--last)
+        sample: Keep only this many of the selected pages, spread evenly (--sample)
+    """
+
+    ranges: Tuple[PageRange, ...] = ()
+    first: int | None = None
+    last: int | None = None
+    sample: int | None = None
+
+    @property
+    def all_pages(self) -> bool:
+        return not self.ranges and self.first is None and self.last is None and self.sample is None
+
+    def resolve(self, page_count: int) -> List[int]:
+        """
+        Sorted 1-based page numbers selected from a document of ``page_count`` pages.
+        """
+        first = max(1, self.first or 1)
+        last = min(page_count, self.last or page_count)
+        if self.ranges:
+            pages = sorted({
+                page
+                for start, end in self.ranges
+                for page in range(max(start, first), min(end or page_count, last) + 1)
+            })
+        else:
+            pages = list(range(first, last + 1))
+        if self.sample is not None:
+            pages = sample_pages(pages, self.sample)
+        return pages
+
+
+def format_pages(pages: Sequence[int]) -> str:
+    """
+    Compact form of sorted page numbers, e.g. "1-5, 8, 10-12".
+    """
+    runs: List[List[int]] = []
+    for page in pages:
+        if runs and page == runs[-1][1] + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in runs)
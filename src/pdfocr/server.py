@@ -0,0 +1,460 @@
+"""
+Long-running OCR service: a warm worker pool behind a local HTTP API.
+
+``pdfocr serve`` starts the OCR pool once and keeps it alive, so jobs skip
+interpreter startup, imports and Tesseract model loading. PDFs are POSTed to
+``/ocr`` over TCP or a Unix socket; page results stream back as NDJSON in
+page order while later pages are still being processed.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from pdfocr.cache import DEFAULT_CACHE_MB, CacheConfig
+from pdfocr.engines import ENGINE_NAMES
+from pdfocr.parallel import create_ocr_pool, imap_ordered, resolve_workers
+from pdfocr.pdf_to_image import get_page_count
+from pdfocr.pipeline import (
+    SOURCE_OCR,
+    OcrOptions,
+    PageResult,
+    PageTask,
+    add_ocr_arguments,
+    ocr_options_from_args,
+    ocr_pdf_page,
+    parse_preprocess,
+    text_layer_results,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Jobs admitted at once (running or waiting for pool slots); more get 503
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_MAX_UPLOAD_MB = 200
+# Seconds clients are told to wait after a 503
+RETRY_AFTER = 2
+
+
+def _warm_worker(engine: str, lang: str) -> int:
+    # Import the render/OCR stack and load the default language's models once
+    from PIL import Image
+
+    from pdfocr.engines import get_engine
+
+    try:
+        with Image.new("L", (64, 64), 255) as blank:
+            get_engine(engine).image_to_string(blank, lang)
+    except Exception as exc:
+        logger.warning(f"Worker warm-up failed: {exc}")
+    return os.getpid()
+
+
+class OcrService:
+    """
+    Warm process pool shared by all jobs, with a bounded number of admitted jobs.
+
+    Args:
+        options: Default OCR settings; jobs may override lang/dpi/engine/adaptive DPI
+        workers: Number of OCR processes (0 = one per CPU)
+        queue_size: Maximum number of jobs admitted at once
+        use_text_layer: Default for taking pages with a usable text layer as-is
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
+    """
+
+    def __init__(self,
+                 options: OcrOptions,
+                 workers: int = 0,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 use_text_layer: bool = False,
+                 max_memory_mb: int | None = None):
+        self.options = options
+        self.workers = resolve_workers(workers)
+        self.queue_size = max(1, queue_size)
+        self.use_text_layer = use_text_layer
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_memory_mb = max_memory_mb
+        self.pool = create_ocr_pool(self.workers, max_memory_mb)
+
+    def warm_up(self) -> None:
+        """
+        Start every worker and load the default engine and language models.
+        """
+        started = time.perf_counter()
+        futures = [self.pool.submit(_warm_worker, self.options.engine, self.options.lang)
+                   for _ in range(self.workers)]
+        pids = {future.result() for future in futures}
+        logger.info(f"Warmed {len(pids)} worker(s) in {time.perf_counter() - started:.1f}s")
+
+    def try_admit(self) -> bool:
+        """
+        Reserve a job slot; False when the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def job_options(self, params: Dict[str, str]) -> OcrOptions:
+        """
+        Apply a job's query parameters to the service defaults.
+
+        Raises:
+            ValueError: For unknown engines, preprocessing steps or malformed numbers
+        """
+        engine = params.get("engine", self.options.engine)
+        if engine not in ENGINE_NAMES:
+            raise ValueError(f"Unknown engine: {engine}")
+        dpi = int(params.get("dpi", self.options.dpi))
+        adaptive_dpi = params.get("adaptive_dpi")
+        adaptive_dpi = int(adaptive_dpi) if adaptive_dpi else self.options.adaptive_dpi
+        if adaptive_dpi is not None and adaptive_dpi >= dpi:
+            adaptive_dpi = None
+        return OcrOptions(
+            lang=params.get("lang", self.options.lang),
+            dpi=dpi,
+            cache=self.options.cache,
+            engine=engine,
+            adaptive_dpi=adaptive_dpi,
+            min_confidence=float(params.get("min_confidence", self.options.min_confidence)),
+            page_timeout=self.options.page_timeout,
+            route_lang=_flag(params.get("route_lang"), self.options.route_lang),
+            preprocess=parse_preprocess(params["preprocess"]) if "preprocess" in params else self.options.preprocess,
+        )
+
+    def run_job(self,
+                pdf_path: Path,
+                options: OcrOptions,
+                use_text_layer: bool,
+                skip_blank: bool = False) -> Iterator[PageResult]:
+        """
+        OCR one PDF on the shared pool, yielding results in page order.
+
+        Only a window of pages per job is in flight, so a large PDF cannot
+        monopolize the pool while other jobs wait.
+        """
+        known_pages = text_layer_results(pdf_path) if use_text_layer else {}
+        page_count = get_page_count(pdf_path)
+        tasks = (PageTask(pdf_path, page, options, None, "png", skip_blank)
+                 for page in range(1, page_count + 1) if page not in known_pages)
+        pool = self.pool
+        ocr_iter = imap_ordered(pool, ocr_pdf_page, tasks, window=2 * self.workers)
+        try:
+            for page in range(1, page_count + 1):
+                if page in known_pages:
+                    yield known_pages.pop(page)
+                    continue
+                result = next(ocr_iter)
+                if use_text_layer:
+                    result.source = result.source or SOURCE_OCR
+                yield result
+        except BrokenProcessPool:
+            # A worker died (crash, memory cap); this job fails, later jobs get a fresh pool
+            self._replace_pool(pool)
+            raise
+        finally:
+            # Cancels pages not started yet when the client goes away
+            ocr_iter.close()
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self.pool is not broken:
+                # Another job already replaced it
+                return
+            logger.warning("An OCR worker died; restarting the worker pool")
+            self.pool = create_ocr_pool(self.workers, self.max_memory_mb)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "active": self.active,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _flag(value: str | None, default: bool) -> bool:
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+class OcrRequestHandler(BaseHTTPRequestHandler):
+    """
+    ``POST /ocr`` with a PDF body streams NDJSON page results;
+    ``GET /health`` reports pool and queue state.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "pdfocr"
+
+    @property
+    def service(self) -> OcrService:
+        return self.server.service
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.info(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: HTTPStatus, payload: Dict, headers: Dict[str, str] | None = None) -> None:
+        body = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload: Dict) -> None:
+        data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path != "/health":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        self._send_json(HTTPStatus.OK, {"status": "ok", **self.service.stats()})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/ocr":
+            # The body is never read, so it must not be parsed as the next request
+            self.close_connection = True
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {"error": "Content-Length required"})
+            return
+        if not length.isdigit():
+            self.close_connection = True
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"})
+            return
+        length = int(length)
+        if length > self.server.max_upload_bytes:
+            self.close_connection = True
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "PDF too large"})
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            options = self.service.job_options(params)
+        except ValueError as exc:
+            self.close_connection = True
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            return
+
+        # Backpressure: refuse instead of queueing without bound
+        if not self.service.try_admit():
+            self.close_connection = True
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "queue full"},
+                            {"Retry-After": str(RETRY_AFTER)})
+            return
+        summary = None
+        try:
+            with tempfile.TemporaryDirectory(prefix="pdfocr_serve_") as tmp:
+                pdf_path = Path(tmp) / "input.pdf"
+                with pdf_path.open("wb") as f:
+                    remaining = length
+                    while remaining:
+                        chunk = self.rfile.read(min(remaining, 1 << 20))
+                        if not chunk:
+                            raise ConnectionError("client closed the connection during upload")
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                use_text_layer = _flag(params.get("text_layer"), self.service.use_text_layer)
+                skip_blank = _flag(params.get("prefilter"), False)
+                summary = self._stream_job(pdf_path, options, use_text_layer, skip_blank)
+        except ConnectionError as exc:
+            logger.warning(f"Job aborted: {exc}")
+            self.close_connection = True
+        finally:
+            self.service.release()
+        if summary is not None:
+            # Sent after the slot is free, so a client may submit its next job right away
+            self._send_chunk(summary)
+            self.wfile.write(b"0\r\n\r\n")
+
+    def _stream_job(self, pdf_path: Path, options: OcrOptions, use_text_layer: bool, skip_blank: bool) -> Dict:
+        started = time.perf_counter()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        pages = 0
+        try:
+            for result in self.service.run_job(pdf_path, options, use_text_layer, skip_blank):
+                self._send_chunk({
+                    "page": result.page,
+                    "text": result.text,
+                    "source": result.source,
+                    "cached": result.cached,
+                    "dpi": result.dpi,
+                    "confidence": result.confidence,
+                    "lang": result.lang,
+                })
+                pages += 1
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            logger.error(f"Job failed: {exc}")
+            return {"done": False, "pages": pages, "error": str(exc)}
+        return {"done": True, "pages": pages, "elapsed_s": round(time.perf_counter() - started, 3)}
+
+
+class OcrHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: OcrService, max_upload_bytes: int):
+        self.service = service
+        self.max_upload_bytes = max_upload_bytes
+        super().__init__(address, OcrRequestHandler)
+
+
+class OcrUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, service: OcrService, max_upload_bytes: int):
+        self.service = service
+        self.max_upload_bytes = max_upload_bytes
+        if socket_path.is_socket():
+            # Left behind by a previous instance that did not shut down cleanly
+            socket_path.unlink()
+        super().__init__(str(socket_path), OcrRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+
+def serve(service: OcrService,
+          host: str = DEFAULT_HOST,
+          port: int = DEFAULT_PORT,
+          socket_path: str | None = None,
+          max_upload_mb: int = DEFAULT_MAX_UPLOAD_MB) -> None:
+    """
+    Serve OCR jobs until SIGINT/SIGTERM.
+
+    Args:
+        service: Started OcrService
+        host: TCP address to bind (ignored with socket_path)
+        port: TCP port to bind (ignored with socket_path)
+        socket_path: Listen on this Unix socket instead of TCP
+        max_upload_mb: Largest accepted PDF in MB
+    """
+    max_upload_bytes = max_upload_mb * 1024 * 1024
+    if socket_path is not None:
+        socket_path = Path(socket_path).expanduser().resolve()
+        server = OcrUnixServer(socket_path, service, max_upload_bytes)
+        where = f"unix:{socket_path}"
+    else:
+        server = OcrHTTPServer((host, port), service, max_upload_bytes)
+        where = f"http://{host}:{server.server_address[1]}"
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so call it off the main thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving OCR on {where} with {service.workers} worker(s), "
+          f"up to {service.queue_size} job(s) at once")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_path is not None and socket_path.exists():
+            socket_path.unlink()
+        service.close()
+        print("OCR service stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pdfocr serve",
+        description="Run a long-lived OCR service with a warm worker pool",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Serve on 127.0.0.1:8765 with one worker per CPU
+  pdfocr serve
+
+  # Submit a PDF; page results stream back as NDJSON
+  curl --data-binary @doc.pdf 'http://127.0.0.1:8765/ocr?lang=eng&dpi=200'
+
+  # Unix socket for local clients only
+  pdfocr serve --socket /run/pdfocr.sock
+  curl --unix-socket /run/pdfocr.sock --data-binary @doc.pdf http://localhost/ocr
+
+The OCR options below are service defaults; jobs override them with the query
+parameters lang, dpi, engine, adaptive_dpi, min_confidence, route_lang,
+preprocess, text_layer and prefilter.
+        """
+    )
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Address to bind (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to bind (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', default=None, metavar='PATH', help='Listen on a Unix socket instead of TCP')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='Number of warm OCR processes, 0 = one per CPU (default: 0)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'Jobs accepted at once; further requests get 503 (default: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--max-upload', type=int, default=DEFAULT_MAX_UPLOAD_MB, metavar='MB',
+                        help=f'Largest accepted PDF in MB (default: {DEFAULT_MAX_UPLOAD_MB})')
+    add_ocr_arguments(parser)
+    parser.add_argument('--text-layer', action='store_true',
+                        help='Use the embedded text layer by default (jobs can pass text_layer=0/1)')
+    parser.add_argument('--cache-dir', default=None, help='OCR result cache shared by all jobs (default: no cache)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MB,
+                        help=f'OCR cache size limit in MB (default: {DEFAULT_CACHE_MB})')
+    parser.add_argument('--max-memory', type=int, default=None, metavar='MB',
+                        help='Address-space limit of each worker process (default: none)')
+    args = parser.parse_args(argv)
+
+    cache = CacheConfig.from_dir(args.cache_dir, args.cache_size) if args.cache_dir is not None else None
+    options = ocr_options_from_args(args, cache=cache)
+    service = OcrService(options, workers=args.workers, queue_size=args.queue_size,
+                         use_text_layer=args.text_layer, max_memory_mb=args.max_memory)
+    service.warm_up()
+    serve(service, host=args.host, port=args.port, socket_path=args.socket, max_upload_mb=args.max_upload)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
@@ -0,0 +1,116 @@
+"""
+Read the embedded text layer of a PDF with poppler's pdftotext.
+"""
+import logging
+import subprocess
+import unicodedata
+from pathlib import Path
+from typing import Dict
+
+from pdfocr.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of non-whitespace characters for a page to count as having text
+MIN_TEXT_CHARS = 20
+# Maximum share of replacement/private-use/control characters (broken font encodings)
+MAX_BAD_CHAR_RATIO = 0.05
+# Minimum share of letters and digits among non-whitespace characters
+MIN_ALNUM_RATIO = 0.5
+
+
+def read_text_layer(pdf_path: PathLike,
+                    first_page: int | None = None,
+                    last_page: int | None = None,
+                    timeout: float | None = None) -> Dict[int, str]:
+    """
+    Extract the embedded text of a page range with a single pdftotext call.
+
+    Args:
+        pdf_path: Path to PDF file
+        first_page: First 1-based page (default: 1)
+        last_page: Last 1-based page (default: last page)
+        timeout: Seconds before pdftotext is killed (default: no limit)
+
+    Returns:
+        Dictionary mapping page numbers to their text layer
+    """
+    pdf_path = Path(pdf_path).expanduser().resolve()
+    first = first_page or 1
+    cmd = ["pdftotext", "-enc", "UTF-8", "-f", str(first)]
+    if last_page is not None:
+        cmd += ["-l", str(last_page)]
+    cmd += [str(pdf_path), "-"]
+
+    try:
+        proc = subprocess.run(cmd, capture_output=True, check=True, timeout=timeout)
+    except FileNotFoundError as exc:
+        raise RuntimeError("pdftotext not found; install poppler-utils") from exc
+    except subprocess.SubprocessError as exc:
+        raise RuntimeError(f"pdftotext failed for {pdf_path}: {exc}") from exc
+
+    output = proc.stdout.decode("utf-8", errors="replace")
+    # pdftotext terminates every page with a form feed
+    page_texts = output.split("\f")
+    if page_texts and page_texts[-1].strip() == "":
+        page_texts.pop()
+    return {first + i: text for i, text in enumerate(page_texts)}
+
+
+def _is_bad_char(ch: str) -> bool:
+    if ch == "\ufffd":
+        return True
+    category = unicodedata.category(ch)
+    return category in ("Co", "Cc", "Cs")
+
+
+def is_usable_text_layer(text: str,
+                         min_chars: int = MIN_TEXT_CHARS,
+                         max_bad_ratio: float = MAX_BAD_CHAR_RATIO,
+                         min_alnum_ratio: float = MIN_ALNUM_RATIO) -> bool:
+    """
+    Decide whether a page's text layer is good enough to skip OCR.
+
+    Rejects pages with (almost) no text, such as scans, and pages whose text
+    is mostly garbage from broken font encodings.
+
+    Args:
+        text: Text layer of one page
+        min_chars: Minimum non-whitespace characters
+        max_bad_ratio: Maximum share of unmappable characters
+        min_alnum_ratio: Minimum share of letters and digits
+
+    Returns:
+        True if the text layer can be used instead of OCR
+    """
+    chars = [ch for ch in text if not ch.isspace()]
+    if len(chars) < min_chars:
+        return False
+
+    bad = sum(1 for ch in chars if _is_bad_char(ch))
+    alnum = sum(1 for ch in chars if ch.isalnum())
+    return bad / len(chars) <= max_bad_ratio and alnum / len(chars) >= min_alnum_ratio
+
+
+def usable_text_layer_pages(pdf_path: PathLike) -> Dict[int, str]:
+    """
+    Return the text of every page whose text layer passes the quality check.
+
+    Failures (pdftotext missing, broken PDF) are logged and yield no pages,
+    so every page falls back to OCR.
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        Dictionary mapping page numbers to usable text
+    """
+    try:
+        layers = read_text_layer(pdf_path)
+    except Exception as exc:
+        logger.warning(f"Text layer check skipped: {exc}")
+        return {}
+
+    usable = {page: text for page, text in layers.items() if is_usable_text_layer(text)}
+    logger.info(f"Text layer usable on {len(usable)}/{len(layers)} page(s)")
+    return usable
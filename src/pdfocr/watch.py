@@ -0,0 +1,545 @@
+"""
+Hot-folder mode: OCR PDFs as they arrive in a directory.
+
+``pdfocr watch DIR`` keeps a warm OCR pool (see server.OcrService) and
+learns about new files from inotify, falling back to polling the directory
+where inotify is unavailable. A file is taken once its size and
+modification time have stopped changing and it ends with a PDF trailer, so
+half-copied scans are never read. Documents are deduplicated by content
+hash in a ledger next to the outputs, so re-dropped copies and restarts do
+not OCR a document twice. Outputs are written next to their target and
+renamed into place, so readers never see a partial file.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import select
+import signal
+import sqlite3
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, Dict, List, Set, Tuple
+
+from pdfocr.cache import DEFAULT_CACHE_MB, CacheConfig
+from pdfocr.journal import run_settings
+from pdfocr.metrics import stage
+from pdfocr.pipeline import OcrOptions, add_ocr_arguments, ocr_options_from_args
+from pdfocr.server import OcrService
+from pdfocr.types import PathLike
+from pdfocr.writers import OUTPUT_FORMATS, DocumentWriter, output_suffix
+
+logger = logging.getLogger(__name__)
+
+# Seconds a file's size and mtime must stay unchanged before it is processed
+DEFAULT_SETTLE_S = 2.0
+# Seconds between directory scans when polling
+DEFAULT_POLL_S = 2.0
+# Full rescan interval with inotify; catches files written over network
+# filesystems, which do not report remote writes to inotify
+RESCAN_S = 30.0
+# Files without a PDF trailer are processed anyway after this long unchanged
+INCOMPLETE_GRACE_S = 60.0
+# Documents OCRed at once; their pages share the worker pool
+DEFAULT_JOBS = 2
+LEDGER_NAME = ".pdfocr-watch.sqlite3"
+# A complete PDF has "%%EOF" within its last bytes
+TRAILER_BYTES = 1024
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+_LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    digest TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    pdf_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (digest, settings)
+);
+"""
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+
+# (size, mtime_ns) of a file
+Signature = Tuple[int, int]
+
+
+def _is_pdf(name: str) -> bool:
+    # Hidden and "~" names are temporary files of editors and file shares
+    return name.lower().endswith(".pdf") and not name.startswith((".", "~"))
+
+
+def _signature(path: Path) -> Signature | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _has_trailer(path: Path) -> bool:
+    try:
+        with path.open("rb") as f:
+            f.seek(max(0, f.seek(0, os.SEEK_END) - TRAILER_BYTES))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def file_digest(path: PathLike) -> str:
+    """
+    SHA-256 of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Inotify:
+    # Minimal inotify binding through libc; raises OSError/AttributeError where unsupported
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        if libc.inotify_add_watch(fd, os.fsencode(directory),
+                                   IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+
+    def read(self, timeout: float) -> Tuple[List[str], bool]:
+        """
+        File names written or moved in within ``timeout`` seconds, and whether events were lost.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        names, overflow, offset = [], False, 0
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            _, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                names.append(os.fsdecode(name))
+        return names, overflow
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """
+    Reports PDFs of a directory that may have been added or changed.
+
+    Args:
+        directory: Directory to watch (not recursive)
+        poll_s: Seconds between scans without inotify
+        use_inotify: Use inotify when available (default: True)
+    """
+
+    def __init__(self, directory: PathLike, poll_s: float = DEFAULT_POLL_S, use_inotify: bool = True):
+        self.directory = Path(directory)
+        self.poll_s = poll_s
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(self.directory)
+            except (OSError, AttributeError) as exc:
+                logger.warning(f"inotify unavailable ({exc}); polling every {poll_s:g}s")
+        self._next_scan = 0.0
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._inotify is not None else f"polling every {self.poll_s:g}s"
+
+    def scan(self) -> List[Path]:
+        """
+        All PDFs currently in the directory.
+        """
+        with os.scandir(self.directory) as entries:
+            return [Path(entry.path) for entry in entries if _is_pdf(entry.name) and entry.is_file()]
+
+    def changes(self, timeout: float) -> Set[Path]:
+        """
+        Wait up to ``timeout`` seconds and return PDFs that may have changed.
+
+        Scans return every PDF; callers compare signatures to find real changes.
+        """
+        found: Set[Path] = set()
+        if time.monotonic() >= self._next_scan:
+            found.update(self.scan())
+            self._next_scan = time.monotonic() + (RESCAN_S if self._inotify is not None else self.poll_s)
+            timeout = 0.0
+        if self._inotify is None:
+            time.sleep(max(0.0, min(timeout, self._next_scan - time.monotonic())))
+            return found
+        names, overflow = self._inotify.read(timeout)
+        if overflow:
+            logger.warning("inotify event queue overflowed; rescanning")
+            found.update(self.scan())
+        found.update(self.directory / name for name in names if _is_pdf(name))
+        return found
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+
+
+class WatchLedger:
+    """
+    Content hashes of the documents a hot folder has processed, per settings.
+
+    One watcher per ledger: entries left "running" by a crashed watcher are
+    dropped when the ledger is opened, so those documents are redone.
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.executescript(_LEDGER_SCHEMA)
+        self._conn.execute("DELETE FROM files WHERE status = ?", (STATUS_RUNNING,))
+
+    def claim(self, digest: str, settings: str, pdf_path: Path, output_path: Path) -> str | None:
+        """
+        Reserve a document for processing.
+
+        Returns:
+            None when claimed, otherwise the PDF with the same content that
+            was already processed (or is being processed) under these settings
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO files (digest, settings, pdf_path, output_path, status, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, settings, str(pdf_path), str(output_path), STATUS_RUNNING, now),
+            )
+            if cursor.rowcount == 1:
+                return None
+            previous, previous_output, status = self._conn.execute(
+                "SELECT pdf_path, output_path, status FROM files WHERE digest = ? AND settings = ?",
+                (digest, settings),
+            ).fetchone()
+            if status == STATUS_DONE and not Path(previous_output).exists():
+                # Output deleted since: redo the document
+                self._conn.execute(
+                    "UPDATE files SET pdf_path = ?, output_path = ?, status = ?, updated = ?"
+                    " WHERE digest = ? AND settings = ?",
+                    (str(pdf_path), str(output_path), STATUS_RUNNING, now, digest, settings),
+                )
+                return None
+            return previous
+
+    def finish(self, digest: str, settings: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE files SET status = ?, updated = ? WHERE digest = ? AND settings = ?",
+                               (STATUS_DONE, time.time(), digest, settings))
+
+    def forget(self, digest: str, settings: str) -> None:
+        """
+        Drop a claim after a failure, so the same content is tried again next time.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE digest = ? AND settings = ?", (digest, settings))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+@dataclass
+class _Candidate:
+    signature: Signature
+    # Monotonic time the signature last changed, and the file was first seen
+    since: float
+    arrived: float
+
+
+class HotFolder:
+    """
+    OCR every new or changed PDF of a directory once, with bounded concurrency.
+
+    Args:
+        directory: Directory scanners drop PDFs into
+        output_dir: Output directory (default: the watched directory)
+        options: OCR settings (default: OcrOptions())
+        workers: OCR processes (0 = one per CPU)
+        jobs: Documents processed at once; further ready files wait in arrival order
+        use_text_layer: Take pages with a usable text layer as-is
+        skip_blank: Skip OCR of blank pages
+        output_format: "text", "jsonl" or "hocr"
+        settle_s: Seconds a file must stay unchanged before it is processed
+        poll_s: Seconds between directory scans without inotify
+        use_inotify: Use inotify when available
+        max_memory_mb: Address-space limit of each worker process in MB (default: none)
+    """
+
+    def __init__(self,
+                 directory: PathLike,
+                 output_dir: PathLike | None = None,
+                 options: OcrOptions | None = None,
+                 workers: int = 0,
+                 jobs: int = DEFAULT_JOBS,
+                 use_text_layer: bool = False,
+                 skip_blank: bool = False,
+                 output_format: str = "text",
+                 settle_s: float = DEFAULT_SETTLE_S,
+                 poll_s: float = DEFAULT_POLL_S,
+                 use_inotify: bool = True,
+                 max_memory_mb: int | None = None):
+        self.directory = Path(directory).expanduser().resolve()
+        if not self.directory.is_dir():
+            raise NotADirectoryError(f"Not a directory: {self.directory}")
+        self.output_dir = Path(output_dir).expanduser().resolve() if output_dir is not None else self.directory
+        self.options = options or OcrOptions()
+        self.jobs = max(1, jobs)
+        self.use_text_layer = use_text_layer
+        self.skip_blank = skip_blank
+        self.output_format = output_format
+        self.settle_s = settle_s
+        # Documents are only reused under settings that give the same output
+        self.settings = (f"{run_settings(self.options, use_text_layer)} skip_blank={skip_blank} "
+                         f"format={output_format}")
+        self._stop = threading.Event()
+        self.watcher = DirectoryWatcher(self.directory, poll_s, use_inotify)
+        self.ledger = WatchLedger(self.output_dir / LEDGER_NAME)
+        self.service = OcrService(self.options, workers=workers, queue_size=self.jobs,
+                                  max_memory_mb=max_memory_mb)
+
+    def stop(self) -> None:
+        """
+        Stop taking new files; documents in progress are finished.
+        """
+        self._stop.set()
+
+    def output_path(self, pdf_path: Path) -> Path:
+        return self.output_dir / f"{pdf_path.stem}{output_suffix(self.output_format)}"
+
+    def process(self, pdf_path: Path, arrived: float | None = None) -> bool:
+        """
+        OCR one PDF unless a document with the same content was already done.
+
+        Args:
+            pdf_path: Settled PDF in the watched directory
+            arrived: Monotonic time the file was first seen, for the latency report
+
+        Returns:
+            True when an output was written
+        """
+        started = time.perf_counter()
+        output_path = self.output_path(pdf_path)
+        try:
+            with stage("hash", file=pdf_path.name):
+                digest = file_digest(pdf_path)
+        except OSError as exc:
+            logger.error(f"Error: {pdf_path.name} - {exc}")
+            return False
+        duplicate = self.ledger.claim(digest, self.settings, pdf_path, output_path)
+        if duplicate == str(pdf_path):
+            logger.info(f"Skipped: {pdf_path.name} (already processed)")
+            return False
+        if duplicate is not None:
+            logger.info(f"Skipped: {pdf_path.name} (same content as {Path(duplicate).name})")
+            return False
+
+        # Written next to the target and renamed, so readers never see a partial file
+        partial = output_path.with_name(output_path.name + ".partial")
+        try:
+            with DocumentWriter(partial, pdf_path.name, self.output_format) as writer:
+                for result in self.service.run_job(pdf_path, self.options, self.use_text_layer, self.skip_blank):
+                    writer.write(result)
+            os.replace(partial, output_path)
+        except Exception as exc:
+            self.ledger.forget(digest, self.settings)
+            partial.unlink(missing_ok=True)
+            logger.error(f"Error: {pdf_path.name} - {exc}")
+            return False
+        self.ledger.finish(digest, self.settings)
+        latency = f", {time.monotonic() - arrived:.1f}s after arrival" if arrived is not None else ""
+        logger.info(f"Completed: {output_path} ({writer.pages} page(s) in {time.perf_counter() - started:.1f}s{latency})")
+        return True
+
+    def _settled(self, pending: Dict[Path, _Candidate]) -> List[Tuple[Path, _Candidate]]:
+        # Files whose size and mtime have not changed for settle_s
+        now = time.monotonic()
+        settled = []
+        for path, candidate in list(pending.items()):
+            signature = _signature(path)
+            if signature is None:
+                # Deleted or moved away before it settled
+                del pending[path]
+            elif signature != candidate.signature:
+                candidate.signature, candidate.since = signature, now
+            elif now - candidate.since >= self.settle_s:
+                if _has_trailer(path) or now - candidate.since >= INCOMPLETE_GRACE_S:
+                    del pending[path]
+                    settled.append((path, candidate))
+        return settled
+
+    def run(self, once: bool = False) -> int:
+        """
+        Watch until stop() (or, with ``once``, until the directory's current PDFs are done).
+
+        Returns:
+            Number of outputs written
+        """
+        pending: Dict[Path, _Candidate] = {}
+        # Signature each file had when it was taken; unchanged files are not taken again
+        taken: Dict[Path, Signature] = {}
+        ready: Deque[Tuple[Path, float]] = deque()
+        running: Dict[Future, Path] = {}
+        written = 0
+        # Pending files are re-checked at least this often
+        tick = min(0.5, self.settle_s / 4) or 0.1
+        next_prune = time.monotonic() + RESCAN_S
+
+        self.service.warm_up()
+        print(f"Watching {self.directory} ({self.watcher.mode}); outputs in {self.output_dir}; "
+              f"{self.service.workers} worker(s), up to {self.jobs} document(s) at once")
+        executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="pdfocr-watch")
+        try:
+            while not self._stop.is_set():
+                for path in self.watcher.changes(tick):
+                    signature = _signature(path)
+                    if signature is None:
+                        # Deleted or moved away
+                        taken.pop(path, None)
+                        continue
+                    if taken.get(path) == signature:
+                        continue
+                    now = time.monotonic()
+                    candidate = pending.get(path)
+                    if candidate is None:
+                        # A file unchanged since before it was seen (e.g. at startup) needs no extra wait
+                        age = max(0.0, time.time() - signature[1] / 1e9)
+                        pending[path] = _Candidate(signature, now - age, now)
+                    elif candidate.signature != signature:
+                        candidate.signature, candidate.since = signature, now
+
+                if time.monotonic() >= next_prune:
+                    # Removals are not reported when polling (or after an inotify overflow)
+                    for path in [path for path in taken if _signature(path) is None]:
+                        del taken[path]
+                    next_prune = time.monotonic() + RESCAN_S
+
+                for path, candidate in self._settled(pending):
+                    taken[path] = candidate.signature
+                    ready.append((path, candidate.arrived))
+
+                for future in [future for future in running if future.done()]:
+                    running.pop(future)
+                    written += future.result()
+                while ready and len(running) < self.jobs:
+                    path, arrived = ready.popleft()
+                    running[executor.submit(self.process, path, arrived)] = path
+
+                if once and not pending and not ready and not running:
+                    break
+        finally:
+            if running:
+                print(f"Finishing {len(running)} document(s) in progress...")
+            executor.shutdown(wait=True)
+            written += sum(future.result() for future in running if not future.cancelled())
+            self.watcher.close()
+            self.ledger.close()
+            self.service.close()
+        return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pdfocr watch",
+        description="OCR PDFs as they arrive in a directory (hot folder)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # OCR scans dropped into /srv/scans, outputs next to them
+  pdfocr watch /srv/scans
+
+  # Outputs elsewhere as JSONL, 8 OCR processes, 3 documents at once
+  pdfocr watch /srv/scans -o /srv/ocr --format jsonl -w 8 --jobs 3
+
+  # Process what is there now and exit (e.g. from cron)
+  pdfocr watch /srv/scans --once
+        """
+    )
+    parser.add_argument('directory', help='Directory to watch for PDFs')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='Output directory (default: the watched directory)')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='OCR worker processes, 0 = one per CPU (default: 0)')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'Documents processed at once; others wait in arrival order (default: {DEFAULT_JOBS})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_S, metavar='SECONDS',
+                        help=f'Seconds a file must stay unchanged before it is processed '
+                             f'(default: {DEFAULT_SETTLE_S:g})')
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL_S, metavar='SECONDS',
+                        help=f'Scan interval when inotify is unavailable (default: {DEFAULT_POLL_S:g})')
+    parser.add_argument('--no-inotify', action='store_true',
+                        help='Poll the directory instead of using inotify (e.g. network shares)')
+    parser.add_argument('--once', action='store_true',
+                        help='Process the PDFs already in the directory, then exit')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='text',
+                        help='Output format (default: text)')
+    add_ocr_arguments(parser)
+    parser.add_argument('--text-layer', action='store_true',
+                        help='Take pages with a usable text layer as-is; OCR only the others')
+    parser.add_argument('--prefilter', action='store_true', help='Skip OCR of blank pages')
+    parser.add_argument('--cache-dir', default=None, help='OCR result cache (default: no cache)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MB,
+                        help=f'OCR cache size limit in MB (default: {DEFAULT_CACHE_MB})')
+    parser.add_argument('--max-memory', type=int, default=None, metavar='MB',
+                        help='Address-space limit of each worker process (default: none)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cache = CacheConfig.from_dir(args.cache_dir, args.cache_size) if args.cache_dir is not None else None
+    options = ocr_options_from_args(args, cache=cache, words=args.format != "text")
+    try:
+        folder = HotFolder(args.directory, args.output_dir, options, workers=args.workers, jobs=args.jobs,
+                           use_text_layer=args.text_layer, skip_blank=args.prefilter,
+                           output_format=args.format, settle_s=args.settle, poll_s=args.poll,
+                           use_inotify=not args.no_inotify, max_memory_mb=args.max_memory)
+    except NotADirectoryError as exc:
+        parser.error(str(exc))
+
+    def stop(signum, frame):
+        folder.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    written = folder.run(once=args.once)
+    print(f"Watch stopped: {written} document(s) written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Streaming output writers: plain text, JSONL and hOCR.
+
+Pages are appended to the output as soon as they are finished, and a
+merged file for the whole batch is written in the same pass, so memory use
+does not grow with the number of pages and no output is read back.
+"""
+from __future__ import annotations
+
+import html
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, TextIO
+
+from pdfocr.image_to_text import write_page_text
+from pdfocr.metrics import stage
+from pdfocr.types import PathLike
+
+if TYPE_CHECKING:
+    from pdfocr.pipeline import PageResult
+
+logger = logging.getLogger(__name__)
+
+MERGED_STEM = "merged_all_texts"
+
+
+class OutputFormat:
+    """
+    Base class for output formats.
+
+    A file holds one document, or several in a merged file; formats write
+    their framing around the documents and pages they are given.
+    """
+
+    name = "base"
+    suffix = ""
+
+    def begin_file(self, f: TextIO) -> None:
+        pass
+
+    def begin_document(self, f: TextIO, number: int, document: str, merged: bool) -> None:
+        pass
+
+    def write_page(self, f: TextIO, result: PageResult, document: str, number: int) -> None:
+        raise NotImplementedError
+
+    def end_document(self, f: TextIO, merged: bool) -> None:
+        pass
+
+    def end_file(self, f: TextIO) -> None:
+        pass
+
+    def embed(self, f: TextIO, path: Path) -> None:
+        """
+        Copy the documents of an already written output file into a merged file.
+        """
+        with path.open(encoding="utf-8") as src:
+            for line in src:
+                f.write(line)
+
+
+class TextFormat(OutputFormat):
+    """
+    Page sections with headers, the classic pdfocr .txt layout.
+    """
+
+    name = "text"
+    suffix = ".txt"
+
+    def begin_document(self, f: TextIO, number: int, document: str, merged: bool) -> None:
+        if merged:
+            f.write(f"\n{'#'*80}\n")
+            f.write(f"# Document {number}: {document}\n")
+            f.write(f"{'#'*80}\n\n")
+
+    def write_page(self, f: TextIO, result: PageResult, document: str, number: int) -> None:
+        write_page_text(f, result.page, result.name, result.text, result.source)
+
+    def end_document(self, f: TextIO, merged: bool) -> None:
+        if merged:
+            f.write("\n\n")
+
+
+class JsonlFormat(OutputFormat):
+    """
+    One JSON record per page, with word boxes and confidences when available.
+    """
+
+    name = "jsonl"
+    suffix = ".jsonl"
+
+    def write_page(self, f: TextIO, result: PageResult, document: str, number: int) -> None:
+        record = {
+            "document": document,
+            "page": result.page,
+            "name": result.name,
+            "source": result.source,
+            "dpi": result.dpi,
+            "confidence": None if result.confidence is None else round(result.confidence, 2),
+            "text": result.text,
+        }
+        if result.lang is not None:
+            record["lang"] = result.lang
+        if result.size is not None:
+            record["size"] = list(result.size)
+        if result.words is not None:
+            record["words"] = result.words
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _bbox(words: List[Dict[str, object]]) -> str:
+    boxes = [word["bbox"] for word in words]
+    return (f"bbox {min(b[0] for b in boxes)} {min(b[1] for b in boxes)} "
+            f"{max(b[2] for b in boxes)} {max(b[3] for b in boxes)}")
+
+
+def _group(words: List[Dict[str, object]], key: str) -> Iterable[List[Dict[str, object]]]:
+    group: List[Dict[str, object]] = []
+    for word in words:
+        if group and word[key] != group[-1][key]:
+            yield group
+            group = []
+        group.append(word)
+    if group:
+        yield group
+
+
+class HocrFormat(OutputFormat):
+    """
+    hOCR (XHTML with page, area, paragraph, line and word boxes).
+
+    Pages without word boxes (text layer, cached plain text) are written as
+    lines without coordinates.
+    """
+
+    name = "hocr"
+    suffix = ".hocr"
+
+    def begin_file(self, f: TextIO) -> None:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"\n'
+                '    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">\n'
+                '<head>\n'
+                '<title></title>\n'
+                '<meta http-equiv="Content-Type" content="text/html; charset=utf-8" />\n'
+                '<meta name="ocr-system" content="pdfocr" />\n'
+                '<meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par ocr_line ocrx_word" />\n'
+                '</head>\n'
+                '<body>\n')
+
+    def write_page(self, f: TextIO, result: PageResult, document: str, number: int) -> None:
+        page_id = f"page_{number}_{result.page}"
+        title = f"image {html.escape(result.name, quote=True)}; ppageno {result.page - 1}"
+        if result.size is not None:
+            title = f"{title}; bbox 0 0 {result.size[0]} {result.size[1]}"
+        if result.source:
+            title = f"{title}; x_source {result.source}"
+        f.write(f'<div class="ocr_page" id="{page_id}" title="{title}">\n')
+        if result.words:
+            self._write_words(f, page_id, result.words)
+        elif result.text.strip():
+            f.write(f'<p class="ocr_par" id="{page_id}_par_1">\n')
+            for index, line in enumerate(result.text.splitlines(), start=1):
+                if line.strip():
+                    f.write(f'<span class="ocr_line" id="{page_id}_line_{index}">{html.escape(line)}</span>\n')
+            f.write('</p>\n')
+        f.write('</div>\n')
+
+    def _write_words(self, f: TextIO, page_id: str, words: List[Dict[str, object]]) -> None:
+        for block in _group(words, "block"):
+            block_id = f"{page_id}_block_{block[0]['block']}"
+            f.write(f'<div class="ocr_carea" id="{block_id}" title="{_bbox(block)}">\n')
+            for par in _group(block, "par"):
+                par_id = f"{block_id}_par_{par[0]['par']}"
+                f.write(f'<p class="ocr_par" id="{par_id}" title="{_bbox(par)}">\n')
+                for line in _group(par, "line"):
+                    line_id = f"{par_id}_line_{line[0]['line']}"
+                    f.write(f'<span class="ocr_line" id="{line_id}" title="{_bbox(line)}">')
+                    f.write(" ".join(
+                        f'<span class="ocrx_word" id="{line_id}_word_{i}" '
+                        f'title="bbox {" ".join(map(str, word["bbox"]))}; x_wconf {round(word["conf"])}">'
+                        f'{html.escape(word["text"])}</span>'
+                        for i, word in enumerate(line, start=1)
+                    ))
+                    f.write('</span>\n')
+                f.write('</p>\n')
+            f.write('</div>\n')
+
+    def end_file(self, f: TextIO) -> None:
+        f.write('</body>\n</html>\n')
+
+    def embed(self, f: TextIO, path: Path) -> None:
+        with path.open(encoding="utf-8") as src:
+            inside = False
+            for line in src:
+                if line.startswith("</body>"):
+                    break
+                if inside:
+                    f.write(line)
+                inside = inside or line.startswith("<body>")
+
+
+FORMATS: Dict[str, OutputFormat] = {
+    fmt.name: fmt for fmt in (TextFormat(), JsonlFormat(), HocrFormat())
+}
+OUTPUT_FORMATS = tuple(FORMATS)
+
+
+def get_format(name: str) -> OutputFormat:
+    """
+    Look up an output format by name ("text", "jsonl" or "hocr").
+    """
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown output format: {name}") from None
+
+
+def output_suffix(output_format: str) -> str:
+    """
+    File suffix of an output format, e.g. ".txt".
+    """
+    return get_format(output_format).suffix
+
+
+@dataclass
+class _MergedDocument:
+    name: str
+    pages: List[PageResult] = field(default_factory=list)
+    finished_file: Path | None = None
+    started: bool = False
+    done: bool = False
+    completed: bool = False
+
+
+class MergedWriter:
+    """
+    One output file for all documents of a batch, in input order.
+
+    Documents are registered in input order with add_document(). Pages of
+    the document at the head of that order go straight to the file; pages
+    of documents that finish early (shared worker pool) wait in memory
+    until all documents before them are done.
+
+    Args:
+        output_path: Merged output file
+        output_format: Name of the output format
+    """
+
+    def __init__(self, output_path: PathLike, output_format: str = "text"):
+        self.output_path = Path(output_path)
+        self.format = get_format(output_format)
+        self.documents = 0
+        self._pending: List[_MergedDocument | None] = []
+        self._head = 0
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.output_path.open("w", encoding="utf-8")
+        self.format.begin_file(self._file)
+
+    def add_document(self, document: str) -> int:
+        """
+        Reserve the next position in the merged file.
+
+        Returns:
+            Slot to pass to write_page()/finish_document()
+        """
+        self._pending.append(_MergedDocument(document))
+        return len(self._pending) - 1
+
+    def _start(self, doc: _MergedDocument) -> None:
+        if not doc.started:
+            self.documents += 1
+            self.format.begin_document(self._file, self.documents, doc.name, merged=True)
+            doc.started = True
+
+    def write_page(self, slot: int, result: PageResult) -> None:
+        doc = self._pending[slot]
+        if slot != self._head:
+            doc.pages.append(result)
+            return
+        self._start(doc)
+        self.format.write_page(self._file, result, doc.name, self.documents)
+
+    def add_file(self, slot: int, path: PathLike) -> None:
+        """
+        Merge a document whose output was written by an earlier run.
+        """
+        self._pending[slot].finished_file = Path(path)
+        self.finish_document(slot)
+
+    def finish_document(self, slot: int, completed: bool = True) -> None:
+        """
+        Mark a document as done; failed documents without pages are left out.
+        """
+        doc = self._pending[slot]
+        doc.done = True
+        doc.completed = completed
+        self._advance()
+
+    def _advance(self) -> None:
+        while self._head < len(self._pending):
+            doc = self._pending[self._head]
+            if doc.pages or doc.finished_file is not None or (doc.done and doc.completed):
+                self._start(doc)
+                if doc.finished_file is not None:
+                    self.format.embed(self._file, doc.finished_file)
+                for result in doc.pages:
+                    self.format.write_page(self._file, result, doc.name, self.documents)
+                doc.pages.clear()
+            if not doc.done:
+                return
+            if doc.started:
+                self.format.end_document(self._file, merged=True)
+            self._pending[self._head] = None
+            self._head += 1
+
+    def close(self) -> None:
+        for slot in range(self._head, len(self._pending)):
+            if not self._pending[slot].done:
+                logger.warning(f"{self._pending[slot].name} did not finish; merged file may be incomplete")
+                self.finish_document(slot, completed=False)
+        self.format.end_file(self._file)
+        self._file.close()
+
+
+class DocumentWriter:
+    """
+    Write the pages of one document as they finish.
+
+    Pages must arrive in page order. With a merged writer, every page is
+    also appended to the merged file in the same pass.
+
+    Args:
+        output_path: Output file of this document
+        document: Document name shown in the output (PDF file name)
+        output_format: Name of the output format
+        merged: Merged file of the batch (default: none)
+        slot: Position reserved with merged.add_document() (default: next position)
+    """
+
+    def __init__(self,
+                 output_path: PathLike,
+                 document: str,
+                 output_format: str = "text",
+                 merged: MergedWriter | None = None,
+                 slot: int | None = None):
+        self.output_path = Path(output_path)
+        self.document = document
+        self.format = get_format(output_format)
+        self.pages = 0
+        self._merged = merged
+        self._slot = merged.add_document(document) if merged is not None and slot is None else slot
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.output_path.open("w", encoding="utf-8")
+        self.format.begin_file(self._file)
+        self.format.begin_document(self._file, 1, document, merged=False)
+
+    def write(self, result: PageResult) -> None:
+        with stage("write", page=result.page):
+            self.format.write_page(self._file, result, self.document, 1)
+            self._file.flush()
+            if self._merged is not None:
+                self._merged.write_page(self._slot, result)
+        self.pages += 1
+
+    def close(self, completed: bool = True) -> None:
+        if self._file.closed:
+            return
+        self.format.end_document(self._file, merged=False)
+        self.format.end_file(self._file)
+        self._file.close()
+        if self._merged is not None:
+            self._merged.finish_document(self._slot, completed)
+
+    def __enter__(self) -> "DocumentWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(completed=exc_type is None)
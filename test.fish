@@ -16,6 +16,23 @@ if not test -x $venv_python
   set venv_python (command -v python3)
 end
 
+# The CLI must start without loading the imaging/OCR stack (see: python -m pdfocr.bench --startup-only)
+echo "==> Checking CLI startup imports"
+env PYTHONPATH="$project_dir/src" $venv_python -c 'import sys
+import pdfocr
+heavy = {"cv2", "numpy", "PIL", "pdf2image", "pytesseract", "tesserocr"} & set(sys.modules)
+assert not heavy, f"import pdfocr loads {sorted(heavy)}"'; or exit 1
+env PYTHONPATH="$project_dir/src" $venv_python -c 'import sys
+from pdfocr.main import main
+sys.argv = ["pdfocr", "--help"]
+try:
+    main()
+except SystemExit as exc:
+    assert not exc.code, f"pdfocr --help exited with {exc.code}"
+heavy = {"cv2", "numpy", "PIL", "pdf2image", "pytesseract", "tesserocr"} & set(sys.modules)
+assert not heavy, f"pdfocr --help loads {sorted(heavy)}"' > /dev/null; or exit 1
+$venv_python pdfocr --help > /dev/null; or exit 1
+
 if not command -q pdflatex
   echo "pdflatex not found; install TeX Live/LaTeX first."
   exit 1